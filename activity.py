@@ -0,0 +1,168 @@
+# Rolling per-minute bid activity
+#
+# Every bid save, reset and clear adds to a one-minute bucket in
+# data/activity/<stream>.json: how many bids were saved, who saved them and
+# how many points moved from which project to which. The buckets are updated
+# by the writer while it holds the bids file lock, so the dashboard only ever
+# reads a few hundred small buckets and never rescans the bids.
+#
+# Each bucket carries the revision of the write that last changed it, so a
+# client that already has the buckets up to revision N only needs the buckets
+# changed since (see changes_since).
+import os
+from datetime import datetime, timedelta
+
+import codec
+import generations
+
+ACTIVITY_DIR_NAME = "activity"
+RETENTION_MINUTES = 24 * 60  # Buckets older than this (relative to the newest one) are dropped
+MINUTE_FORMAT = "%Y-%m-%d %H:%M"
+
+# Pseudo projects for points that weren't bid before or aren't bid anymore
+NEW_POINTS = "(new points)"
+WITHDRAWN = "(withdrawn)"
+
+# Function to get the activity file of a bids file
+def get_activity_path(path):
+    return os.path.join(os.path.dirname(path) or ".", ACTIVITY_DIR_NAME, os.path.basename(path))
+
+# Function to get the name the activity's generation counter is kept under
+# The counter lives with the bids file's own counters, so it can be read before any activity exists
+def _get_generation_key(path):
+    return os.path.join(os.path.dirname(path), f"{ACTIVITY_DIR_NAME}-{os.path.basename(path)}")
+
+# Function to get the generation of a bids file's activity (changes on every recorded write)
+def get_generation(path):
+    return generations.get(_get_generation_key(path))
+
+# Function to load the activity of a bids file
+def load(path):
+    activity_file = get_activity_path(path)
+    if not os.path.exists(activity_file):
+        return {'rev': 0, 'buckets': []}
+    try:
+        return codec.read_json(activity_file)
+    except codec.DecodeError:
+        # Activity is only a view of the bids, start over rather than fail the write
+        return {'rev': 0, 'buckets': []}
+
+# Function to work out how a student's points moved between projects
+# Takes the old and new bid items (either may be empty) and returns [(from, to, points), ...]
+def compute_flows(old_items, new_items):
+    old_points = {}
+    for item in old_items:
+        old_points[item.project_id] = old_points.get(item.project_id, 0) + item.points
+    new_points = {}
+    for item in new_items:
+        new_points[item.project_id] = new_points.get(item.project_id, 0) + item.points
+
+    losses = []
+    gains = []
+    for project_id in list(old_points) + [p for p in new_points if p not in old_points]:
+        change = new_points.get(project_id, 0) - old_points.get(project_id, 0)
+        if change < 0:
+            losses.append([project_id, -change])
+        elif change > 0:
+            gains.append([project_id, change])
+
+    # Match points taken off one project with points put on another, in bid order
+    flows = []
+    while losses and gains:
+        points = min(losses[0][1], gains[0][1])
+        flows.append((losses[0][0], gains[0][0], points))
+        losses[0][1] -= points
+        gains[0][1] -= points
+        if losses[0][1] == 0:
+            losses.pop(0)
+        if gains[0][1] == 0:
+            gains.pop(0)
+
+    # Whatever is left over was added to or taken out of the budget
+    flows.extend((project_id, WITHDRAWN, points) for project_id, points in losses)
+    flows.extend((NEW_POINTS, project_id, points) for project_id, points in gains)
+    return flows
+
+# Function to add bid changes to the activity of a bids file
+# `changes` is a list of (netid, old_items, new_items) where new_items is None for
+# a removed bid; callers hold generations.locked(path)
+def record(path, changes, when=None):
+    if not changes:
+        return
+    minute = (when or datetime.now()).strftime(MINUTE_FORMAT)
+
+    state = load(path)
+    state['rev'] += 1
+    buckets = state['buckets']
+    if buckets and buckets[-1]['minute'] == minute:
+        bucket = buckets[-1]
+    else:
+        bucket = {'minute': minute, 'saves': 0, 'removals': 0, 'bidders': [], 'flows': {}}
+        buckets.append(bucket)
+        buckets.sort(key=lambda b: b['minute'])
+    bucket['rev'] = state['rev']
+
+    for netid, old_items, new_items in changes:
+        if new_items is None:
+            bucket['removals'] += 1
+        else:
+            bucket['saves'] += 1
+            if netid not in bucket['bidders']:
+                bucket['bidders'].append(netid)
+        for source, target, points in compute_flows(old_items or (), new_items or ()):
+            targets = bucket['flows'].setdefault(source, {})
+            targets[target] = targets.get(target, 0) + points
+
+    # Drop buckets that fell out of the retention window
+    oldest = (datetime.strptime(buckets[-1]['minute'], MINUTE_FORMAT) - timedelta(minutes=RETENTION_MINUTES)).strftime(MINUTE_FORMAT)
+    state['buckets'] = [b for b in buckets if b['minute'] > oldest]
+
+    activity_file = get_activity_path(path)
+    os.makedirs(os.path.dirname(activity_file), exist_ok=True)
+    codec.write_json(activity_file, state)
+    generations.bump(_get_generation_key(path))
+
+# Function to get the buckets changed after revision `since`
+# Returns (rev, buckets); a client newer than the file (it was reset) gets every bucket
+def changes_since(state, since=0):
+    if since > state['rev']:
+        since = 0
+    return state['rev'], [bucket for bucket in state['buckets'] if bucket['rev'] > since]
+
+# Function to summarize the buckets of the last `minutes` minutes up to `now`
+def summarize(buckets, minutes, now=None):
+    now = now or datetime.now()
+    first = (now - timedelta(minutes=minutes - 1)).strftime(MINUTE_FORMAT)
+    last = now.strftime(MINUTE_FORMAT)
+    in_window = {b['minute']: b for b in buckets if first <= b['minute'] <= last}
+
+    # One entry per minute, including the quiet ones
+    per_minute = []
+    for i in range(minutes):
+        minute = (now - timedelta(minutes=minutes - 1 - i)).strftime(MINUTE_FORMAT)
+        bucket = in_window.get(minute)
+        per_minute.append({'Minute': minute, 'Bids': bucket['saves'] if bucket else 0})
+
+    bidders = set()
+    flows = {}
+    saves = removals = 0
+    for bucket in in_window.values():
+        saves += bucket['saves']
+        removals += bucket['removals']
+        bidders.update(bucket['bidders'])
+        for source, targets in bucket['flows'].items():
+            for target, points in targets.items():
+                flows[(source, target)] = flows.get((source, target), 0) + points
+
+    return {
+        'saves': saves,
+        'removals': removals,
+        'bids_per_minute': saves / minutes,
+        'active_bidders': len(bidders),
+        'points_moved': sum(points for (source, target), points in flows.items() if source != NEW_POINTS and target != WITHDRAWN),
+        'per_minute': per_minute,
+        'flows': sorted(
+            ({'From': source, 'To': target, 'Points': points} for (source, target), points in flows.items()),
+            key=lambda flow: -flow['Points']
+        )
+    }
@@ -0,0 +1,113 @@
+# Bid statistics computed from a section's records
+#
+# Shared by the admin and bidding views in the app and by the JSON API, so
+# nothing in here depends on Streamlit. Callers cache the results per data
+# generation.
+import numpy as np
+import pandas as pd
+
+# Function to check whether a bid is on a project
+# More flexible matching to handle potential format differences
+def project_id_matches(bid_project_id, project_id):
+    bid_project_id = bid_project_id.strip()
+    project_id = project_id.strip()
+    return bid_project_id == project_id or bid_project_id in project_id or project_id in bid_project_id
+
+# Function to build the project popularity statistics from a BidTable
+# Returns (project_stats, points_per_project, bids_per_project), or None if there are no bids
+def project_stats(bid_table):
+    if not len(bid_table):
+        return None
+
+    # Create DataFrames for different statistics
+    bid_df = bid_table.to_frame(columns=('project_title', 'points'))
+    bid_df = bid_df.rename(columns={'project_title': 'Project', 'points': 'Points'})
+
+    # Total points per project
+    points_per_project = bid_df.groupby('Project')['Points'].sum().reset_index()
+    points_per_project = points_per_project.sort_values('Points', ascending=False)
+
+    # Number of bids per project
+    bids_per_project = bid_df.groupby('Project').size().reset_index(name='Number of Bids')
+
+    # Average points per bid
+    avg_points = bid_df.groupby('Project')['Points'].mean().reset_index()
+    avg_points = avg_points.rename(columns={'Points': 'Average Points per Bid'})
+    avg_points['Average Points per Bid'] = avg_points['Average Points per Bid'].round(1)
+
+    # Merge statistics
+    stats = points_per_project.merge(bids_per_project, on='Project')
+    stats = stats.merge(avg_points, on='Project')
+    stats = stats.sort_values('Points', ascending=False)
+
+    return stats, points_per_project, bids_per_project
+
+# Function to find everyone who bid on a project, highest points first
+def project_bidders(bid_table, project_id):
+    # Match the project ids once, then select their rows
+    projects = bid_table.find_projects(lambda bid_project_id: project_id_matches(bid_project_id, project_id))
+    rows = np.flatnonzero(np.isin(bid_table.column('project'), projects))
+
+    bidders = bid_table.to_frame(columns=('name', 'netid', 'points'), rows=rows)
+    bidders = bidders.rename(columns={'name': 'Student', 'netid': 'NetID', 'points': 'Points'})
+    bidders = bidders.sort_values('Points', ascending=False, kind='stable')
+    return bidders.to_dict('records')
+
+# Function to find the top bidders of every submitted project
+# Returns {project_id: [{'Student', 'NetID', 'Points'}, ...]} with at most `limit` bidders each.
+# Ids are matched exactly (unlike project_id_matches, "Project 1" doesn't take the bids on "Project 12")
+def top_bidders_by_project(submissions, bid_table, limit=3):
+    student = bid_table.column('student')
+    project = bid_table.column('project')
+    points = bid_table.column('points')
+
+    # Group the rows by project once instead of scanning every row for every project
+    order = np.argsort(project, kind='stable')
+    starts = np.searchsorted(project[order], np.arange(len(bid_table.project_ids) + 1))
+
+    top_bidders = {}
+    for i in range(len(submissions)):
+        project_id = f"Project {i+1}"
+        matched = bid_table.find_projects(lambda bid_project_id: bid_project_id.strip() == project_id)
+        rows = np.sort(np.concatenate([order[starts[m]:starts[m + 1]] for m in matched] or [np.zeros(0, dtype=np.int64)]))
+        rows = rows[np.argsort(-points[rows], kind='stable')][:limit]
+        top_bidders[project_id] = [
+            {
+                'Student': bid_table.names[student[row]],
+                'NetID': bid_table.netids[student[row]],
+                'Points': int(points[row])
+            }
+            for row in rows
+        ]
+    return top_bidders
+
+# Function to build the admin bid tables from a BidTable
+# Returns (bid_df, student_summary_df), or None if there are no bids
+def admin_bid_tables(bid_table):
+    if not len(bid_table):
+        return None
+
+    bid_df = bid_table.to_frame(columns=('name', 'netid', 'project_title', 'points', 'timestamp'))
+    bid_df = pd.DataFrame({
+        'Student': bid_df['name'] + " (" + bid_df['netid'] + ")",
+        'Project': bid_df['project_title'],
+        'Points': bid_df['points'],
+        'Timestamp': bid_df['timestamp']
+    })
+
+    # Create a summary of each student's bids, in the order students first bid
+    student_totals = bid_df.groupby('Student', sort=False)['Points'].agg(['sum', 'count'])
+    student_summary_df = pd.DataFrame({
+        'Student': student_totals.index,
+        'Total Points': student_totals['sum'].values,
+        'Projects Bid On': student_totals['count'].values,
+        'Average Points per Project': (student_totals['sum'] / student_totals['count']).round(1).values
+    })
+
+    return bid_df, student_summary_df
+
+# Function to flatten bids into one row per (student, project), the format of the bids CSV
+def flat_bids_frame(bid_table, section):
+    bid_df = bid_table.to_frame()
+    bid_df['section'] = section
+    return bid_df
@@ -0,0 +1,217 @@
+# Read-only JSON API over the section data
+#
+# Serves the same aggregates the admin view shows, for TA tooling and scripts:
+#   GET /api/sections
+#   GET /api/sections/<section>/submissions
+#   GET /api/sections/<section>/bids          (one row per student and project, like the bids CSV)
+#   GET /api/sections/<section>/stats         (project popularity statistics)
+#   GET /api/sections/<section>/top-bidders   (top 3 bidders of every project)
+#   GET /api/sections/<section>/activity?since=<rev>  (bid activity buckets changed after revision <rev>)
+#   GET /api/sections/<section>/feed?cursor=<cursor>&limit=<n>  (change feed events after <cursor>; 'latest' for the end)
+# where <section> is the file name suffix, e.g. "section_a".
+#
+# Responses are built once per data generation and carry an ETag; clients that
+# send it back in If-None-Match get a 304 until a worker writes the section again.
+#
+# Usage: python api.py [--host 127.0.0.1] [--port 8600]
+import sys
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import activity
+import analytics
+import codec
+import feed
+from records import BidTable, parse_submissions, parse_bids
+from storage import SECTIONS, get_section_slug, get_section_files, get_data_generation, read_records
+
+_cache_lock = threading.Lock()
+_cache = {}  # (resource, section) -> (generation, etag, body)
+
+# Function to read a section's submissions and bids without changing the files
+def read_section(section):
+    section_files = get_section_files(section)
+    submissions = read_records(section_files['submissions'], parse_submissions)
+    bids = read_records(section_files['bids'], parse_bids)
+    return submissions, bids
+
+# Function to build the list of sections
+def build_sections():
+    return [
+        {'section': section, 'id': get_section_slug(section), 'generation': list(get_data_generation(section))}
+        for section in SECTIONS
+    ]
+
+# Function to build the submissions of a section
+def build_submissions(section):
+    submissions, _ = read_section(section)
+    return [submission.to_dict() for submission in submissions]
+
+# Function to build the flattened bids of a section
+def build_bids(section):
+    _, bids = read_section(section)
+    return analytics.flat_bids_frame(BidTable.from_bids(bids), section).to_dict('records')
+
+# Function to build the project popularity statistics of a section
+def build_stats(section):
+    _, bids = read_section(section)
+    stats = analytics.project_stats(BidTable.from_bids(bids))
+    return stats[0].to_dict('records') if stats is not None else []
+
+# Function to build the top bidders of every project in a section
+def build_top_bidders(section):
+    submissions, bids = read_section(section)
+    return analytics.top_bidders_by_project(submissions, BidTable.from_bids(bids))
+
+SECTION_RESOURCES = {
+    'submissions': build_submissions,
+    'bids': build_bids,
+    'stats': build_stats,
+    'top-bidders': build_top_bidders
+}
+
+# Function to get a response body and its ETag, rebuilding it only when the data generation changed
+def get_response(resource, section):
+    # Read the generation before the data, so a write landing mid-build is picked up next time
+    if section is None:
+        generation = tuple(get_data_generation(s) for s in SECTIONS)
+    else:
+        generation = get_data_generation(section)
+
+    key = (resource, section)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is not None and cached[0] == generation:
+        return cached[1], cached[2]
+
+    data = build_sections() if section is None else SECTION_RESOURCES[resource](section)
+    etag = '"{}-{}"'.format(resource, "-".join(str(g) for g in _flatten(generation)))
+    body = codec.dumps(data)
+    with _cache_lock:
+        _cache[key] = (generation, etag, body)
+    return etag, body
+
+# Function to flatten nested generation tuples for the ETag
+def _flatten(generation):
+    for item in generation:
+        if isinstance(item, tuple):
+            yield from _flatten(item)
+        else:
+            yield item
+
+# Function to get the bid activity buckets of a section changed after revision `since`
+# Pollers pass back the returned rev, so each poll only carries the buckets that changed
+def get_activity_changes(section, since):
+    bids_file = get_section_files(section)['bids']
+    generation = activity.get_generation(bids_file)
+
+    key = ('activity', section)
+    with _cache_lock:
+        cached = _cache.get(key)
+    if cached is None or cached[0] != generation:
+        cached = (generation, activity.load(bids_file))
+        with _cache_lock:
+            _cache[key] = cached
+
+    rev, buckets = activity.changes_since(cached[1], since)
+    return {'rev': rev, 'buckets': buckets}
+
+class APIHandler(BaseHTTPRequestHandler):
+    server_version = "TECHIN510API/1.0"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parts = [part for part in url.path.split("/") if part]
+        sections = {get_section_slug(section): section for section in SECTIONS}
+
+        if len(parts) == 4 and parts[:2] == ['api', 'sections'] and parts[2] in sections and parts[3] == 'activity':
+            try:
+                since = int(parse_qs(url.query).get('since', ['0'])[0])
+            except ValueError:
+                self.send_json(400, {'error': "'since' must be a whole number"})
+                return
+            self.send_json(200, get_activity_changes(sections[parts[2]], since))
+            return
+
+        if len(parts) == 4 and parts[:2] == ['api', 'sections'] and parts[2] in sections and parts[3] == 'feed':
+            self.send_feed_page(sections[parts[2]], parse_qs(url.query))
+            return
+
+        if parts == ['api', 'sections']:
+            resource, section = 'sections', None
+        elif len(parts) == 4 and parts[:2] == ['api', 'sections'] and parts[2] in sections and parts[3] in SECTION_RESOURCES:
+            resource, section = parts[3], sections[parts[2]]
+        else:
+            self.send_json(404, {'error': f"Not found: {self.path}"})
+            return
+
+        try:
+            etag, body = get_response(resource, section)
+        except Exception as e:
+            self.send_json(500, {'error': str(e)})
+            return
+
+        # Conditional request: nothing changed since the client's copy
+        if_none_match = self.headers.get("If-None-Match", "")
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    # Function to send the page of a section's change feed after the request's cursor
+    def send_feed_page(self, section, query):
+        try:
+            limit = int(query.get('limit', [str(feed.DEFAULT_PAGE_SIZE)])[0])
+        except ValueError:
+            limit = 0
+        if not 1 <= limit <= feed.MAX_PAGE_SIZE:
+            self.send_json(400, {'error': f"'limit' must be a whole number from 1 to {feed.MAX_PAGE_SIZE}"})
+            return
+
+        cursor = query.get('cursor', [None])[0]
+        if cursor == "latest":
+            cursor = feed.get_cursor(section)
+        try:
+            self.send_json(200, feed.read_page(section, cursor, limit))
+        except feed.CursorError as e:
+            # The client has to start over from the beginning of the feed
+            self.send_json(410, {'error': str(e)})
+
+    # Function to send a JSON response without an ETag (errors, activity polls and feed pages)
+    def send_json(self, status, data):
+        body = codec.dumps(data)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve read-only JSON aggregates of the section data")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    args = parser.parse_args(argv)
+
+    server = ThreadingHTTPServer((args.host, args.port), APIHandler)
+    print(f"Serving on http://{args.host}:{args.port}/api/sections")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,11 +1,28 @@
 import streamlit as st
 import pandas as pd
 import os
-import json
 from datetime import datetime
 import plotly.express as px
 import plotly.graph_objects as go
 import uuid  # Import UUID for generating unique keys
+import activity
+import analytics
+import archive
+import bidmatrix
+import changelog
+import codec
+import console
+import feed
+import generations
+import integrity
+import memory
+import rounds
+import snapshots
+import topics
+import traces
+from records import Submission, Bid, BidItem, BidTable, parse_submissions, parse_bids
+from storage import (SECTIONS, DATA_DIR, get_section_slug, get_section_files, get_all_data_files, get_data_generation,
+                     read_section_file, write_section_file, restore_section_file)
 
 # Set page configuration
 st.set_page_config(
@@ -34,46 +51,21 @@ if 'reveal_top_bidders' not in st.session_state:
 if 'current_section' not in st.session_state:
     st.session_state.current_section = "Section A"
 
-# Available class sections
-SECTIONS = ["Section A", "Section B"]
+# Snapshot all data files in the background so changes can be restored
+snapshots.start_timer(get_all_data_files, lock_path=os.path.join(DATA_DIR, ".snapshot-timer.lock"))
 
-# File paths with section-specific files
-DATA_DIR = "data"
-os.makedirs(DATA_DIR, exist_ok=True)
-
-# Function to get section-specific file paths
-def get_section_files(section):
-    section_suffix = section.replace(" ", "_").lower()
-    return {
-        'submissions': os.path.join(DATA_DIR, f"submissions_{section_suffix}.json"),
-        'bids': os.path.join(DATA_DIR, f"bids_{section_suffix}.json")
-    }
+# Recluster project themes in the background when submissions change
+topics.start_reclusterer(
+    lambda: [get_section_files(section)['submissions'] for section in SECTIONS],
+    lock_path=os.path.join(DATA_DIR, ".topics.lock")
+)
 
-# Function to load existing submissions for current section
-def load_submissions():
-    section_files = get_section_files(st.session_state.current_section)
-    submissions_file = section_files['submissions']
+# Function to load existing submissions for current section (or the given section)
+def load_submissions(section=None):
+    section_files = get_section_files(section or st.session_state.current_section)
     
     try:
-        if os.path.exists(submissions_file):
-            # Check if file is empty
-            if os.path.getsize(submissions_file) == 0:
-                # File exists but is empty, return empty list
-                return []
-                
-            with open(submissions_file, 'r') as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    # Invalid JSON, create a new file with empty list
-                    with open(submissions_file, 'w') as f:
-                        json.dump([], f)
-                    return []
-        else:
-            # Create the file with an empty list
-            with open(submissions_file, 'w') as f:
-                json.dump([], f)
-            return []
+        return read_section_file(section_files['submissions'], parse_submissions)
     except Exception as e:
         st.error(f"Error loading submissions: {str(e)}")
         return []
@@ -84,60 +76,48 @@ def save_submission(name, netid, topic, description):
     submissions_file = section_files['submissions']
     
     try:
-        submissions = load_submissions()
-        
-        # Check if this netid already submitted
-        for submission in submissions:
-            if submission['netid'] == netid:
-                st.error(f"A submission with NetID {netid} already exists!")
-                return False
-        
-        # Add new submission
-        submission = {
-            'name': name,
-            'netid': netid,
-            'topic': topic,
-            'description': description,
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            'section': st.session_state.current_section
-        }
-        
-        submissions.append(submission)
-        
-        # Save to file
-        with open(submissions_file, 'w') as f:
-            json.dump(submissions, f, indent=4)
+        # Hold the lock from read to write so concurrent saves from other workers aren't lost
+        with generations.locked(submissions_file):
+            # Read directly so a file that can't be parsed stops the save instead of being overwritten
+            submissions = read_section_file(submissions_file, parse_submissions)
+            
+            # Check if this netid already submitted
+            for submission in submissions:
+                if submission.netid == netid:
+                    st.error(f"A submission with NetID {netid} already exists!")
+                    return False
+            
+            # Add new submission
+            submission = Submission(
+                name=name,
+                netid=netid,
+                topic=topic,
+                description=description,
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                section=st.session_state.current_section
+            )
+            
+            submissions.append(submission)
+            
+            # Save to file
+            previous_generation = generations.get(submissions_file)
+            write_section_file(submissions_file, submissions, [('put', len(submissions) - 1, submission.to_dict())])
+            feed.emit(st.session_state.current_section, [feed.submission_added(submission, f"Project {len(submissions)}")])
+            
+            # Put the new project in its nearest theme until the next background recluster
+            topics.add_document(submissions_file, submission, previous_generation)
         
         return True
     except Exception as e:
         st.error(f"Error saving submission: {str(e)}")
         return False
 
-# Function to load existing bids for current section
-def load_bids():
-    section_files = get_section_files(st.session_state.current_section)
-    bids_file = section_files['bids']
+# Function to load existing bids for current section (or the given section)
+def load_bids(section=None):
+    section_files = get_section_files(section or st.session_state.current_section)
     
     try:
-        if os.path.exists(bids_file):
-            # Check if file is empty
-            if os.path.getsize(bids_file) == 0:
-                # File exists but is empty, return empty list
-                return []
-                
-            with open(bids_file, 'r') as f:
-                try:
-                    return json.load(f)
-                except json.JSONDecodeError:
-                    # Invalid JSON, create a new file with empty list
-                    with open(bids_file, 'w') as f:
-                        json.dump([], f)
-                    return []
-        else:
-            # Create the file with an empty list
-            with open(bids_file, 'w') as f:
-                json.dump([], f)
-            return []
+        return read_section_file(section_files['bids'], parse_bids)
     except Exception as e:
         st.error(f"Error loading bids: {str(e)}")
         return []
@@ -148,39 +128,70 @@ def save_bid(netid, name, bids):
     bids_file = section_files['bids']
     
     try:
-        all_bids = load_bids()
-        
-        # Check if this netid already bid
-        for i, bid in enumerate(all_bids):
-            if bid['netid'] == netid:
-                # Update existing bid
-                all_bids[i] = {
-                    'netid': netid,
-                    'name': name,
-                    'bids': bids,
-                    'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                    'section': st.session_state.current_section
-                }
-                break
-        else:
-            # Add new bid
-            all_bids.append({
-                'netid': netid,
-                'name': name,
-                'bids': bids,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                'section': st.session_state.current_section
-            })
-        
-        # Save to file
-        with open(bids_file, 'w') as f:
-            json.dump(all_bids, f, indent=4)
+        # Hold the lock from read to write so concurrent saves from other workers aren't lost
+        with generations.locked(bids_file):
+            # Students assigned in an earlier round can't bid, and nobody can bid on a full project
+            round_problem = rounds.check_bid(rounds.load(bids_file), netid, bids)
+            if round_problem:
+                st.error(round_problem)
+                return False
+            
+            # Read directly so a file that can't be parsed stops the save instead of being overwritten
+            all_bids = read_section_file(bids_file, parse_bids)
+            
+            bid = Bid(
+                netid=netid,
+                name=name,
+                bids=tuple(bids),
+                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                section=st.session_state.current_section
+            )
+            
+            # Check if this netid already bid
+            old_items = ()
+            for i, existing_bid in enumerate(all_bids):
+                if existing_bid.netid == netid:
+                    # Update existing bid
+                    old_items = existing_bid.bids
+                    all_bids[i] = bid
+                    break
+            else:
+                # Add new bid
+                i = len(all_bids)
+                all_bids.append(bid)
+            
+            # Save to file
+            previous_generation = get_data_generation(st.session_state.current_section)
+            write_section_file(bids_file, all_bids, [('put', i, bid.to_dict())])
+            activity.record(bids_file, [(netid, old_items, bid.bids)])
+            feed.emit(st.session_state.current_section, [feed.bid_upserted(bid, old_items)])
+            integrity.update_bid(st.session_state.current_section, netid, bid, previous_generation)
         
         return True
     except Exception as e:
         st.error(f"Error saving bid: {str(e)}")
         return False
 
+# Function to add a user action to the traffic trace (only when TRACE_FILE is set, anonymized by traces.record)
+def trace_action(action, **fields):
+    if traces.TRACE_FILE is None:
+        return
+    if 'trace_session' not in st.session_state:
+        st.session_state.trace_session = uuid.uuid4().hex[:12]
+    
+    # The state the action started from, so a replay can put a fresh session in the same place
+    state = {
+        'section': st.session_state.current_section,
+        'authenticated': st.session_state.authenticated,
+        'reveal_topics': st.session_state.reveal_topics,
+        'bidding_enabled': st.session_state.bidding_enabled,
+        'reveal_bid_stats': st.session_state.reveal_bid_stats,
+        'reveal_top_bidders': st.session_state.reveal_top_bidders
+    }
+    if 'user_netid' in st.session_state and 'user_name' in st.session_state:
+        state['user'] = [st.session_state.user_name, st.session_state.user_netid]
+    traces.record(st.session_state.trace_session, action, state, **fields)
+
 # Function to toggle reveal topics state
 def toggle_reveal():
     st.session_state.reveal_topics = not st.session_state.reveal_topics
@@ -222,17 +233,29 @@ def delete_bid(netid):
     bids_file = section_files['bids']
     
     try:
-        all_bids = load_bids()
-        
-        # Find and remove the bid with the given netid
-        for i, bid in enumerate(all_bids):
-            if bid['netid'] == netid:
-                del all_bids[i]
-                break
-        
-        # Save the updated bids
-        with open(bids_file, 'w') as f:
-            json.dump(all_bids, f, indent=4)
+        with generations.locked(bids_file):
+            all_bids = read_section_file(bids_file, parse_bids)
+            
+            # Snapshot before removing anything so the bid can be restored
+            snapshots.snapshot(bids_file, reason=f"before deleting bid {netid}")
+            
+            # Find and remove the bid with the given netid
+            ops = []
+            changes = []
+            for i, bid in enumerate(all_bids):
+                if bid.netid == netid:
+                    del all_bids[i]
+                    ops.append(('del', i))
+                    changes.append((netid, bid.bids, None))
+                    break
+            
+            # Save the updated bids
+            previous_generation = get_data_generation(st.session_state.current_section)
+            write_section_file(bids_file, all_bids, ops)
+            activity.record(bids_file, changes)
+            feed.emit(st.session_state.current_section, [feed.bid_deleted(netid, old_items) for netid, old_items, _ in changes])
+            if changes:
+                integrity.update_bid(st.session_state.current_section, netid, None, previous_generation)
         
         return True
     except Exception as e:
@@ -255,9 +278,15 @@ def clear_submissions():
     submissions_file = section_files['submissions']
     
     try:
-        # Create empty submissions file
-        with open(submissions_file, 'w') as f:
-            json.dump([], f)
+        with generations.locked(submissions_file):
+            submissions = read_section_file(submissions_file, parse_submissions)
+            
+            # Snapshot first so the cleared submissions can be restored
+            snapshots.snapshot(submissions_file, reason="before clear")
+            
+            # Create empty submissions file
+            write_section_file(submissions_file, [], [('clear',)])
+            feed.emit(st.session_state.current_section, [feed.section_cleared('submissions', len(submissions))])
         return True
     except Exception as e:
         st.error(f"Error clearing submissions: {str(e)}")
@@ -269,19 +298,337 @@ def clear_bids():
     bids_file = section_files['bids']
     
     try:
-        # Create empty bids file
-        with open(bids_file, 'w') as f:
-            json.dump([], f)
+        with generations.locked(bids_file):
+            all_bids = read_section_file(bids_file, parse_bids)
+            
+            # Snapshot first so the cleared bids can be restored
+            snapshots.snapshot(bids_file, reason="before clear")
+            
+            # Create empty bids file
+            write_section_file(bids_file, [], [('clear',)])
+            activity.record(bids_file, [(bid.netid, bid.bids, None) for bid in all_bids])
+            feed.emit(st.session_state.current_section, [feed.section_cleared('bids', len(all_bids))])
         return True
     except Exception as e:
         st.error(f"Error clearing bids: {str(e)}")
         return False
 
-# Main app layout
-def main():
-    st.title("TECHIN510 Project Topic Submission")
+# Function to close the current bidding round for current section
+# Assigns students to projects, then clears the bids so the unassigned students can bid again
+def close_round(seats):
+    section = st.session_state.current_section
+    section_files = get_section_files(section)
+    bids_file = section_files['bids']
     
-    # Sidebar for admin login and user identification
+    try:
+        with generations.locked(bids_file):
+            all_bids = read_section_file(bids_file, parse_bids)
+            project_ids = [f"Project {i+1}" for i in range(len(load_submissions(section)))]
+            state = rounds.close_round(bids_file, project_ids, BidTable.from_bids(all_bids), seats)
+            
+            # Snapshot first so the round's bids can be restored
+            snapshots.snapshot(bids_file, reason=f"round {state['history'][-1]['round']} closed")
+            
+            write_section_file(bids_file, [], [('clear',)])
+            activity.record(bids_file, [(bid.netid, bid.bids, None) for bid in all_bids])
+            feed.emit(section, [feed.section_cleared('bids', len(all_bids), f"round {state['history'][-1]['round']} closed")])
+        return state
+    except Exception as e:
+        st.error(f"Error closing round: {str(e)}")
+        return None
+
+# Function to start the bidding rounds of current section over
+def reset_rounds():
+    bids_file = get_section_files(st.session_state.current_section)['bids']
+    
+    try:
+        with generations.locked(bids_file):
+            rounds.reset(bids_file)
+        return True
+    except Exception as e:
+        st.error(f"Error resetting rounds: {str(e)}")
+        return False
+
+# Function to archive current section's submissions and bids under a term and start the section over empty
+def archive_term(term):
+    section = st.session_state.current_section
+    
+    try:
+        return archive.archive_section(term, section)
+    except Exception as e:
+        st.error(f"Error archiving {section}: {str(e)}")
+        return None
+
+# Function to restore submissions or bids for current section from a snapshot
+def restore_snapshot(kind, snapshot_id):
+    try:
+        restore_section_file(st.session_state.current_section, kind, snapshot_id)
+        return True
+    except Exception as e:
+        st.error(f"Error restoring {kind}: {str(e)}")
+        return False
+
+# Use Streamlit fragments when available so a panel can rerun without rerunning the whole page
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+# Function to get a fragment decorator that reruns the panel on its own every few seconds
+# Falls back to a plain fragment (refreshed by the page's own reruns) on Streamlit versions without run_every
+def auto_refresh_fragment(seconds):
+    try:
+        return fragment(run_every=seconds)
+    except TypeError:
+        return fragment
+
+# Function to get the submissions and bids of a section (cached per data generation)
+# The lists are shared by every session, so callers must not modify them
+@memory.lru_cache("section_data", max_entries=8)
+def get_section_data(section, generation):
+    return load_submissions(section), load_bids(section)
+
+# Function to get the flattened bid items of a section as columns (cached per data generation)
+@memory.lru_cache("bid_table", max_entries=8)
+def get_bid_table(section, generation):
+    return BidTable.from_bids(get_section_data(section, generation)[1])
+
+# Function to build the bidding form view model of a section (cached per data generation)
+# Each session only applies its own exclusion and defaults on top of it
+@memory.lru_cache("bidding_view_model", max_entries=8)
+def get_bidding_view_model(section, generation):
+    submissions, bids = get_section_data(section, generation)
+    project_ids = [f"Project {i+1}" for i in range(len(submissions))]
+    titles = [submission.topic for submission in submissions]
+    return {
+        'project_ids': project_ids,
+        'titles': titles,
+        'options': [f"{project_id}: {title}" for project_id, title in zip(project_ids, titles)],
+        'option_index': {project_id: i for i, project_id in enumerate(project_ids)},
+        'owner_index': {submission.netid: i for i, submission in enumerate(submissions)},
+        'bids_by_netid': {bid.netid: bid.bids for bid in bids}
+    }
+
+# Function to get the integrity report of a section (cached per data generation)
+@memory.lru_cache("integrity_report", max_entries=8)
+def get_integrity_report(section, generation):
+    return integrity.get_report(section)
+
+# Function to get the bidding rounds of a section (cached per rounds generation)
+@memory.lru_cache("bidding_rounds", max_entries=8)
+def get_round_state(section, generation):
+    return rounds.load(get_section_files(section)['bids'])
+
+# Function to get the generations the query console's tables are built from: every section's data and rounds
+def get_query_generations():
+    return tuple((get_data_generation(section), rounds.get_generation(get_section_files(section)['bids']))
+                 for section in SECTIONS)
+
+# Function to get the query console's in-memory database of every section (cached per data generation)
+# Built from the cached section data, so a query never rereads the data files
+@memory.lru_cache("query_database", max_entries=2, per_section=False)
+def get_query_database(generations):
+    return console.Database({
+        name: get_section_data(name, data_generation) + (get_round_state(name, rounds_generation),)
+        for name, (data_generation, rounds_generation) in zip(SECTIONS, generations)
+    })
+
+# Function to build a student's bid distribution over every other project (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_bid_distribution(section, generation, netid):
+    view_model = get_bidding_view_model(section, generation)
+
+    # Fill in zeros for projects without bids
+    points = [0] * len(view_model['options'])
+    for bid in view_model['bids_by_netid'].get(netid, []):
+        i = view_model['option_index'].get(bid.project_id)
+        if i is not None:
+            points[i] = bid.points
+
+    bid_df = pd.DataFrame({'Project': view_model['options'], 'Points': points})
+
+    # Exclude the student's own project and sort by points (descending)
+    own_index = view_model['owner_index'].get(netid)
+    if own_index is not None:
+        bid_df = bid_df.drop(index=own_index)
+    return bid_df.sort_values('Points', ascending=False, kind='stable')
+
+# Function to get the bid activity buckets of a section (cached per activity generation)
+# The buckets are shared by every session, so callers must not modify them
+@memory.lru_cache("bid_activity", max_entries=8)
+def get_bid_activity(section, generation):
+    return activity.load(get_section_files(section)['bids'])
+
+# Function to get the topic model of a section: themes and similar projects (cached per topic model generation)
+# The model is shared by every session, so callers must not modify it
+@memory.lru_cache("topic_model", max_entries=8)
+def get_topic_model(section, generation):
+    return topics.load_model(get_section_files(section)['submissions'])
+
+# Function to get the theme of every project in a section (cached per topic model generation)
+# Returns None while the themes are being rebuilt after submissions were cleared or restored
+@memory.lru_cache("project_themes", max_entries=8)
+def get_project_themes(section, generation, count):
+    model = get_topic_model(section, generation)
+    assignments = topics.get_assignments(model, count)
+    if assignments is None:
+        return None
+    labels = [cluster['label'] for cluster in model['clusters']]
+    return [labels[cluster] if cluster >= 0 else "Not grouped yet" for cluster in assignments]
+
+# Function to show a theme filter for a list of projects and return the selected theme (None for all)
+def select_theme(themes, key):
+    if not themes or len(set(themes)) < 2:
+        return None
+    counts = pd.Series(themes).value_counts()
+    options = {f"{theme} ({count})": theme for theme, count in counts.items()}
+    selected = st.selectbox("Browse by theme", options=["All themes"] + list(options), key=key)
+    return options.get(selected)
+
+# Function to build a bar chart with rotated x-axis labels
+def make_bar_chart(df, x, y, title):
+    fig = px.bar(
+        df,
+        x=x,
+        y=y,
+        title=title
+    )
+    
+    # Customize the layout
+    fig.update_layout(
+        xaxis=dict(
+            tickangle=45,
+            tickmode='array',
+            tickvals=list(range(len(df))),
+            ticktext=df[x]
+        ),
+        margin=dict(b=100)  # Add bottom margin for rotated labels
+    )
+    return fig
+
+# Function to get the most bid-on topics of every archived term (cached per archive generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_archived_popularity(generation, limit):
+    return archive.topic_popularity(limit)
+
+# Function to follow a topic keyword across the archived terms (cached per archive generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_keyword_trend(generation, keyword):
+    return archive.keyword_trend(keyword)
+
+# Function to build the project popularity statistics for a section (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_project_stats(section, generation):
+    return analytics.project_stats(get_bid_table(section, generation))
+
+# Function to find everyone who bid on a project, highest points first (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_project_bidders(section, generation, project_id):
+    return analytics.project_bidders(get_bid_table(section, generation), project_id)
+
+# Function to build the admin bid tables for a section (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_admin_bid_tables(section, generation):
+    return analytics.admin_bid_tables(get_bid_table(section, generation))
+
+# Function to build the CSV downloads for a section (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_export_csvs(section, generation):
+    submissions = get_section_data(section, generation)[0]
+    
+    submissions_csv = None
+    if submissions:
+        submissions_csv = pd.DataFrame([submission.to_dict() for submission in submissions]).to_csv(index=False)
+    
+    # Convert bids to a flat dataframe
+    bids_csv = None
+    bid_table = get_bid_table(section, generation)
+    if len(bid_table):
+        bids_csv = analytics.flat_bids_frame(bid_table, section).to_csv(index=False)
+    
+    return submissions_csv, bids_csv
+
+# Function to get the file a section's exports are listed in
+def get_exports_file(section):
+    return changelog.get_exports_path(DATA_DIR, get_section_slug(section))
+
+# Function to get the change log cursors of the data an export at `generation` contains
+# Returns None if a write landed in between; writes bump the generation before logging, so that shows here
+def get_export_cursors(section, generation):
+    cursors = {kind: changelog.get_cursor(path) for kind, path in get_section_files(section).items()}
+    if get_data_generation(section) != generation:
+        return None
+    return cursors
+
+# Function to remember a download so later ones can include only what changed since
+def remember_export(section, cursors, kind):
+    if cursors is not None:
+        changelog.record_export(get_exports_file(section), cursors, kind)
+
+# Function to build CSVs of what changed in a section since an export (cached per data generation)
+# Only the change log since the export's cursors is read, never the whole section
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_delta_csvs(section, generation, submissions_cursor, bids_cursor):
+    section_files = get_section_files(section)
+    submission_changes = changelog.changes_since(section_files['submissions'], submissions_cursor)
+    bid_changes = changelog.changes_since(section_files['bids'], bids_cursor)
+    if submission_changes is None or bid_changes is None:
+        return None
+    
+    submissions_cursor, submission_upserts, submission_deletes = submission_changes
+    bids_cursor, bid_upserts, bid_deletes = bid_changes
+    
+    submission_rows = [dict(record, change='upsert') for record in submission_upserts.values()]
+    submission_rows += [{'change': 'delete', 'netid': netid} for netid in sorted(submission_deletes)]
+    bid_rows = [
+        {'change': 'upsert', 'netid': record['netid'], 'name': record['name'], 'project_id': item['project_id'],
+         'project_title': item['project_title'], 'points': item['points'], 'timestamp': record['timestamp'],
+         'section': section}
+        for record in bid_upserts.values() for item in record['bids']
+    ]
+    bid_rows += [{'change': 'delete', 'netid': netid, 'section': section} for netid in sorted(bid_deletes)]
+    
+    return {
+        'cursors': {'submissions': submissions_cursor, 'bids': bids_cursor},
+        'submissions': len(submission_upserts),
+        'bids': len(bid_upserts),
+        'deletions': len(submission_deletes) + len(bid_deletes),
+        'submissions_csv': pd.DataFrame(submission_rows, columns=[
+            'change', 'name', 'netid', 'topic', 'description', 'timestamp', 'section']).to_csv(index=False),
+        'bids_csv': pd.DataFrame(bid_rows, columns=[
+            'change', 'netid', 'name', 'project_id', 'project_title', 'points', 'timestamp', 'section']).to_csv(index=False)
+    }
+
+# Function to build indented JSON downloads of a section's data files (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_export_json(section, generation):
+    submissions, bids = get_section_data(section, generation)
+    return (
+        codec.dumps([submission.to_dict() for submission in submissions], pretty=True),
+        codec.dumps([bid.to_dict() for bid in bids], pretty=True)
+    )
+
+# Function to build the sparse student x project bid matrix download of a section (cached per data generation)
+@st.cache_data(show_spinner=False, max_entries=memory.CACHE_MAX_ENTRIES)
+def get_export_npz(section, generation):
+    return bidmatrix.to_npz_bytes(bidmatrix.BidMatrix.from_bid_table(get_bid_table(section, generation)))
+
+# Function to show the top bidders table and chart for a project
+def render_top_bidders(top_bidders, key_prefix):
+    # Create a DataFrame for display
+    top_df = pd.DataFrame(top_bidders)
+    st.dataframe(top_df)
+    
+    # Show a bar chart of top bidders
+    if len(top_bidders) > 0:
+        chart_data = pd.DataFrame({
+            'Student': [f"{b['Student']} ({b['NetID']})" for b in top_bidders],
+            'Points': [b['Points'] for b in top_bidders]
+        })
+        fig = make_bar_chart(chart_data, 'Student', 'Points', 'Top Bidders for Your Project')
+        
+        # Display the Plotly chart with a unique key
+        st.plotly_chart(fig, use_container_width=True, key=f"{key_prefix}_{uuid.uuid4()}")
+
+# Sidebar: section selector, admin panel and user identification
+def render_sidebar():
     with st.sidebar:
         # Section selector (always visible)
         st.header("Class Section")
@@ -293,6 +640,7 @@ def main():
         
         # Update current section if changed
         if selected_section != st.session_state.current_section:
+            trace_action('section', value=selected_section)
             st.session_state.current_section = selected_section
             # Clear user identification when switching sections
             if 'user_name' in st.session_state:
@@ -311,122 +659,856 @@ def main():
                 if submit_button:
                     authenticate(password)
         else:
-            st.success("Authenticated as Admin")
-            
-            # Admin controls
-            if st.button("Toggle Topic Visibility", key="toggle"):
-                toggle_reveal()
-            
-            if st.button("Toggle Bidding", key="toggle_bid"):
-                toggle_bidding()
-            
-            if st.button("Toggle Bid Statistics Visibility", key="toggle_stats"):
-                toggle_bid_stats()
-            
-            if st.button("Toggle Top Bidders Visibility", key="toggle_top"):
-                toggle_top_bidders()
-            
-            # Data management section
-            st.subheader("Data Management")
-            
-            # Use expanders for clear data operations to avoid session state issues
-            with st.expander(f"Clear All Submissions ({st.session_state.current_section})"):
-                st.warning(f"⚠️ This will delete ALL submissions for {st.session_state.current_section}. This action cannot be undone!")
-                if st.button("Clear All Submissions", key="clear_submissions_btn"):
-                    if clear_submissions():
-                        st.success(f"All submissions for {st.session_state.current_section} have been cleared!")
-                        st.rerun()
-            
-            with st.expander(f"Clear All Bids ({st.session_state.current_section})"):
-                st.warning(f"⚠️ This will delete ALL bids for {st.session_state.current_section}. This action cannot be undone!")
-                if st.button("Clear All Bids", key="clear_bids_btn"):
-                    if clear_bids():
-                        st.success(f"All bids for {st.session_state.current_section} have been cleared!")
-                        st.rerun()
+            render_admin_controls()
+        
+        # User identification for bidding
+        if st.session_state.reveal_topics and st.session_state.bidding_enabled:
+            render_identify_form()
+
+# Admin controls in the sidebar
+def render_admin_controls():
+    section = st.session_state.current_section
+    
+    st.success("Authenticated as Admin")
+    
+    # Admin controls
+    if st.button("Toggle Topic Visibility", key="toggle"):
+        trace_action('toggle', key="toggle")
+        toggle_reveal()
+    
+    if st.button("Toggle Bidding", key="toggle_bid"):
+        trace_action('toggle', key="toggle_bid")
+        toggle_bidding()
+    
+    if st.button("Toggle Bid Statistics Visibility", key="toggle_stats"):
+        trace_action('toggle', key="toggle_stats")
+        toggle_bid_stats()
+    
+    if st.button("Toggle Top Bidders Visibility", key="toggle_top"):
+        trace_action('toggle', key="toggle_top")
+        toggle_top_bidders()
+    
+    # Data management section
+    st.subheader("Data Management")
+    
+    # Use expanders for clear data operations to avoid session state issues
+    with st.expander(f"Clear All Submissions ({section})"):
+        st.warning(f"⚠️ This will delete ALL submissions for {section}. A snapshot is taken first and can be restored below.")
+        if st.button("Clear All Submissions", key="clear_submissions_btn"):
+            trace_action('clear', kind='submissions')
+            if clear_submissions():
+                st.success(f"All submissions for {section} have been cleared!")
+                st.rerun()
+    
+    with st.expander(f"Clear All Bids ({section})"):
+        st.warning(f"⚠️ This will delete ALL bids for {section}. A snapshot is taken first and can be restored below.")
+        if st.button("Clear All Bids", key="clear_bids_btn"):
+            trace_action('clear', kind='bids')
+            if clear_bids():
+                st.success(f"All bids for {section} have been cleared!")
+                st.rerun()
+    
+    with st.expander(f"Bidding Rounds ({section})"):
+        round_state = get_round_state(section, rounds.get_generation(get_section_files(section)['bids']))
+        round_number = round_state['round']
+        
+        if round_state['history']:
+            project_ids = [f"Project {i+1}" for i in range(len(get_section_data(section, get_data_generation(section))[0]))]
+            open_seats = sum(rounds.open_seats(round_state, project_id) for project_id in project_ids)
+            st.write(f"**Assigned students:** {len(round_state['assignments'])} · **Open seats:** {open_seats}")
+            st.dataframe(pd.DataFrame([
+                {'Round': entry['round'], 'Closed': entry['closed'], 'Bidders': entry['bidders'],
+                 'Assigned': entry['assigned'], 'Open Seats': entry['open_seats']}
+                for entry in round_state['history']
+            ]), hide_index=True)
+            st.dataframe(pd.DataFrame([
+                {'NetID': netid, 'Project': f"{assignment['project_id']}: {assignment['project_title']}",
+                 'Points': assignment['points'], 'Round': assignment['round']}
+                for netid, assignment in round_state['assignments'].items()
+            ]), hide_index=True)
+        
+        # Seats are fixed by the first round
+        if round_state['default_seats'] is None:
+            seats = st.number_input("Seats per project", min_value=1, max_value=50, value=rounds.DEFAULT_SEATS, key="round_seats")
+        else:
+            seats = round_state['default_seats']
+        
+        st.warning(f"⚠️ Closing round {round_number} assigns students by their bids, locks them in, and clears "
+                   f"the bids so unassigned students can bid again on projects with open seats. "
+                   f"A snapshot of the bids is taken first.")
+        if st.button(f"Close Round {round_number}", key="close_round_btn"):
+            trace_action('close_round', seats=seats)
+            state = close_round(seats)
+            if state is not None:
+                st.success(f"Round {round_number} closed: {state['history'][-1]['assigned']} students assigned.")
+                st.rerun()
+        
+        if round_state['history'] and st.button("Reset Rounds", key="reset_rounds_btn"):
+            if reset_rounds():
+                st.success(f"Bidding rounds for {section} have been reset.")
+                st.rerun()
+    
+    with st.expander(f"Archive Term ({section})"):
+        archive_term_name = st.text_input("Term", placeholder="e.g. Autumn 2025", key="archive_term")
+        st.warning(f"⚠️ This moves ALL submissions, bids and round assignments of {section} into the term archive "
+                   f"and starts the section over empty. A snapshot is taken first.")
+        if st.button(f"Archive {section}", key="archive_btn"):
+            if not archive_term_name.strip():
+                st.error("Please enter the term to archive under.")
+            else:
+                entry = archive_term(archive_term_name)
+                if entry is not None:
+                    st.success(f"Archived {entry['submissions']} submissions and {entry['bidders']} bids of {section} as {entry['term']}.")
+                    st.rerun()
+    
+    with st.expander(f"Restore from Snapshot ({section})"):
+        restore_kind = st.radio("Data to restore", options=['submissions', 'bids'], horizontal=True, key="restore_kind")
+        restore_file = get_section_files(section)[restore_kind]
+        # Listed from the manifest file names; only the selected manifest is read
+        snapshot_ids = list(reversed(snapshots.list_snapshot_ids(restore_file)))
+        
+        if not snapshot_ids:
+            st.info(f"No snapshots of {restore_kind} yet.")
+        else:
+            selected_snapshot = st.selectbox(
+                "Snapshot",
+                options=snapshot_ids,
+                format_func=snapshots.get_snapshot_time,
+                key="restore_snapshot_id"
+            )
+            manifest = snapshots.load_manifest(restore_file, selected_snapshot)
+            snapshot_label = f"{manifest['created']} - {manifest['count']} records ({manifest['reason']})"
+            st.caption(f"{manifest['count']} records ({manifest['reason']})")
+            st.warning("The current data is snapshotted before restoring, so this can be undone.")
+            if st.button("Restore Snapshot", key="restore_snapshot_btn"):
+                if restore_snapshot(restore_kind, selected_snapshot):
+                    st.success(f"Restored {restore_kind} for {section} from {snapshot_label}")
+                    st.rerun()
+    
+    # Download data, remembering where the change logs were so later downloads can be deltas
+    generation = get_data_generation(section)
+    submissions_csv, bids_csv = get_export_csvs(section, generation)
+    export_cursors = get_export_cursors(section, generation)
+    if submissions_csv:
+        st.download_button(
+            label=f"Download {section} Submissions (CSV)",
+            data=submissions_csv,
+            file_name=f"project_submissions_{section.lower().replace(' ', '_')}.csv",
+            mime="text/csv",
+            on_click=remember_export,
+            args=(section, export_cursors, "full")
+        )
+    
+    # Download bids
+    if bids_csv:
+        st.download_button(
+            label=f"Download {section} Bids (CSV)",
+            data=bids_csv,
+            file_name=f"project_bids_{section.lower().replace(' ', '_')}.csv",
+            mime="text/csv",
+            on_click=remember_export,
+            args=(section, export_cursors, "full")
+        )
+    
+    # Download only what changed since an earlier download
+    with st.expander(f"Changes Since an Earlier Export ({section})"):
+        exports = list(reversed(changelog.list_exports(get_exports_file(section))))
+        if not exports:
+            st.info("Download the CSVs above once; later you can download only what changed since.")
+        else:
+            export_labels = [f"Export {export['id']} ({export['kind']}, {export['created']})" for export in exports]
+            export_label = st.selectbox("Changes since", options=export_labels, key="delta_export")
+            export = exports[export_labels.index(export_label)]
+            delta = get_delta_csvs(section, generation, export['cursors']['submissions'], export['cursors']['bids'])
             
-            # Download data
-            submissions = load_submissions()
-            if submissions:
-                df = pd.DataFrame(submissions)
-                csv = df.to_csv(index=False)
+            if delta is None:
+                st.warning("The data was restored or edited outside the app since that export, "
+                           "so only the full CSVs above are accurate.")
+            else:
+                st.write(f"**Since export {export['id']}:** {delta['submissions']} submissions and "
+                         f"{delta['bids']} bids added or changed, {delta['deletions']} removed.")
+                st.caption("Each row's `change` is `upsert` or `delete`; replace every row of an upserted or deleted "
+                           "NetID with the rows given here.")
+                st.download_button(
+                    label=f"Download {section} Submission Changes (CSV)",
+                    data=delta['submissions_csv'],
+                    file_name=f"project_submissions_{section.lower().replace(' ', '_')}_since_{export['id']}.csv",
+                    mime="text/csv",
+                    on_click=remember_export,
+                    args=(section, delta['cursors'], "changes")
+                )
                 st.download_button(
-                    label=f"Download {st.session_state.current_section} Submissions (CSV)",
-                    data=csv,
-                    file_name=f"project_submissions_{st.session_state.current_section.lower().replace(' ', '_')}.csv",
-                    mime="text/csv"
+                    label=f"Download {section} Bid Changes (CSV)",
+                    data=delta['bids_csv'],
+                    file_name=f"project_bids_{section.lower().replace(' ', '_')}_since_{export['id']}.csv",
+                    mime="text/csv",
+                    on_click=remember_export,
+                    args=(section, delta['cursors'], "changes")
                 )
+    
+    # Download bids as a sparse student x project matrix for analysis in NumPy/SciPy
+    if bids_csv:
+        st.download_button(
+            label=f"Download {section} Bid Matrix (NPZ)",
+            data=get_export_npz(section, get_data_generation(section)),
+            file_name=f"project_bids_{section.lower().replace(' ', '_')}.npz",
+            mime="application/octet-stream"
+        )
+    
+    # Download the raw data files as indented JSON, only built when asked for
+    if st.checkbox("Show JSON downloads", key="show_json_downloads"):
+        submissions_json, bids_json = get_export_json(section, get_data_generation(section))
+        st.download_button(
+            label=f"Download {section} Submissions (JSON)",
+            data=submissions_json,
+            file_name=f"project_submissions_{section.lower().replace(' ', '_')}.json",
+            mime="application/json"
+        )
+        st.download_button(
+            label=f"Download {section} Bids (JSON)",
+            data=bids_json,
+            file_name=f"project_bids_{section.lower().replace(' ', '_')}.json",
+            mime="application/json"
+        )
+    
+    # Change password
+    with st.expander("Change Admin Password"):
+        with st.form("change_password_form"):
+            current_pwd = st.text_input("Current Password", type="password")
+            new_pwd = st.text_input("New Password", type="password")
+            confirm_pwd = st.text_input("Confirm New Password", type="password")
             
-            # Download bids
-            bids = load_bids()
-            if bids:
-                # Convert bids to a flat dataframe
-                bid_rows = []
-                for bid in bids:
-                    for project_bid in bid['bids']:
-                        bid_rows.append({
-                            'netid': bid['netid'],
-                            'name': bid['name'],
-                            'project_id': project_bid['project_id'],
-                            'project_title': project_bid['project_title'],
-                            'points': project_bid['points'],
-                            'timestamp': bid['timestamp'],
-                            'section': st.session_state.current_section
-                        })
+            if st.form_submit_button("Change Password"):
+                if new_pwd != confirm_pwd:
+                    st.error("New passwords don't match!")
+                else:
+                    change_password(current_pwd, new_pwd)
+
+# Sidebar form for students to identify themselves before bidding
+def render_identify_form():
+    st.header("Identify Yourself for Bidding")
+    with st.form("user_id_form"):
+        user_name = st.text_input("Your Name")
+        user_netid = st.text_input("Your UW NetID")
+        submit_id = st.form_submit_button("Identify")
+        
+        if submit_id:
+            trace_action('identify', name=user_name, netid=user_netid)
+            if not user_name or not user_netid:
+                st.error("Please enter your name and NetID")
+            else:
+                # Verify that the name and NetID match a submission
+                submissions = load_submissions()
+                valid_user = False
                 
-                if bid_rows:
-                    bid_df = pd.DataFrame(bid_rows)
-                    bid_csv = bid_df.to_csv(index=False)
-                    st.download_button(
-                        label=f"Download {st.session_state.current_section} Bids (CSV)",
-                        data=bid_csv,
-                        file_name=f"project_bids_{st.session_state.current_section.lower().replace(' ', '_')}.csv",
-                        mime="text/csv"
-                    )
+                for submission in submissions:
+                    if submission.netid.lower() == user_netid.lower() and submission.name.lower() == user_name.lower():
+                        valid_user = True
+                        # Use the exact name and netid from the submission to ensure consistency
+                        st.session_state.user_name = submission.name
+                        st.session_state.user_netid = submission.netid
+                        st.success(f"Identified as {submission.name} ({submission.netid}) in {st.session_state.current_section}")
+                        break
+                
+                if not valid_user:
+                    st.error(f"Your name and NetID don't match any project submission in {st.session_state.current_section}. Please use the same name and NetID you used when submitting your project topic.")
+
+# Troubleshooting help for the top bidders feature
+def render_top_bidders_help(section, generation, submissions):
+    st.success("Top bidders visibility is enabled! Project owners can now see the top 3 bidders for their projects.")
+    
+    # Add debugging information
+    with st.expander("Troubleshooting Top Bidders Visibility"):
+        st.write("If you can't see the top bidders for your project, check the following:")
+        
+        # Check if user is identified
+        if 'user_netid' not in st.session_state:
+            st.write("❌ You are not identified")
+            st.write("Please identify yourself in the sidebar to see top bidders for your project.")
+            st.warning("Please identify yourself in the sidebar to see top bidders for your project.")
+            return
+        
+        st.write(f"✅ You are identified as: {st.session_state.user_name} ({st.session_state.user_netid})")
+        
+        # Check if user has a project
+        user_project_id = None
+        user_project_title = None
+        for i, submission in enumerate(submissions):
+            if submission.netid == st.session_state.user_netid:
+                user_project_id = f"Project {i+1}"
+                user_project_title = submission.topic
+                break
+        
+        if user_project_id is None:
+            st.write("❌ You haven't submitted a project")
+            st.write("Only project owners can see the top bidders for their projects.")
+            st.warning("You haven't submitted a project, so you won't see any top bidders information.")
+            return
+        
+        st.write(f"✅ You have submitted a project: {user_project_id}: {user_project_title}")
+        
+        # Check if there are bids on the user's project
+        project_bids = get_project_bidders(section, generation, user_project_id)
+        if project_bids:
+            st.write(f"✅ There are {len(project_bids)} bids on your project")
+            st.write("You should see the top bidders section below.")
             
-            # Change password
-            with st.expander("Change Admin Password"):
-                with st.form("change_password_form"):
-                    current_pwd = st.text_input("Current Password", type="password")
-                    new_pwd = st.text_input("New Password", type="password")
-                    confirm_pwd = st.text_input("Confirm New Password", type="password")
+            # Display top bidders directly here for better visibility
+            st.subheader("👑 Top Bidders for Your Project")
+            render_top_bidders(project_bids[:3], "top_bidders_chart")
+        elif get_project_stats(section, generation) is None:
+            st.write("❌ There are no bids in the system yet")
+        else:
+            st.write("❌ There are no bids on your project yet")
+            st.write("Once other students bid on your project, you'll see the top bidders section.")
+        
+        st.info("Look for the 'Top Bidders for Your Project' section above.")
+
+# List of all project topics
+def render_project_list(section, generation, submissions):
+    submissions_file = get_section_files(section)['submissions']
+    themes = get_project_themes(section, topics.get_generation(submissions_file), len(submissions))
+    selected_theme = select_theme(themes, "theme_filter")
+    
+    for i, submission in enumerate(submissions):
+        if selected_theme is not None and themes[i] != selected_theme:
+            continue
+        project_id = f"Project {i+1}"
+        project_title = submission.topic
+        
+        with st.expander(f"{project_id}: {project_title} (by {submission.name})"):
+            st.write(f"**Description:** {submission.description}")
+            if themes:
+                st.write(f"**Theme:** {themes[i]}")
+            st.write(f"**Submitted by:** {submission.name} ({submission.netid})")
+            st.write(f"**Submitted on:** {submission.timestamp}")
+            
+            # Show top bidders for this project if enabled and if the current user is the project owner
+            if st.session_state.reveal_top_bidders and 'user_netid' in st.session_state:
+                # Check if current user is the project owner
+                is_owner = submission.netid == st.session_state.user_netid
+                
+                if is_owner:
+                    st.markdown("---")
+                    st.markdown("### 👑 Top Bidders for Your Project (Expander View)")
+                    st.write("For better visibility, the top bidders are also shown at the top of the page.")
                     
-                    if st.form_submit_button("Change Password"):
-                        if new_pwd != confirm_pwd:
-                            st.error("New passwords don't match!")
+                    # Display top bidders in the expander view too
+                    if get_project_stats(section, generation) is not None:
+                        project_bids = get_project_bidders(section, generation, project_id)
+                        if project_bids:
+                            render_top_bidders(project_bids[:3], "expander_chart")
                         else:
-                            change_password(current_pwd, new_pwd)
+                            st.info("No bids have been placed on your project yet.")
+
+# Overall bid statistics shown to students
+def render_bid_statistics(section, generation):
+    stats = get_project_stats(section, generation)
+    if stats is None:
+        return
+    project_stats, points_per_project, bids_per_project = stats
+    
+    st.subheader("Project Popularity Overview")
+    
+    # Display comprehensive statistics table
+    st.write("**Project Popularity Statistics:**")
+    st.dataframe(project_stats)
+    
+    # Create two columns for charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        st.write("**Total Points by Project:**")
+        fig1 = make_bar_chart(points_per_project, 'Project', 'Points', 'Total Points by Project')
+        st.plotly_chart(fig1, use_container_width=True, key=f"public_points_chart_{uuid.uuid4()}")
+    
+    with col2:
+        st.write("**Number of Bids by Project:**")
+        fig2 = make_bar_chart(bids_per_project, 'Project', 'Number of Bids', 'Number of Bids by Project')
+        st.plotly_chart(fig2, use_container_width=True, key=f"public_bids_chart_{uuid.uuid4()}")
+
+# Bidding form, confirmation flow and the user's current bid distribution
+# Runs as a fragment so interacting with it doesn't rerun the rest of the page
+@fragment
+def render_bidding():
+    # Check if we need to handle a bid confirmation
+    if st.session_state.confirm_bid and st.session_state.bid_data:
+        bid_data = st.session_state.bid_data
+        st.warning(f"You've only allocated {bid_data['total_points']}/100 points. Are you sure you want to continue?")
         
-        # User identification for bidding
-        if st.session_state.reveal_topics and st.session_state.bidding_enabled:
-            st.header("Identify Yourself for Bidding")
-            with st.form("user_id_form"):
-                user_name = st.text_input("Your Name")
-                user_netid = st.text_input("Your UW NetID")
-                submit_id = st.form_submit_button("Identify")
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            if st.button("Confirm Bid"):
+                trace_action('confirm_bid')
+                if handle_bid_submission():
+                    st.success("Your bids have been submitted successfully!")
+                    st.rerun()
+        with col2:
+            if st.button("Cancel"):
+                trace_action('cancel_bid')
+                st.session_state.confirm_bid = False
+                st.session_state.bid_data = None
+                st.info("Bid cancelled. Please adjust your points allocation.")
+                st.rerun()
+        return
+    
+    # Only show the bidding form if we're not in confirmation mode
+    if 'user_netid' not in st.session_state or 'user_name' not in st.session_state:
+        st.warning("Please identify yourself in the sidebar to place bids.")
+        return
+    
+    section = st.session_state.current_section
+    generation = get_data_generation(section)
+    view_model = get_bidding_view_model(section, generation)
+    options = view_model['options']
+    
+    # Students assigned in an earlier round are done bidding
+    round_state = get_round_state(section, rounds.get_generation(get_section_files(section)['bids']))
+    assignment = round_state['assignments'].get(st.session_state.user_netid)
+    if assignment is not None:
+        st.success(f"You were assigned to {assignment['project_id']}: {assignment['project_title']} in round {assignment['round']}.")
+        return
+    
+    # Get existing bids for this user
+    existing_bids = view_model['bids_by_netid'].get(st.session_state.user_netid, [])
+    
+    # Filter out the user's own project
+    own_index = view_model['owner_index'].get(st.session_state.user_netid)
+    if own_index is None:
+        project_options = ["Select a project"] + options
+    else:
+        project_options = ["Select a project"] + options[:own_index] + options[own_index + 1:]
+        st.info(f"Your own project ({options[own_index]}) is excluded from the bidding options.")
+        
+        # Suggest the projects most similar to the student's own, precomputed with the themes
+        model = get_topic_model(section, topics.get_generation(get_section_files(section)['submissions']))
+        similar_projects = topics.get_neighbors(model, own_index, len(options))
+        if similar_projects:
+            with st.expander("Projects similar to yours"):
+                for index, similarity in similar_projects[:5]:
+                    if index < len(options):
+                        st.write(f"- {options[index]} ({similarity:.0%} similar)")
+    
+    # After the first round, only projects with open seats can be bid on
+    option_positions = None
+    if round_state['seats']:
+        open_options = {
+            options[view_model['option_index'][project_id]]
+            for project_id in rounds.open_projects(round_state, view_model['project_ids'])
+        }
+        project_options = project_options[:1] + [option for option in project_options[1:] if option in open_options]
+        option_positions = {option: i for i, option in enumerate(project_options)}
+        st.info(f"Round {round_state['round']}: only projects with open seats are listed.")
+    
+    if len(project_options) == 1:
+        st.warning("There are no other projects available to bid on yet.")
+        return
+    
+    with st.form("bidding_form"):
+        st.write(f"**Bidding as:** {st.session_state.user_name} ({st.session_state.user_netid})")
+        
+        # Create bid inputs for up to 3 projects
+        bids = []
+        total_points = 0
+        
+        # Create columns for project selection and point allocation
+        for i in range(3):
+            col1, col2 = st.columns([3, 1])
+            
+            with col1:
+                # Default to existing selection if available
+                default_index = 0
+                if i < len(existing_bids):
+                    project_index = view_model['option_index'].get(existing_bids[i].project_id)
+                    if project_index is not None and project_index != own_index:
+                        if option_positions is not None:
+                            # Full projects are filtered out too, so look the option up
+                            default_index = option_positions.get(options[project_index], 0)
+                        else:
+                            # Shift by one for "Select a project", and back by one past the excluded own project
+                            default_index = project_index + 1
+                            if own_index is not None and project_index > own_index:
+                                default_index -= 1
+                
+                selected_project = st.selectbox(
+                    f"Project #{i+1}",
+                    options=project_options,
+                    index=default_index,
+                    key=f"project_{i}"
+                )
+            
+            with col2:
+                # Default to existing points if available
+                default_points = 0
+                if i < len(existing_bids):
+                    default_points = existing_bids[i].points
                 
-                if submit_id:
-                    if not user_name or not user_netid:
-                        st.error("Please enter your name and NetID")
-                    else:
-                        # Verify that the name and NetID match a submission
-                        submissions = load_submissions()
-                        valid_user = False
-                        
-                        for submission in submissions:
-                            if submission['netid'].lower() == user_netid.lower() and submission['name'].lower() == user_name.lower():
-                                valid_user = True
-                                # Use the exact name and netid from the submission to ensure consistency
-                                st.session_state.user_name = submission['name']
-                                st.session_state.user_netid = submission['netid']
-                                st.success(f"Identified as {submission['name']} ({submission['netid']}) in {st.session_state.current_section}")
-                                break
-                        
-                        if not valid_user:
-                            st.error(f"Your name and NetID don't match any project submission in {st.session_state.current_section}. Please use the same name and NetID you used when submitting your project topic.")
+                points = st.number_input(
+                    "Points",
+                    min_value=0,
+                    max_value=100,
+                    value=default_points,
+                    step=5,
+                    key=f"points_{i}"
+                )
+            
+            if selected_project != "Select a project":
+                project_id = selected_project.split(":")[0].strip()
+                project_title = selected_project[selected_project.index(":")+1:].strip()
+                bids.append(BidItem(
+                    project_id=project_id,
+                    project_title=project_title,
+                    points=points
+                ))
+                total_points += points
+        
+        # Display total points
+        st.write(f"**Total points allocated:** {total_points}/100")
+        
+        # Submit button
+        submit_bids = st.form_submit_button("Submit Bids")
+    
+    # Show visualization of user's current bids (outside the form)
+    if existing_bids:
+        render_bid_distribution(get_bid_distribution(section, generation, st.session_state.user_netid), existing_bids)
+    
+    # Handle form submission
+    if submit_bids:
+        trace_action('submit_bids', bids=[[bid.project_id, bid.points] for bid in bids])
+        if not bids:
+            st.error("Please select at least one project to bid on.")
+        else:
+            # Check for duplicate project selections
+            selected_project_ids = [bid.project_id for bid in bids]
+            if len(selected_project_ids) != len(set(selected_project_ids)):
+                st.error("You've selected the same project multiple times. Please select each project only once.")
+            elif total_points > 100:
+                st.error("You've allocated more than 100 points! Please reduce your bids.")
+            elif total_points == 0:
+                st.error("Please allocate at least some points before submitting.")
+            elif total_points < 100:
+                # Store the bid data and set confirm flag
+                st.session_state.bid_data = {
+                    'netid': st.session_state.user_netid,
+                    'name': st.session_state.user_name,
+                    'bids': bids,
+                    'total_points': total_points
+                }
+                st.session_state.confirm_bid = True
+                st.rerun()
+            else:
+                # Save the bid directly if exactly 100 points
+                if save_bid(st.session_state.user_netid, st.session_state.user_name, bids):
+                    st.success("Your bids have been submitted successfully!")
+
+# Chart and table of the user's current bids
+def render_bid_distribution(bid_df, existing_bids):
+    st.subheader("Your Current Bid Distribution")
+    
+    # Display the Plotly chart
+    fig = make_bar_chart(bid_df, 'Project', 'Points', 'Your Bid Distribution')
+    st.plotly_chart(fig, use_container_width=True, key="user_bid_distribution")
+    
+    # Show a table view as well
+    st.write("**Your Current Bids:**")
+    # Only show projects with non-zero bids in the table
+    bid_table = bid_df[bid_df['Points'] > 0]
+    if not bid_table.empty:
+        st.dataframe(bid_table)
+    else:
+        st.info("You haven't placed any bids yet.")
+    
+    # Calculate and show remaining points
+    total_allocated = sum(bid.points for bid in existing_bids)
+    st.write(f"**Total points allocated:** {total_allocated}/100")
+    st.write(f"**Remaining points:** {100 - total_allocated}")
+
+# Project topic submission form
+def render_submission_form():
+    st.header("Submit Your Project Topic")
+    
+    with st.form("submission_form"):
+        name = st.text_input("Your Name")
+        netid = st.text_input("UW NetID")
+        topic = st.text_input("Project Topic")
+        description = st.text_area("Project Description", height=150)
+        
+        submitted = st.form_submit_button("Submit")
+        
+        if submitted:
+            trace_action('submit_project', name=name, netid=netid, topic=topic, description=description)
+            if not name or not netid or not topic or not description:
+                st.error("Please fill out all fields!")
+            else:
+                if save_submission(name, netid, topic, description):
+                    st.success("Your project topic has been submitted successfully!")
+
+# Admin view of all submissions and bids
+# Runs as a fragment so resetting a bid doesn't rerun the student views
+@fragment
+def render_admin_view():
+    section = st.session_state.current_section
+    generation = get_data_generation(section)
+    
+    st.header("Admin View: All Submissions")
+    
+    submissions, bids = get_section_data(section, generation)
+    if not submissions:
+        st.warning("No submissions yet.")
+    else:
+        df = pd.DataFrame([submission.to_dict() for submission in submissions])
+        themes = get_project_themes(section, topics.get_generation(get_section_files(section)['submissions']), len(submissions))
+        if themes:
+            df['theme'] = themes
+            selected_theme = select_theme(themes, "admin_theme_filter")
+            if selected_theme is not None:
+                df = df[df['theme'] == selected_theme]
+        st.dataframe(df)
+    
+    st.header("Admin View: All Bids")
+    
+    if not bids:
+        st.warning("No bids yet.")
+        return
+    
+    tables = get_admin_bid_tables(section, generation)
+    if tables is None:
+        st.warning("No bid details available.")
+        return
+    bid_df, student_summary_df = tables
+    
+    # Create tabs for different views
+    tab1, tab2, tab3 = st.tabs(["All Bids", "Project Summary", "Student Summary"])
+    
+    with tab1:
+        st.subheader("All Individual Bids")
+        st.dataframe(bid_df)
+    
+    with tab2:
+        st.subheader("Project Bid Summary")
+        project_stats, points_per_project, bids_per_project = get_project_stats(section, generation)
+        
+        # Display comprehensive statistics table
+        st.dataframe(project_stats)
+        
+        # Create two columns for charts
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            st.write("**Total Points by Project:**")
+            fig1 = make_bar_chart(points_per_project, 'Project', 'Points', 'Total Points by Project')
+            st.plotly_chart(fig1, use_container_width=True, key=f"admin_points_chart_{uuid.uuid4()}")
+        
+        with col2:
+            st.write("**Number of Bids by Project:**")
+            fig2 = make_bar_chart(bids_per_project, 'Project', 'Number of Bids', 'Number of Bids by Project')
+            st.plotly_chart(fig2, use_container_width=True, key=f"admin_bids_chart_{uuid.uuid4()}")
+    
+    with tab3:
+        st.subheader("Student Bid Summary")
+        st.dataframe(student_summary_df)
+    
+    # Add option to reset a student's bid
+    st.subheader("Reset Student Bid")
+    
+    # Create a list of students with bids
+    student_options = [f"{bid.name} ({bid.netid})" for bid in bids]
+    
+    if student_options:
+        col1, col2 = st.columns([3, 1])
+        
+        with col1:
+            selected_student = st.selectbox(
+                "Select a student",
+                options=student_options
+            )
+        
+        with col2:
+            if st.button("Reset Bid"):
+                # Extract netid from the selected student
+                netid = selected_student.split("(")[1].split(")")[0]
+                trace_action('reset_bid', netid=netid)
+                if delete_bid(netid):
+                    st.success(f"Successfully reset bid for {selected_student}")
+                    st.rerun()
+    else:
+        st.info("No student bids to reset.")
+
+# Live bid activity for the admin over a rolling window
+# Reruns on its own every few seconds; each run only reads the activity buckets, never the bids
+@auto_refresh_fragment(10)
+def render_bid_activity():
+    section = st.session_state.current_section
+    bids_file = get_section_files(section)['bids']
+    
+    st.header("Admin View: Bid Activity")
+    
+    windows = {"Last 5 minutes": 5, "Last 15 minutes": 15, "Last 60 minutes": 60}
+    window = windows[st.radio("Window", options=list(windows), horizontal=True, key="activity_window")]
+    
+    state = get_bid_activity(section, activity.get_generation(bids_file))
+    summary = activity.summarize(state['buckets'], window)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Bids per Minute", f"{summary['bids_per_minute']:.1f}")
+    col2.metric("Active Bidders", summary['active_bidders'])
+    col3.metric("Points Moved", summary['points_moved'])
+    col4.metric("Bids Reset", summary['removals'])
+    
+    per_minute_df = pd.DataFrame(summary['per_minute'])
+    fig = px.bar(per_minute_df, x='Minute', y='Bids', title=f"Bids Saved per Minute (last {window} minutes)")
+    st.plotly_chart(fig, use_container_width=True, key="activity_chart")
+    
+    st.write("**Point Flow Between Projects:**")
+    if summary['flows']:
+        st.dataframe(pd.DataFrame(summary['flows']), hide_index=True)
+    else:
+        st.info("No bids changed in this window.")
+    
+    st.caption(f"Updated {datetime.now().strftime('%H:%M:%S')}")
+
+# Admin report of integrity problems in the current section's data
+def render_integrity_report():
+    section = st.session_state.current_section
+    report = get_integrity_report(section, get_data_generation(section))
+    issues = integrity.list_issues(report)
+    
+    with st.expander(f"Data Integrity ({section}): {len(issues)} issues" if issues else f"Data Integrity ({section})"):
+        if not issues:
+            st.success("No integrity problems found.")
+        else:
+            counts = {kind: 0 for kind in integrity.KINDS}
+            for issue in issues:
+                counts[issue['kind']] += 1
+            columns = st.columns(len(integrity.KINDS))
+            for column, kind in zip(columns, integrity.KINDS):
+                column.metric(kind.capitalize(), counts[kind])
+            st.dataframe(pd.DataFrame([
+                {'Problem': issue['kind'], 'File': issue['file'], 'NetID': issue['netid'] or "", 'Details': issue['message']}
+                for issue in issues
+            ]), hide_index=True)
+        st.caption(f"Last full scan: {report['scanned']}. Bid saves update the report as they happen; "
+                   f"run `python integrity.py` to check from the command line.")
+
+# Admin view of past terms: what was archived and how topics did across terms
+def render_term_archive():
+    with st.expander("Past Terms"):
+        terms = archive.list_terms()
+        if not terms:
+            st.info("No terms archived yet. Archive a section from the admin controls at the end of a term.")
+            return
+        
+        generation = archive.get_generation()
+        st.dataframe(pd.DataFrame([
+            {'Term': entry['term'], 'Section': entry['section'], 'Archived': entry['archived'],
+             'Submissions': entry['submissions'], 'Bids': entry['bidders'], 'Assigned': entry['assigned']}
+            for entry in terms
+        ]), hide_index=True)
+        
+        st.write("**Most bid-on topics per term:**")
+        st.dataframe(get_archived_popularity(generation, 5), hide_index=True)
+        
+        keyword = st.text_input("Follow a topic keyword across terms", placeholder="e.g. robot", key="archive_keyword")
+        if keyword.strip():
+            trend = get_keyword_trend(generation, keyword.strip())
+            st.plotly_chart(make_bar_chart(trend, 'Term', 'Share of Points', f"Share of points on \"{keyword.strip()}\" projects"),
+                            use_container_width=True)
+            st.dataframe(trend, hide_index=True)
+
+# Admin console for ad-hoc read-only SQL over every section's data
+def render_query_console():
+    with st.expander("Query Console"):
+        database = get_query_database(get_query_generations())
+        st.caption("Tables: " + ", ".join(f"`{table}` ({count} rows)" for table, count in database.row_counts.items()) +
+                   ". Bids have one row per project bid on; `choice` 1 is a student's highest bid.")
+        
+        example = st.selectbox("Start from an example", list(console.EXAMPLES), key="query_example")
+        # Each example gets its own editor, so switching examples doesn't lose edits to another
+        sql = st.text_area("SQL", value=console.EXAMPLES[example], height=150,
+                           key=f"query_sql_{list(console.EXAMPLES).index(example)}")
+        col1, col2 = st.columns(2)
+        with col1:
+            limit = st.number_input("Row limit", min_value=1, max_value=10000, value=console.DEFAULT_LIMIT, key="query_limit")
+        with col2:
+            timeout = st.number_input("Timeout (seconds)", min_value=1, max_value=30, value=int(console.DEFAULT_TIMEOUT),
+                                      key="query_timeout")
+        
+        if st.button("Run Query", key="run_query_btn"):
+            try:
+                result, truncated = database.query(sql, int(limit), timeout)
+            except console.QueryError as e:
+                st.error(f"Query failed: {e}")
+            else:
+                st.dataframe(result, hide_index=True)
+                if truncated:
+                    st.warning(f"Only the first {int(limit)} rows are shown.")
+                else:
+                    st.caption(f"{len(result)} rows")
+
+# Memory report for the admin: sessions, cache sizes and allocation sites
+def render_memory_report():
+    with st.expander("Memory Report"):
+        rss = memory.rss_bytes()
+        sessions = memory.session_sizes()
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Process Memory (RSS)", f"{rss / 1024 / 1024:.0f} MB" if rss is not None else "Unknown")
+        if sessions is None:
+            col2.metric("Live Sessions", "Unknown")
+            col3.metric("Average Session Size", "Unknown")
+        else:
+            col2.metric("Live Sessions", len(sessions))
+            col3.metric("Average Session Size", f"{sum(sessions) / len(sessions) / 1024:.1f} KB" if sessions else "0 KB")
+        
+        st.write("**Section caches:**")
+        st.dataframe(pd.DataFrame(memory.cache_summary()), hide_index=True)
+        cache_stats = memory.cache_stats()
+        if cache_stats:
+            st.dataframe(pd.DataFrame(cache_stats), hide_index=True)
+        st.caption(f"Each section cache is capped at {memory.CACHE_MAX_MB:g} MB (CACHE_MAX_MB), so together they hold at most "
+                   f"{memory.total_cap_bytes() / 1024 / 1024:.0f} MB. Derived tables are capped at {memory.CACHE_MAX_ENTRIES} "
+                   f"entries per function (CACHE_MAX_ENTRIES) but not by size. Least recently used entries are evicted first; "
+                   f"sizes are measured in the background, so new entries may show an estimate for a moment.")
+        
+        streamlit_caches = memory.streamlit_cache_stats()
+        if streamlit_caches:
+            st.write("**Derived table caches:**")
+            st.dataframe(pd.DataFrame(streamlit_caches), hide_index=True)
+        
+        st.write("**Top allocation sites:**")
+        if not memory.is_tracing():
+            st.info("Allocation tracking is off. It slows the app down while on.")
+            if st.button("Start Allocation Tracking", key="start_tracing_btn"):
+                memory.start_tracing()
+                st.rerun()
+        else:
+            allocations = memory.top_allocations()
+            if allocations:
+                st.dataframe(pd.DataFrame(allocations), hide_index=True)
+            else:
+                st.info("No allocations since the baseline.")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("Reset Baseline", key="reset_tracing_btn"):
+                    memory.start_tracing()
+                    st.rerun()
+            with col2:
+                if st.button("Stop Allocation Tracking", key="stop_tracing_btn"):
+                    memory.stop_tracing()
+                    st.rerun()
+
+# Main app layout
+def main():
+    st.title("TECHIN510 Project Topic Submission")
+    
+    # Sidebar for admin login and user identification
+    render_sidebar()
     
     # Main content
     try:
-        submissions = load_submissions()
+        section = st.session_state.current_section
+        generation = get_data_generation(section)
+        submissions = get_section_data(section, generation)[0]
         
         # Display all topics if reveal is enabled
         if st.session_state.reveal_topics:
@@ -435,210 +1517,13 @@ def main():
             
             # Show notification about top bidders feature if enabled
             if st.session_state.reveal_top_bidders:
-                st.success("Top bidders visibility is enabled! Project owners can now see the top 3 bidders for their projects.")
-                
-                # Add debugging information
-                with st.expander("Troubleshooting Top Bidders Visibility"):
-                    st.write("If you can't see the top bidders for your project, check the following:")
-                    
-                    # Check if user is identified
-                    if 'user_netid' in st.session_state:
-                        st.write(f"✅ You are identified as: {st.session_state.user_name} ({st.session_state.user_netid})")
-                        
-                        # Check if user has a project
-                        user_has_project = False
-                        user_project_id = None
-                        user_project_title = None
-                        for i, submission in enumerate(submissions):
-                            if submission['netid'] == st.session_state.user_netid:
-                                user_has_project = True
-                                user_project_id = f"Project {i+1}"
-                                user_project_title = submission['topic']
-                                break
-                        
-                        if user_has_project:
-                            st.write(f"✅ You have submitted a project: {user_project_id}: {user_project_title}")
-                            
-                            # Check if there are bids on the user's project
-                            bids = load_bids()
-                            project_bids = []
-                            
-                            if bids:
-                                for bid in bids:
-                                    for project_bid in bid['bids']:
-                                        # More flexible matching to handle potential format differences
-                                        bid_project_id = project_bid['project_id'].strip()
-                                        current_project_id = user_project_id.strip()
-                                        
-                                        # Try different matching approaches
-                                        exact_match = bid_project_id == current_project_id
-                                        contains_match = bid_project_id in current_project_id or current_project_id in bid_project_id
-                                        
-                                        if exact_match or contains_match:
-                                            project_bids.append({
-                                                'Student': bid['name'],
-                                                'NetID': bid['netid'],
-                                                'Points': project_bid['points']
-                                            })
-                                    
-                                    if project_bids:
-                                        st.write(f"✅ There are {len(project_bids)} bids on your project")
-                                        st.write("You should see the top bidders section below.")
-                                        
-                                        # Display top bidders directly here for better visibility
-                                        st.subheader("👑 Top Bidders for Your Project")
-                                        
-                                        # Sort by points in descending order and take top 3
-                                        top_bidders = sorted(project_bids, key=lambda x: x['Points'], reverse=True)[:3]
-                                        
-                                        # Create a DataFrame for display
-                                        top_df = pd.DataFrame(top_bidders)
-                                        st.dataframe(top_df)
-                                        
-                                        # Show a bar chart of top bidders
-                                        if len(top_bidders) > 0:
-                                            chart_data = pd.DataFrame({
-                                                'Student': [f"{b['Student']} ({b['NetID']})" for b in top_bidders],
-                                                'Points': [b['Points'] for b in top_bidders]
-                                            })
-                                            
-                                            # Create Plotly bar chart with rotated x-axis labels
-                                            fig = px.bar(
-                                                chart_data, 
-                                                x='Student', 
-                                                y='Points',
-                                                title='Top Bidders for Your Project'
-                                            )
-                                            
-                                            # Customize the layout
-                                            fig.update_layout(
-                                                xaxis=dict(
-                                                    tickangle=45,
-                                                    tickmode='array',
-                                                    tickvals=list(range(len(chart_data))),
-                                                    ticktext=chart_data['Student']
-                                                ),
-                                                margin=dict(b=100)  # Add bottom margin for rotated labels
-                                            )
-                                            
-                                            # Generate a unique key using UUID
-                                            unique_key = f"top_bidders_chart_{uuid.uuid4()}"
-                                            
-                                            # Display the Plotly chart with the unique key
-                                            st.plotly_chart(fig, use_container_width=True, key=unique_key)
-                                        else:
-                                            st.write("❌ There are no bids on your project yet")
-                                        st.write("Once other students bid on your project, you'll see the top bidders section.")
-                                    else:
-                                        st.write("❌ There are no bids in the system yet")
-                                else:
-                                    st.write("❌ You haven't submitted a project")
-                                    st.write("Only project owners can see the top bidders for their projects.")
-                            else:
-                                st.write("❌ You are not identified")
-                                st.write("Please identify yourself in the sidebar to see top bidders for your project.")
-                        
-                        if 'user_netid' in st.session_state:
-                            # Find if the current user has submitted a project
-                            user_has_project = False
-                            for submission in submissions:
-                                if submission['netid'] == st.session_state.user_netid:
-                                    user_has_project = True
-                                    break
-                            
-                            if user_has_project:
-                                st.info("Look for the 'Top Bidders for Your Project' section above.")
-                            else:
-                                st.warning("You haven't submitted a project, so you won't see any top bidders information.")
-                        else:
-                            st.warning("Please identify yourself in the sidebar to see top bidders for your project.")
+                render_top_bidders_help(section, generation, submissions)
             
             if not submissions:
                 st.warning("No submissions yet.")
             else:
                 # Display projects
-                for i, submission in enumerate(submissions):
-                    project_id = f"Project {i+1}"
-                    project_title = submission['topic']
-                    
-                    with st.expander(f"{project_id}: {project_title} (by {submission['name']})"):
-                        st.write(f"**Description:** {submission['description']}")
-                        st.write(f"**Submitted by:** {submission['name']} ({submission['netid']})")
-                        st.write(f"**Submitted on:** {submission['timestamp']}")
-                        
-                        # Show top bidders for this project if enabled and if the current user is the project owner
-                        if st.session_state.reveal_top_bidders and 'user_netid' in st.session_state:
-                            # Check if current user is the project owner
-                            is_owner = submission['netid'] == st.session_state.user_netid
-                            
-                            if is_owner:
-                                st.markdown("---")
-                                st.markdown("### 👑 Top Bidders for Your Project (Expander View)")
-                                st.write("For better visibility, the top bidders are also shown at the top of the page.")
-                                
-                                # Display top bidders in the expander view too
-                                bids = load_bids()
-                                if bids:
-                                    # Collect all bids for this project
-                                    project_bids = []
-                                    for bid in bids:
-                                        for project_bid in bid['bids']:
-                                            # More flexible matching to handle potential format differences
-                                            bid_project_id = project_bid['project_id'].strip()
-                                            current_project_id = project_id.strip()
-                                            
-                                            # Try different matching approaches
-                                            exact_match = bid_project_id == current_project_id
-                                            contains_match = bid_project_id in current_project_id or current_project_id in bid_project_id
-                                            
-                                            if exact_match or contains_match:
-                                                project_bids.append({
-                                                    'Student': bid['name'],
-                                                    'NetID': bid['netid'],
-                                                    'Points': project_bid['points']
-                                                })
-                                    
-                                    if project_bids:
-                                        # Sort by points in descending order and take top 3
-                                        top_bidders = sorted(project_bids, key=lambda x: x['Points'], reverse=True)[:3]
-                                        
-                                        # Create a DataFrame for display
-                                        top_df = pd.DataFrame(top_bidders)
-                                        st.dataframe(top_df)
-                                        
-                                        # Show a bar chart of top bidders
-                                        if len(top_bidders) > 0:
-                                            chart_data = pd.DataFrame({
-                                                'Student': [f"{b['Student']} ({b['NetID']})" for b in top_bidders],
-                                                'Points': [b['Points'] for b in top_bidders]
-                                            })
-                                            
-                                            # Create Plotly bar chart with rotated x-axis labels
-                                            fig = px.bar(
-                                                chart_data, 
-                                                x='Student', 
-                                                y='Points',
-                                                title='Top Bidders for Your Project'
-                                            )
-                                            
-                                            # Customize the layout
-                                            fig.update_layout(
-                                                xaxis=dict(
-                                                    tickangle=45,
-                                                    tickmode='array',
-                                                    tickvals=list(range(len(chart_data))),
-                                                    ticktext=chart_data['Student']
-                                                ),
-                                                margin=dict(b=100)  # Add bottom margin for rotated labels
-                                            )
-                                            
-                                            # Generate a unique key using UUID for the expander chart
-                                            expander_key = f"expander_chart_{uuid.uuid4()}"
-                                            
-                                            # Display the Plotly chart with the unique key
-                                            st.plotly_chart(fig, use_container_width=True, key=expander_key)
-                                    else:
-                                        st.info("No bids have been placed on your project yet.")
+                render_project_list(section, generation, submissions)
                 
                 # Bidding section
                 if st.session_state.bidding_enabled:
@@ -647,486 +1532,22 @@ def main():
                     
                     # Show overall bid statistics if enabled
                     if st.session_state.reveal_bid_stats:
-                        bids = load_bids()
-                        if bids:
-                            # Create a more detailed view of bids
-                            bid_details = []
-                            for bid in bids:
-                                for project_bid in bid['bids']:
-                                    bid_details.append({
-                                        'Project': project_bid['project_title'],
-                                        'Points': project_bid['points']
-                                    })
-                            
-                            if bid_details:
-                                st.subheader("Project Popularity Overview")
-                                
-                                # Create DataFrames for different statistics
-                                bid_df = pd.DataFrame(bid_details)
-                                
-                                # Total points per project
-                                points_per_project = bid_df.groupby('Project')['Points'].sum().reset_index()
-                                points_per_project = points_per_project.sort_values('Points', ascending=False)
-                                
-                                # Number of bids per project
-                                bids_per_project = bid_df.groupby('Project').size().reset_index(name='Number of Bids')
-                                
-                                # Average points per bid
-                                avg_points = bid_df.groupby('Project')['Points'].mean().reset_index()
-                                avg_points = avg_points.rename(columns={'Points': 'Average Points per Bid'})
-                                avg_points['Average Points per Bid'] = avg_points['Average Points per Bid'].round(1)
-                                
-                                # Merge statistics
-                                project_stats = points_per_project.merge(bids_per_project, on='Project')
-                                project_stats = project_stats.merge(avg_points, on='Project')
-                                project_stats = project_stats.sort_values('Points', ascending=False)
-                                
-                                # Display comprehensive statistics table
-                                st.write("**Project Popularity Statistics:**")
-                                st.dataframe(project_stats)
-                                
-                                # Create two columns for charts
-                                col1, col2 = st.columns(2)
-                                
-                                with col1:
-                                    st.write("**Total Points by Project:**")
-                                    # Create Plotly bar chart with rotated x-axis labels
-                                    fig1 = px.bar(
-                                        points_per_project, 
-                                        x='Project', 
-                                        y='Points',
-                                        title='Total Points by Project'
-                                    )
-                                    
-                                    # Customize the layout
-                                    fig1.update_layout(
-                                        xaxis=dict(
-                                            tickangle=45,
-                                            tickmode='array',
-                                            tickvals=list(range(len(points_per_project))),
-                                            ticktext=points_per_project['Project']
-                                        ),
-                                        margin=dict(b=100)  # Add bottom margin for rotated labels
-                                    )
-                                    
-                                    # Display the Plotly chart
-                                    st.plotly_chart(fig1, use_container_width=True, key=f"public_points_chart_{uuid.uuid4()}")
-                                
-                                with col2:
-                                    st.write("**Number of Bids by Project:**")
-                                    # Create Plotly bar chart with rotated x-axis labels
-                                    fig2 = px.bar(
-                                        bids_per_project, 
-                                        x='Project', 
-                                        y='Number of Bids',
-                                        title='Number of Bids by Project'
-                                    )
-                                    
-                                    # Customize the layout
-                                    fig2.update_layout(
-                                        xaxis=dict(
-                                            tickangle=45,
-                                            tickmode='array',
-                                            tickvals=list(range(len(bids_per_project))),
-                                            ticktext=bids_per_project['Project']
-                                        ),
-                                        margin=dict(b=100)  # Add bottom margin for rotated labels
-                                    )
-                                    
-                                    # Display the Plotly chart
-                                    st.plotly_chart(fig2, use_container_width=True, key=f"public_bids_chart_{uuid.uuid4()}")
+                        render_bid_statistics(section, generation)
                     
-                    # Check if we need to handle a bid confirmation
-                    if st.session_state.confirm_bid and st.session_state.bid_data:
-                        bid_data = st.session_state.bid_data
-                        st.warning(f"You've only allocated {bid_data['total_points']}/100 points. Are you sure you want to continue?")
-                        
-                        col1, col2 = st.columns([1, 3])
-                        with col1:
-                            if st.button("Confirm Bid"):
-                                if handle_bid_submission():
-                                    st.success("Your bids have been submitted successfully!")
-                                    st.rerun()
-                        with col2:
-                            if st.button("Cancel"):
-                                st.session_state.confirm_bid = False
-                                st.session_state.bid_data = None
-                                st.info("Bid cancelled. Please adjust your points allocation.")
-                                st.rerun()
-                    
-                    # Only show the bidding form if we're not in confirmation mode
-                    elif 'user_netid' in st.session_state and 'user_name' in st.session_state:
-                        # Get existing bids for this user
-                        existing_bids = []
-                        for bid in load_bids():
-                            if bid['netid'] == st.session_state.user_netid:
-                                existing_bids = bid['bids']
-                                break
-                        
-                        # Filter out the user's own project
-                        available_projects = []
-                        own_project = None
-                        
-                        for j, sub in enumerate(submissions):
-                            if sub['netid'] == st.session_state.user_netid:
-                                own_project = f"Project {j+1}: {sub['topic']}"
-                            else:
-                                available_projects.append((j, sub))
-                        
-                        if own_project:
-                            st.info(f"Your own project ({own_project}) is excluded from the bidding options.")
-                        
-                        if not available_projects:
-                            st.warning("There are no other projects available to bid on yet.")
-                        else:
-                            with st.form("bidding_form"):
-                                st.write(f"**Bidding as:** {st.session_state.user_name} ({st.session_state.user_netid})")
-                                
-                                # Create bid inputs for up to 3 projects
-                                bids = []
-                                total_points = 0
-                                
-                                # Create columns for project selection and point allocation
-                                for i in range(3):
-                                    col1, col2 = st.columns([3, 1])
-                                    
-                                    with col1:
-                                        # Default to existing selection if available
-                                        default_index = 0
-                                        if i < len(existing_bids):
-                                            for j, (idx, sub) in enumerate(available_projects):
-                                                if f"Project {idx+1}" == existing_bids[i]['project_id']:
-                                                    default_index = j
-                                                    break
-                                        
-                                        project_options = [f"Project {idx+1}: {sub['topic']}" for idx, sub in available_projects]
-                                        project_options.insert(0, "Select a project")
-                                        selected_project = st.selectbox(
-                                            f"Project #{i+1}",
-                                            options=project_options,
-                                            index=default_index if i < len(existing_bids) else 0,
-                                            key=f"project_{i}"
-                                        )
-                                    
-                                    with col2:
-                                        # Default to existing points if available
-                                        default_points = 0
-                                        if i < len(existing_bids):
-                                            default_points = existing_bids[i]['points']
-                                        
-                                        points = st.number_input(
-                                            "Points",
-                                            min_value=0,
-                                            max_value=100,
-                                            value=default_points,
-                                            step=5,
-                                            key=f"points_{i}"
-                                        )
-                                    
-                                    if selected_project != "Select a project":
-                                        project_id = selected_project.split(":")[0].strip()
-                                        project_title = selected_project[selected_project.index(":")+1:].strip()
-                                        bids.append({
-                                            "project_id": project_id,
-                                            "project_title": project_title,
-                                            "points": points
-                                        })
-                                        total_points += points
-                                
-                                # Display total points
-                                st.write(f"**Total points allocated:** {total_points}/100")
-                                
-                                # Submit button
-                                submit_bids = st.form_submit_button("Submit Bids")
-                            
-                            # Show visualization of user's current bids (outside the form)
-                            existing_bids = []
-                            for bid in load_bids():
-                                if bid['netid'] == st.session_state.user_netid:
-                                    existing_bids = bid['bids']
-                                    break
-                            
-                            if existing_bids:
-                                st.subheader("Your Current Bid Distribution")
-                                
-                                # Get all available projects (excluding the user's own)
-                                all_projects = []
-                                for j, sub in enumerate(submissions):
-                                    if sub['netid'] != st.session_state.user_netid:
-                                        all_projects.append(f"Project {j+1}: {sub['topic']}")
-                                
-                                # Create a dictionary mapping project titles to points
-                                bid_dict = {bid['project_title']: bid['points'] for bid in existing_bids}
-                                
-                                # Create a DataFrame with all projects, filling in zeros for projects without bids
-                                bid_data = []
-                                for project in all_projects:
-                                    # Extract just the project title part after the colon
-                                    project_title = project[project.index(':')+1:].strip()
-                                    # Find if this project has a bid
-                                    points = 0
-                                    for bid in existing_bids:
-                                        if project_title in bid['project_title']:
-                                            points = bid['points']
-                                            break
-                                    
-                                    bid_data.append({
-                                        'Project': project,
-                                        'Points': points
-                                    })
-                                
-                                # Create DataFrame and sort by points (descending)
-                                bid_df = pd.DataFrame(bid_data)
-                                bid_df = bid_df.sort_values('Points', ascending=False)
-                                
-                                # Create a Plotly bar chart with rotated x-axis labels
-                                fig = px.bar(
-                                    bid_df, 
-                                    x='Project', 
-                                    y='Points',
-                                    title='Your Bid Distribution'
-                                )
-                                
-                                # Customize the layout to rotate x-axis labels
-                                fig.update_layout(
-                                    xaxis=dict(
-                                        tickangle=45,
-                                        tickmode='array',
-                                        tickvals=list(range(len(bid_df))),
-                                        ticktext=bid_df['Project']
-                                    ),
-                                    margin=dict(b=100)  # Add bottom margin for rotated labels
-                                )
-                                
-                                # Display the Plotly chart
-                                st.plotly_chart(fig, use_container_width=True, key="user_bid_distribution")
-                                
-                                # Show a table view as well
-                                st.write("**Your Current Bids:**")
-                                # Only show projects with non-zero bids in the table
-                                bid_table = bid_df[bid_df['Points'] > 0]
-                                if not bid_table.empty:
-                                    st.dataframe(bid_table)
-                                else:
-                                    st.info("You haven't placed any bids yet.")
-                                
-                                # Calculate and show remaining points
-                                total_allocated = sum(bid['points'] for bid in existing_bids)
-                                st.write(f"**Total points allocated:** {total_allocated}/100")
-                                st.write(f"**Remaining points:** {100 - total_allocated}")
-                            
-                            # Handle form submission
-                            if submit_bids:
-                                if not bids:
-                                    st.error("Please select at least one project to bid on.")
-                                else:
-                                    # Check for duplicate project selections
-                                    selected_project_ids = [bid['project_id'] for bid in bids]
-                                    if len(selected_project_ids) != len(set(selected_project_ids)):
-                                        st.error("You've selected the same project multiple times. Please select each project only once.")
-                                    elif total_points > 100:
-                                        st.error("You've allocated more than 100 points! Please reduce your bids.")
-                                    elif total_points == 0:
-                                        st.error("Please allocate at least some points before submitting.")
-                                    elif total_points < 100:
-                                        # Store the bid data and set confirm flag
-                                        st.session_state.bid_data = {
-                                            'netid': st.session_state.user_netid,
-                                            'name': st.session_state.user_name,
-                                            'bids': bids,
-                                            'total_points': total_points
-                                        }
-                                        st.session_state.confirm_bid = True
-                                        st.rerun()
-                                    else:
-                                        # Save the bid directly if exactly 100 points
-                                        if save_bid(st.session_state.user_netid, st.session_state.user_name, bids):
-                                            st.success("Your bids have been submitted successfully!")
-                    else:
-                        st.warning("Please identify yourself in the sidebar to place bids.")
+                    render_bidding()
         
         # Otherwise show submission form
         else:
-            st.header("Submit Your Project Topic")
-            
-            with st.form("submission_form"):
-                name = st.text_input("Your Name")
-                netid = st.text_input("UW NetID")
-                topic = st.text_input("Project Topic")
-                description = st.text_area("Project Description", height=150)
-                
-                submitted = st.form_submit_button("Submit")
-                
-                if submitted:
-                    if not name or not netid or not topic or not description:
-                        st.error("Please fill out all fields!")
-                    else:
-                        if save_submission(name, netid, topic, description):
-                            st.success("Your project topic has been submitted successfully!")
+            render_submission_form()
         
         # Admin view of all submissions and bids
         if st.session_state.authenticated:
-            st.header("Admin View: All Submissions")
-            
-            if not submissions:
-                st.warning("No submissions yet.")
-            else:
-                df = pd.DataFrame(submissions)
-                st.dataframe(df)
-            
-            st.header("Admin View: All Bids")
-            bids = load_bids()
-            
-            if not bids:
-                st.warning("No bids yet.")
-            else:
-                # Create a more detailed view of bids
-                bid_details = []
-                for bid in bids:
-                    for project_bid in bid['bids']:
-                        bid_details.append({
-                            'Student': f"{bid['name']} ({bid['netid']})",
-                            'Project': project_bid['project_title'],
-                            'Points': project_bid['points'],
-                            'Timestamp': bid['timestamp']
-                        })
-                
-                if bid_details:
-                    # Create tabs for different views
-                    tab1, tab2, tab3 = st.tabs(["All Bids", "Project Summary", "Student Summary"])
-                    
-                    with tab1:
-                        st.subheader("All Individual Bids")
-                        bid_df = pd.DataFrame(bid_details)
-                        st.dataframe(bid_df)
-                    
-                    with tab2:
-                        st.subheader("Project Bid Summary")
-                        
-                        # Create DataFrames for different statistics
-                        bid_df = pd.DataFrame(bid_details)
-                        
-                        # Total points per project
-                        points_per_project = bid_df.groupby('Project')['Points'].sum().reset_index()
-                        points_per_project = points_per_project.sort_values('Points', ascending=False)
-                        
-                        # Number of bids per project
-                        bids_per_project = bid_df.groupby('Project').size().reset_index(name='Number of Bids')
-                        
-                        # Average points per bid
-                        avg_points = bid_df.groupby('Project')['Points'].mean().reset_index()
-                        avg_points = avg_points.rename(columns={'Points': 'Average Points per Bid'})
-                        avg_points['Average Points per Bid'] = avg_points['Average Points per Bid'].round(1)
-                        
-                        # Merge statistics
-                        project_stats = points_per_project.merge(bids_per_project, on='Project')
-                        project_stats = project_stats.merge(avg_points, on='Project')
-                        project_stats = project_stats.sort_values('Points', ascending=False)
-                        
-                        # Display comprehensive statistics table
-                        st.dataframe(project_stats)
-                        
-                        # Create two columns for charts
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            st.write("**Total Points by Project:**")
-                            # Create Plotly bar chart with rotated x-axis labels
-                            fig1 = px.bar(
-                                points_per_project, 
-                                x='Project', 
-                                y='Points',
-                                title='Total Points by Project'
-                            )
-                            
-                            # Customize the layout
-                            fig1.update_layout(
-                                xaxis=dict(
-                                    tickangle=45,
-                                    tickmode='array',
-                                    tickvals=list(range(len(points_per_project))),
-                                    ticktext=points_per_project['Project']
-                                ),
-                                margin=dict(b=100)  # Add bottom margin for rotated labels
-                            )
-                            
-                            # Display the Plotly chart
-                            st.plotly_chart(fig1, use_container_width=True, key=f"admin_points_chart_{uuid.uuid4()}")
-                        
-                        with col2:
-                            st.write("**Number of Bids by Project:**")
-                            # Create Plotly bar chart with rotated x-axis labels
-                            fig2 = px.bar(
-                                bids_per_project, 
-                                x='Project', 
-                                y='Number of Bids',
-                                title='Number of Bids by Project'
-                            )
-                            
-                            # Customize the layout
-                            fig2.update_layout(
-                                xaxis=dict(
-                                    tickangle=45,
-                                    tickmode='array',
-                                    tickvals=list(range(len(bids_per_project))),
-                                    ticktext=bids_per_project['Project']
-                                ),
-                                margin=dict(b=100)  # Add bottom margin for rotated labels
-                            )
-                            
-                            # Display the Plotly chart
-                            st.plotly_chart(fig2, use_container_width=True, key=f"admin_bids_chart_{uuid.uuid4()}")
-                    
-                    with tab3:
-                        st.subheader("Student Bid Summary")
-                        
-                        # Get unique students
-                        students = bid_df['Student'].unique()
-                        
-                        # Create a summary of each student's bids
-                        student_summaries = []
-                        
-                        for student in students:
-                            student_bids = bid_df[bid_df['Student'] == student]
-                            total_points = student_bids['Points'].sum()
-                            num_projects = len(student_bids)
-                            
-                            student_summaries.append({
-                                'Student': student,
-                                'Total Points': total_points,
-                                'Projects Bid On': num_projects,
-                                'Average Points per Project': round(total_points / num_projects, 1) if num_projects > 0 else 0
-                            })
-                        
-                        student_summary_df = pd.DataFrame(student_summaries)
-                        st.dataframe(student_summary_df)
-                    
-                    # Add option to reset a student's bid
-                    st.subheader("Reset Student Bid")
-                    
-                    # Create a list of students with bids
-                    student_options = [f"{bid['name']} ({bid['netid']})" for bid in bids]
-                    
-                    if student_options:
-                        col1, col2 = st.columns([3, 1])
-                        
-                        with col1:
-                            selected_student = st.selectbox(
-                                "Select a student",
-                                options=student_options
-                            )
-                        
-                        with col2:
-                            if st.button("Reset Bid"):
-                                # Extract netid from the selected student
-                                netid = selected_student.split("(")[1].split(")")[0]
-                                if delete_bid(netid):
-                                    st.success(f"Successfully reset bid for {selected_student}")
-                                    st.rerun()
-                    else:
-                        st.info("No student bids to reset.")
-                else:
-                    st.warning("No bid details available.")
+            render_admin_view()
+            render_integrity_report()
+            render_bid_activity()
+            render_term_archive()
+            render_query_console()
+            render_memory_report()
     except Exception as e:
         st.error(f"An error occurred: {str(e)}")
         st.info("Please try refreshing the page or contact the administrator.")
@@ -1136,4 +1557,4 @@ if __name__ == "__main__":
         main()
     except Exception as e:
         st.error(f"Application error: {str(e)}")
-        st.info("Please try refreshing the page or contact the administrator.") 
+        st.info("Please try refreshing the page or contact the administrator.")
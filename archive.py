@@ -0,0 +1,283 @@
+# Term archive: past terms' submissions and bids as compressed Parquet
+#
+# Archiving a section freezes its submissions, bid items and round
+# assignments into data/archive/<table>/term=<term>/section=<section>/part-0.parquet
+# (zstd-compressed columns) and resets the live files to empty. A snapshot of
+# the live files is taken first, like clearing them.
+#
+# Queries across terms go through pyarrow datasets: only the columns a query
+# needs are read, batch by batch, so no term is ever loaded whole.
+#
+# Usage from the command line:
+#   python archive.py archive "Autumn 2025" --section "Section A"
+#   python archive.py list
+#   python archive.py popular --limit 5
+#   python archive.py trend "robot"
+import os
+import re
+import sys
+import argparse
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+import activity
+import codec
+import feed
+import generations
+import rounds
+import snapshots
+from records import parse_submissions, parse_bids
+from storage import SECTIONS, DATA_DIR, get_section_slug, get_section_files, read_section_file, write_section_file
+
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+MANIFEST_FILE = os.path.join(ARCHIVE_DIR, "terms.json")
+COMPRESSION = "zstd"
+TERM_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9 _.-]*")
+
+SCHEMAS = {
+    'submissions': pa.schema([
+        ('project_id', pa.string()), ('name', pa.string()), ('netid', pa.string()), ('topic', pa.string()),
+        ('description', pa.string()), ('timestamp', pa.string())
+    ]),
+    'bids': pa.schema([
+        ('netid', pa.string()), ('name', pa.string()), ('timestamp', pa.string()),
+        ('project_id', pa.string()), ('project_title', pa.string()), ('points', pa.int32())
+    ]),
+    'assignments': pa.schema([
+        ('netid', pa.string()), ('project_id', pa.string()), ('project_title', pa.string()),
+        ('points', pa.int32()), ('round', pa.int32())
+    ])
+}
+
+# Term and section come from the directory names; both are kept as strings ("2025" is a term, not a number)
+PARTITIONING = ds.partitioning(pa.schema([('term', pa.string()), ('section', pa.string())]), flavor="hive")
+
+# Function to get the name the archive's generation counter is kept under
+# The counter lives with the data files' counters, so it can be read before anything is archived
+def _get_generation_key():
+    return os.path.join(DATA_DIR, "archive-terms.json")
+
+# Function to get the generation of the archive (changes whenever a section is archived)
+def get_generation():
+    return generations.get(_get_generation_key())
+
+# Function to get the directory a table of an archived section is kept in
+def get_partition_dir(table, term, section):
+    return os.path.join(ARCHIVE_DIR, table, f"term={term}", f"section={get_section_slug(section)}")
+
+# Function to list the archived sections, oldest first
+def list_terms():
+    if not os.path.exists(MANIFEST_FILE):
+        return []
+    return codec.read_json(MANIFEST_FILE)
+
+# Function to list the archived term names in the order they were archived
+def get_term_names():
+    names = []
+    for entry in list_terms():
+        if entry['term'] not in names:
+            names.append(entry['term'])
+    return names
+
+# Function to write one table of an archived section
+def _write_table(table, term, section, rows):
+    columns = {field.name: [row[field.name] for row in rows] for field in SCHEMAS[table]}
+    partition_dir = get_partition_dir(table, term, section)
+    os.makedirs(partition_dir, exist_ok=True)
+    pq.write_table(pa.table(columns, schema=SCHEMAS[table]), os.path.join(partition_dir, "part-0.parquet"),
+                   compression=COMPRESSION)
+
+# Function to archive a section's submissions, bids and round assignments under a term
+# and reset its live files; returns the manifest entry
+def archive_section(term, section):
+    term = term.strip()
+    if not TERM_PATTERN.fullmatch(term):
+        raise ValueError("Term names may only contain letters, digits, spaces, '.', '_' and '-'")
+
+    section_files = get_section_files(section)
+    submissions_file, bids_file = section_files['submissions'], section_files['bids']
+    os.makedirs(ARCHIVE_DIR, exist_ok=True)
+
+    with generations.locked(MANIFEST_FILE), generations.locked(submissions_file), generations.locked(bids_file):
+        manifest = list_terms()
+        if any(entry['term'] == term and entry['section'] == section for entry in manifest):
+            raise ValueError(f"{section} has already been archived for {term}")
+
+        submissions = read_section_file(submissions_file, parse_submissions)
+        bids = read_section_file(bids_file, parse_bids)
+        round_state = rounds.load(bids_file)
+
+        _write_table('submissions', term, section, [
+            dict(submission.to_dict(), project_id=f"Project {i+1}") for i, submission in enumerate(submissions)
+        ])
+        _write_table('bids', term, section, [
+            {'netid': bid.netid, 'name': bid.name, 'timestamp': bid.timestamp,
+             'project_id': item.project_id, 'project_title': item.project_title, 'points': item.points}
+            for bid in bids for item in bid.bids
+        ])
+        _write_table('assignments', term, section, [
+            dict(assignment, netid=netid) for netid, assignment in round_state['assignments'].items()
+        ])
+
+        entry = {
+            'term': term,
+            'section': section,
+            'archived': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'submissions': len(submissions),
+            'bidders': len(bids),
+            'bid_items': sum(len(bid.bids) for bid in bids),
+            'assigned': len(round_state['assignments'])
+        }
+        manifest.append(entry)
+        codec.write_json(MANIFEST_FILE, manifest)
+
+        # Snapshot first so the live data can still be restored, then start the next term empty
+        snapshots.snapshot(submissions_file, reason=f"before archiving {term}")
+        snapshots.snapshot(bids_file, reason=f"before archiving {term}")
+        write_section_file(submissions_file, [], [('clear',)])
+        write_section_file(bids_file, [], [('clear',)])
+        activity.record(bids_file, [(bid.netid, bid.bids, None) for bid in bids])
+        feed.emit(section, [feed.section_cleared('submissions', len(submissions), f"archived as {term}"),
+                            feed.section_cleared('bids', len(bids), f"archived as {term}")])
+        if round_state['history']:
+            rounds.reset(bids_file)
+
+    generations.bump(_get_generation_key())
+    return entry
+
+# Function to open an archived table as a dataset, or None if nothing has been archived
+def open_table(table):
+    table_dir = os.path.join(ARCHIVE_DIR, table)
+    if not os.path.isdir(table_dir):
+        return None
+    return ds.dataset(table_dir, format="parquet", partitioning=PARTITIONING, schema=SCHEMAS[table].append(
+        pa.field('term', pa.string())).append(pa.field('section', pa.string())))
+
+# Function to build a dataset filter for the given terms and section (None for all)
+def _make_filter(terms=None, section=None):
+    conditions = []
+    if terms is not None:
+        conditions.append(ds.field('term').isin(list(terms)))
+    if section is not None:
+        conditions.append(ds.field('section') == get_section_slug(section))
+    if not conditions:
+        return None
+    condition = conditions[0]
+    for other in conditions[1:]:
+        condition = condition & other
+    return condition
+
+# Function to total the points and bidders of every archived project, reading the bids batch by batch
+# Returns a DataFrame indexed by (term, section, project_id)
+def _sum_points(data_filter=None):
+    dataset = open_table('bids')
+    if dataset is None:
+        return pd.DataFrame(columns=['points', 'bidders'])
+
+    partials = []
+    for batch in dataset.to_batches(columns=['term', 'section', 'project_id', 'points'], filter=data_filter):
+        if batch.num_rows:
+            partials.append(batch.to_pandas().groupby(['term', 'section', 'project_id'])['points'].agg(['sum', 'count']))
+    if not partials:
+        return pd.DataFrame(columns=['points', 'bidders'])
+    totals = pd.concat(partials).groupby(level=[0, 1, 2]).sum()
+    return totals.rename(columns={'sum': 'points', 'count': 'bidders'})
+
+# Function to read the topics of the archived projects
+def _read_topics(data_filter=None):
+    dataset = open_table('submissions')
+    if dataset is None:
+        return pd.DataFrame(columns=['term', 'section', 'project_id', 'topic'])
+    return dataset.to_table(columns=['term', 'section', 'project_id', 'topic'], filter=data_filter).to_pandas()
+
+# Function to list the most bid-on topics of every archived term
+def topic_popularity(limit=10, terms=None, section=None):
+    data_filter = _make_filter(terms, section)
+    totals = _sum_points(data_filter)
+    topics = _read_topics(data_filter)
+    if totals.empty or topics.empty:
+        return pd.DataFrame(columns=['Term', 'Section', 'Project', 'Topic', 'Points', 'Bidders'])
+
+    popular = topics.merge(totals.reset_index(), on=['term', 'section', 'project_id'])
+    order = {term: i for i, term in enumerate(get_term_names())}
+    popular['order'] = popular['term'].map(order)
+    popular = popular.sort_values(['order', 'points'], ascending=[True, False]).groupby('term', sort=False).head(limit)
+    section_names = {get_section_slug(name): name for name in SECTIONS}
+    return pd.DataFrame({
+        'Term': popular['term'],
+        'Section': popular['section'].map(section_names).fillna(popular['section']),
+        'Project': popular['project_id'],
+        'Topic': popular['topic'],
+        'Points': popular['points'].astype(int),
+        'Bidders': popular['bidders'].astype(int)
+    }).reset_index(drop=True)
+
+# Function to follow a keyword across terms: how many projects mention it in their topic
+# and what share of each term's points they got
+def keyword_trend(keyword, section=None):
+    data_filter = _make_filter(section=section)
+    topics = _read_topics(data_filter)
+    matches = topics[topics['topic'].str.contains(keyword, case=False, regex=False)] if not topics.empty else topics
+    all_totals = _sum_points(data_filter)
+
+    rows = []
+    for term in get_term_names():
+        term_matches = matches[matches['term'] == term]
+        term_points = 0
+        matched_points = 0
+        if not all_totals.empty and term in all_totals.index.get_level_values(0):
+            term_totals = all_totals.xs(term, level=0)
+            term_points = int(term_totals['points'].sum())
+            keys = list(zip(term_matches['section'], term_matches['project_id']))
+            matched_points = int(term_totals.reindex(keys)['points'].fillna(0).sum()) if keys else 0
+        rows.append({
+            'Term': term,
+            'Projects': len(term_matches),
+            'Points': matched_points,
+            'Share of Points': matched_points / term_points if term_points else 0.0
+        })
+    return pd.DataFrame(rows, columns=['Term', 'Projects', 'Points', 'Share of Points'])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive past terms and query across them")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    archive_parser = subparsers.add_parser("archive", help="Archive a section's data under a term and reset it")
+    archive_parser.add_argument("term")
+    archive_parser.add_argument("--section", choices=SECTIONS, action="append",
+                                help="Section to archive (default: all sections)")
+
+    subparsers.add_parser("list", help="List the archived terms")
+
+    popular_parser = subparsers.add_parser("popular", help="Most bid-on topics of every term")
+    popular_parser.add_argument("--limit", type=int, default=10)
+
+    trend_parser = subparsers.add_parser("trend", help="Follow a topic keyword across terms")
+    trend_parser.add_argument("keyword")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "archive":
+        for section in args.section or SECTIONS:
+            try:
+                entry = archive_section(args.term, section)
+            except ValueError as e:
+                print(e, file=sys.stderr)
+                return 1
+            print(f"Archived {section} as {entry['term']}: {entry['submissions']} submissions, {entry['bidders']} bids")
+    elif args.command == "list":
+        for entry in list_terms():
+            print(f"{entry['term']:20} {entry['section']:10} {entry['archived']}  "
+                  f"{entry['submissions']:4} submissions  {entry['bidders']:4} bids  {entry['assigned']:4} assigned")
+    elif args.command == "popular":
+        print(topic_popularity(args.limit).to_string(index=False))
+    elif args.command == "trend":
+        print(keyword_trend(args.keyword).to_string(index=False))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
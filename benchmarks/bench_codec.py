@@ -0,0 +1,64 @@
+# Parse and dump time of 10k-record submissions and bids files under each installed JSON codec
+#
+# Usage: python benchmarks/bench_codec.py [number of records]
+import os
+import sys
+import json
+import random
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import codec
+
+# Function to build submissions and bids in the format the app saves
+def make_records(n_records):
+    random.seed(0)
+    submissions = []
+    bids = []
+    for i in range(n_records):
+        submissions.append({
+            'name': f"Student Number {i}",
+            'netid': f"student{i}",
+            'topic': f"Project topic number {i}",
+            'description': " ".join(random.choice(["data", "app", "sensor", "model", "users", "web", "campus"]) for _ in range(60)),
+            'timestamp': "2024-01-15 10:00:00",
+            'section': "Section A"
+        })
+        bids.append({
+            'netid': f"student{i}",
+            'name': f"Student Number {i}",
+            'bids': [
+                {'project_id': f"Project {p}", 'project_title': f"Project topic number {p}", 'points': points}
+                for p, points in zip(random.sample(range(1, n_records + 1), 3), (50, 30, 20))
+            ],
+            'timestamp': "2024-01-15 10:00:00",
+            'section': "Section A"
+        })
+    return {'submissions': submissions, 'bids': bids}
+
+# Function to time a call, best of a few runs, in milliseconds
+def best_ms(func, repeat=5):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+def main():
+    n_records = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    datasets = make_records(n_records)
+
+    print(f"{n_records} records per file, default codec: {codec.CODEC_NAME}")
+    print(f"{'file':12} {'codec':8} {'format':8} {'size KB':>9} {'dump ms':>9} {'parse ms':>9}")
+    for kind, records in datasets.items():
+        # What older versions wrote, for comparison
+        legacy = json.dumps(records, indent=4).encode("utf-8")
+        print(f"{kind:12} {'json':8} {'indent4':8} {len(legacy) / 1024:9.0f} "
+              f"{best_ms(lambda: json.dumps(records, indent=4)):9.1f} {best_ms(lambda: json.loads(legacy)):9.1f}")
+
+        for name, (loads, dumps) in codec.CODECS.items():
+            for pretty in (False, True):
+                data = dumps(records, pretty)
+                assert loads(data) == records and loads(legacy) == records
+                print(f"{kind:12} {name:8} {'pretty' if pretty else 'compact':8} {len(data) / 1024:9.0f} "
+                      f"{best_ms(lambda: dumps(records, pretty)):9.1f} {best_ms(lambda: loads(data)):9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+# Memory used by 100k bid items as loaded dicts, typed records and a BidTable
+#
+# Usage: python benchmarks/bench_records.py [number of bid items]
+import os
+import sys
+import gc
+import json
+import random
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from records import parse_bids, BidTable
+
+# Function to build a bids file with the given number of bid items (3 per student)
+def make_bids_json(n_items, n_projects=500):
+    random.seed(0)
+    bids = []
+    for s in range(n_items // 3):
+        bids.append({
+            'netid': f"student{s}",
+            'name': f"Student Number {s}",
+            'bids': [
+                {'project_id': f"Project {p}", 'project_title': f"Project topic number {p}", 'points': points}
+                for p, points in zip(random.sample(range(1, n_projects + 1), 3), (50, 30, 20))
+            ],
+            'timestamp': f"2024-01-15 {10 + s % 8:02d}:{s % 60:02d}:00",
+            'section': "Section A"
+        })
+    return json.dumps(bids)
+
+# Function to measure the memory still held by what `build` returns
+def retained_bytes(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return current, result
+
+def main():
+    n_items = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    text = make_bids_json(n_items)
+
+    dict_bytes, raw = retained_bytes(lambda: json.loads(text))
+    del raw
+    typed_bytes, typed = retained_bytes(lambda: parse_bids(json.loads(text)))
+    del typed
+    table_bytes, table = retained_bytes(lambda: BidTable.from_bids(parse_bids(json.loads(text))))
+
+    print(f"{len(table)} bid items")
+    print(f"dicts:         {dict_bytes / 1e6:8.1f} MB")
+    print(f"typed records: {typed_bytes / 1e6:8.1f} MB ({typed_bytes / dict_bytes:.0%} of dicts)")
+    print(f"BidTable:      {table_bytes / 1e6:8.1f} MB ({table_bytes / dict_bytes:.0%} of dicts)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Time to build the bid matrix of a synthetic cohort and clear a bidding round on it
+#
+# Usage: python benchmarks/bench_rounds.py [number of students] [seats per project]
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cohort
+import rounds
+
+# Function to time a call, best of a few runs, in milliseconds
+def best_ms(func, repeat=3):
+    return min(timeit.repeat(func, number=1, repeat=repeat)) * 1000
+
+def main():
+    n_students = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    seats = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    n_projects = max(1, n_students // 3)
+
+    generate_ms = best_ms(lambda: cohort.generate(n_students, n_projects), repeat=1)
+    students = cohort.generate(n_students, n_projects)
+    matrix = students.to_bid_matrix()
+    print(f"{n_students} students, {n_projects} projects, {matrix.nnz} bid items (generated in {generate_ms:.0f} ms)")
+
+    # Function to clear the first round with every project at full capacity
+    def clear():
+        remaining = {project_id: seats for project_id in matrix.project_ids.tolist()}
+        return rounds.clear_round(matrix, remaining, {})
+
+    print(f"bid matrix:  {best_ms(students.to_bid_matrix):8.1f} ms")
+    print(f"clear round: {best_ms(clear):8.1f} ms ({len(clear())} students assigned)")
+
+if __name__ == "__main__":
+    main()
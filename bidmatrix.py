@@ -0,0 +1,180 @@
+# Student x project bid matrix in sparse (CSR) form
+#
+# Row i is a student, column j a project and the values are points. Two
+# on-disk formats are supported:
+#   - .npz: the same layout as scipy.sparse.save_npz (so scipy.sparse.load_npz
+#     reads it) plus the student and project tables
+#   - a directory of .npy files, which load() memory-maps without copying
+#
+# Several terms can be concatenated with stack(); each term keeps its own
+# project columns.
+#
+# Usage from the command line:
+#   python bidmatrix.py export data/bids_section_a.json bids_section_a.npz
+#   python bidmatrix.py export data/bids_section_a.json bids_section_a --dir
+#   python bidmatrix.py info bids_section_a.npz
+import io
+import os
+import sys
+import json
+import argparse
+
+import numpy as np
+
+from records import BidTable, parse_bids
+from storage import read_records
+
+ARRAYS = ('indptr', 'indices', 'data', 'student_netids', 'student_names', 'project_ids', 'project_titles')
+
+class BidMatrix:
+    # CSR arrays of the points every student put on every project, with the row and column tables
+    __slots__ = ARRAYS + ('shape',)
+
+    def __init__(self, indptr, indices, data, student_netids, student_names, project_ids, project_titles):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.student_netids = student_netids
+        self.student_names = student_names
+        self.project_ids = project_ids
+        self.project_titles = project_titles
+        self.shape = (len(student_netids), len(project_ids))
+
+    @classmethod
+    def from_bid_table(cls, bid_table):
+        # Bid items are stored student by student, so the rows are already grouped
+        student = bid_table.column('student')
+        indptr = np.zeros(len(bid_table.netids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(student, minlength=len(bid_table.netids)), out=indptr[1:])
+        return cls(
+            indptr=indptr,
+            indices=bid_table.column('project').astype(np.int32),
+            data=bid_table.column('points').astype(np.int32),
+            student_netids=np.array(bid_table.netids, dtype=str),
+            student_names=np.array(bid_table.names, dtype=str),
+            project_ids=np.array(bid_table.project_ids, dtype=str),
+            project_titles=np.array(bid_table.project_titles, dtype=str)
+        )
+
+    @property
+    def nnz(self):
+        return len(self.data)
+
+    # Function to get the columns and points of one student's row
+    def row(self, i):
+        start, stop = self.indptr[i], self.indptr[i + 1]
+        return self.indices[start:stop], self.data[start:stop]
+
+    # Function to get the total points on every project
+    def column_totals(self):
+        return np.bincount(self.indices, weights=self.data, minlength=self.shape[1]).astype(np.int64)
+
+    # Function to expand the matrix (only for small sections)
+    def to_dense(self):
+        dense = np.zeros(self.shape, dtype=np.int32)
+        rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+        np.add.at(dense, (rows, self.indices), self.data)
+        return dense
+
+# Function to build the bid matrix of a bids file
+def from_bids_file(path):
+    return BidMatrix.from_bid_table(BidTable.from_bids(read_records(path, parse_bids)))
+
+# Function to write a bid matrix as .npz (to a path or a file object)
+# Uncompressed so it loads at disk speed; the format keys match scipy.sparse.save_npz
+def save_npz(file, matrix):
+    np.savez(
+        file,
+        format=np.array(b"csr"),
+        shape=np.array(matrix.shape, dtype=np.int64),
+        **{name: getattr(matrix, name) for name in ARRAYS}
+    )
+
+# Function to get a bid matrix as .npz bytes (for downloads)
+def to_npz_bytes(matrix):
+    buffer = io.BytesIO()
+    save_npz(buffer, matrix)
+    return buffer.getvalue()
+
+# Function to write a bid matrix as a directory of .npy files
+def save_dir(path, matrix):
+    os.makedirs(path, exist_ok=True)
+    for name in ARRAYS:
+        np.save(os.path.join(path, f"{name}.npy"), getattr(matrix, name))
+    with open(os.path.join(path, "meta.json"), "w") as f:
+        json.dump({'format': 'csr', 'shape': list(matrix.shape)}, f)
+
+# Function to load a bid matrix from .npz or from a directory of .npy files
+# Directories are memory-mapped: nothing is read until the arrays are used
+def load(path, mmap=True):
+    if os.path.isdir(path):
+        mmap_mode = "r" if mmap else None
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode) for name in ARRAYS}
+    else:
+        with np.load(path) as npz:
+            arrays = {name: npz[name] for name in ARRAYS}
+    return BidMatrix(**arrays)
+
+# Function to concatenate the matrices of several terms or sections
+# Rows are stacked and every matrix keeps its own project columns; `labels` (e.g. terms)
+# are prefixed to the student and project ids as "label/id"
+def stack(matrices, labels=None):
+    if labels is None:
+        labels = [str(i) for i in range(len(matrices))]
+    indptr = [np.zeros(1, dtype=np.int64)]
+    indices = []
+    nnz_offset = column_offset = 0
+    for matrix in matrices:
+        indptr.append(np.asarray(matrix.indptr[1:], dtype=np.int64) + nnz_offset)
+        indices.append(np.asarray(matrix.indices, dtype=np.int32) + column_offset)
+        nnz_offset += matrix.nnz
+        column_offset += matrix.shape[1]
+
+    # Function to prefix the ids of one matrix with its label
+    def labelled(name, prefix=True):
+        parts = [
+            np.char.add(f"{label}/", np.asarray(getattr(matrix, name))) if prefix else np.asarray(getattr(matrix, name))
+            for matrix, label in zip(matrices, labels)
+        ]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=str)
+
+    return BidMatrix(
+        indptr=np.concatenate(indptr),
+        indices=np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+        data=np.concatenate([np.asarray(matrix.data) for matrix in matrices]) if matrices else np.zeros(0, dtype=np.int32),
+        student_netids=labelled('student_netids'),
+        student_names=labelled('student_names', prefix=False),
+        project_ids=labelled('project_ids'),
+        project_titles=labelled('project_titles', prefix=False)
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export bids as a sparse student x project matrix")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Export a bids file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("output")
+    export_parser.add_argument("--dir", action="store_true", help="Write a memory-mappable directory of .npy files instead of .npz")
+
+    info_parser = subparsers.add_parser("info", help="Describe an exported matrix")
+    info_parser.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        matrix = from_bids_file(args.path)
+        if args.dir:
+            save_dir(args.output, matrix)
+        else:
+            save_npz(args.output, matrix)
+        print(f"Wrote {matrix.shape[0]} students x {matrix.shape[1]} projects ({matrix.nnz} bids) to {args.output}")
+    elif args.command == "info":
+        matrix = load(args.path)
+        print(f"{matrix.shape[0]} students x {matrix.shape[1]} projects, {matrix.nnz} bids")
+        for project_id, title, total in zip(matrix.project_ids, matrix.project_titles, matrix.column_totals()):
+            print(f"{project_id}: {title} - {total} points")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
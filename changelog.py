@@ -0,0 +1,180 @@
+# Per-record change log of the section data files
+#
+# Every write made through storage.write_section_file is appended to
+# data/changes/<file>.log as one JSON line per changed record, each with the
+# next sequence number of that file: {"seq", "op": "upsert" | "delete", "key",
+# "record"}. Records are keyed by NetID, which is unique in both files.
+# data/changes/<file>.keys.json keeps the NetID at every position of the data
+# file, so positional writes ("put"/"del"/"clear") can be turned into keyed
+# changes; data/changes/<file>.index.json is the log's epoch, length and the
+# data file's stat, small enough that readers never touch the keys.
+#
+# A cursor ("<epoch>.<seq>.<offset>") marks a point in the log. Reading the
+# changes since a cursor seeks straight to its byte offset, so it costs the
+# same however big the section is. When a data file is changed outside the
+# log (restored from a snapshot, edited by hand, generated), the log starts a
+# new epoch and older cursors need a full export.
+import os
+import uuid
+from datetime import datetime
+
+import codec
+import generations
+import snapshots
+
+CHANGES_DIR_NAME = "changes"
+
+# Function to get the directory a data file's change log is kept in
+def get_changes_dir(path):
+    return os.path.join(os.path.dirname(path) or ".", CHANGES_DIR_NAME)
+
+# Function to get the change log of a data file
+def get_log_path(path):
+    return os.path.join(get_changes_dir(path), f"{os.path.basename(path)}.log")
+
+# Function to get the index of a data file's change log
+def get_index_path(path):
+    return os.path.join(get_changes_dir(path), f"{os.path.basename(path)}.index.json")
+
+# Function to get the positional keys of a data file's change log
+def get_keys_path(path):
+    return os.path.join(get_changes_dir(path), f"{os.path.basename(path)}.keys.json")
+
+# Function to load the index of a data file's change log, or None if there isn't a usable one
+def _load_index(path):
+    index_file = get_index_path(path)
+    if not os.path.exists(index_file):
+        return None
+    try:
+        return codec.read_json(index_file)
+    except codec.DecodeError:
+        return None
+
+# Function to start a new epoch from the data file's current records, dropping the old log
+def _start_epoch(path, records, seq=0):
+    os.makedirs(get_changes_dir(path), exist_ok=True)
+    open(get_log_path(path), "wb").close()
+    codec.write_json(get_keys_path(path), [record.get('netid') for record in records])
+    index = {
+        'epoch': uuid.uuid4().hex[:8],
+        'seq': seq,
+        'offset': 0,
+        'stat': list(snapshots.file_stat(path)) if os.path.exists(path) else None
+    }
+    codec.write_json(get_index_path(path), index)
+    return index
+
+# Function to append a write to the change log
+# `before` is the data file's stat right before the write, `ops` the positional changes
+# and `records` the records written (as dicts); callers hold generations.locked(path)
+def record(path, before, ops, records):
+    index = _load_index(path)
+    if index is None or index['stat'] != (list(before) if before is not None else None):
+        # The file changed outside the log (or this is its first logged write), start over from what was written
+        _start_epoch(path, records, index['seq'] if index else 0)
+        return
+
+    keys = codec.read_json(get_keys_path(path))
+    changes = []
+    for op in ops:
+        if op[0] == "put":
+            i, data = op[1], op[2]
+            if i < len(keys) and keys[i] != data.get('netid'):
+                changes.append({'op': 'delete', 'key': keys[i]})
+            if i < len(keys):
+                keys[i] = data.get('netid')
+            else:
+                keys.append(data.get('netid'))
+            changes.append({'op': 'upsert', 'key': data.get('netid'), 'record': data})
+        elif op[0] == "del":
+            changes.append({'op': 'delete', 'key': keys.pop(op[1])})
+        elif op[0] == "clear":
+            changes.extend({'op': 'delete', 'key': key} for key in keys)
+            keys.clear()
+
+    lines = []
+    for change in changes:
+        index['seq'] += 1
+        lines.append(codec.dumps(dict(change, seq=index['seq'])) + b"\n")
+    with open(get_log_path(path), "ab") as f:
+        f.seek(index['offset'])
+        f.truncate()  # Drop anything a crashed write left after the last complete change
+        f.write(b"".join(lines))
+        index['offset'] = f.tell()
+    index['stat'] = list(snapshots.file_stat(path))
+    codec.write_json(get_keys_path(path), keys)
+    codec.write_json(get_index_path(path), index)
+
+# Function to make a cursor from a log index
+def _make_cursor(index):
+    return f"{index['epoch']}.{index['seq']}.{index['offset']}"
+
+# Function to get the cursor of a data file's current contents
+# Starts a new epoch first if the file changed outside the log
+def get_cursor(path):
+    with generations.locked(path):
+        index = _load_index(path)
+        stat = list(snapshots.file_stat(path)) if os.path.exists(path) else None
+        if index is None or index['stat'] != stat:
+            records = snapshots.read_records(path) if os.path.exists(path) else []
+            index = _start_epoch(path, records, index['seq'] if index else 0)
+        return _make_cursor(index)
+
+# Function to get the changes to a data file since a cursor
+# Returns (cursor, upserts, deletes): the latest record of every changed key and the deleted keys,
+# or None if the cursor is from another epoch and only a full export is accurate
+def changes_since(path, cursor):
+    try:
+        epoch, seq, offset = cursor.split(".")
+        seq, offset = int(seq), int(offset)
+    except (AttributeError, ValueError):
+        return None
+
+    # Under the lock so a write can't be half-way between the data file and the log
+    with generations.locked(path):
+        index = _load_index(path)
+        stat = list(snapshots.file_stat(path)) if os.path.exists(path) else None
+        if index is None or index['epoch'] != epoch or index['stat'] != stat or offset > index['offset']:
+            return None
+        with open(get_log_path(path), "rb") as f:
+            f.seek(offset)
+            data = f.read(index['offset'] - offset)
+
+    upserts = {}
+    deletes = set()
+    for line in data.splitlines():
+        change = codec.loads(line)
+        if change['seq'] <= seq:
+            continue
+        if change['op'] == "upsert":
+            upserts[change['key']] = change['record']
+            deletes.discard(change['key'])
+        else:
+            upserts.pop(change['key'], None)
+            deletes.add(change['key'])
+    # A key deleted and re-added ends up as an upsert; one that never existed before the cursor may show as a delete
+    return _make_cursor(index), upserts, deletes
+
+# Function to get the file the exports of a section are listed in
+def get_exports_path(data_dir, name):
+    return os.path.join(data_dir, CHANGES_DIR_NAME, f"exports_{name}.json")
+
+# Function to list the exports in an exports file, oldest first
+def list_exports(exports_file):
+    if not os.path.exists(exports_file):
+        return []
+    return codec.read_json(exports_file)
+
+# Function to remember an export so later ones can include only what changed since
+# `cursors` maps each exported file kind to its cursor
+def record_export(exports_file, cursors, kind="full", keep=50):
+    os.makedirs(os.path.dirname(exports_file), exist_ok=True)
+    with generations.locked(exports_file):
+        exports = list_exports(exports_file)
+        exports.append({
+            'id': (exports[-1]['id'] + 1) if exports else 1,
+            'created': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            'kind': kind,
+            'cursors': cursors
+        })
+        codec.write_json(exports_file, exports[-keep:])
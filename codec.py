@@ -0,0 +1,123 @@
+# JSON codec used for all data files
+#
+# Uses orjson or msgspec when one is installed and falls back to the standard
+# library json module otherwise. Files are written compact by default; pass
+# pretty=True for a human-readable export, indented by 4 whichever codec is
+# used. Any of these reads files written by any other, including the indented
+# files written by older versions.
+#
+# Set the JSON_CODEC environment variable to "orjson", "msgspec" or "json" to
+# force a codec.
+#
+# Usage from the command line:
+#   python codec.py pretty data/bids_section_a.json bids.json
+#   python codec.py compact data/bids_section_a.json
+import os
+import sys
+import json
+import argparse
+import threading
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Raised by loads() and read_json() for data that isn't valid JSON, whichever codec is used
+DecodeError = json.JSONDecodeError
+
+# Function to decode JSON with the standard library
+def _json_loads(data):
+    return json.loads(data)
+
+# Function to encode JSON with the standard library
+def _json_dumps(obj, pretty=False):
+    if pretty:
+        return json.dumps(obj, indent=4, ensure_ascii=False).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+# Function to decode JSON with orjson (its JSONDecodeError already subclasses json.JSONDecodeError)
+def _orjson_loads(data):
+    return orjson.loads(data)
+
+# Function to encode JSON with orjson
+# orjson can only indent by 2, so indented exports go through the standard library to match the other codecs
+def _orjson_dumps(obj, pretty=False):
+    if pretty:
+        return _json_dumps(obj, pretty=True)
+    return orjson.dumps(obj)
+
+# Function to decode JSON with msgspec
+def _msgspec_loads(data):
+    try:
+        return msgspec.json.decode(data)
+    except msgspec.DecodeError as e:
+        raise DecodeError(str(e), data if isinstance(data, str) else "", 0) from e
+
+# Function to encode JSON with msgspec
+def _msgspec_dumps(obj, pretty=False):
+    data = msgspec.json.encode(obj)
+    return msgspec.json.format(data, indent=4) if pretty else data
+
+CODECS = {'json': (_json_loads, _json_dumps)}
+if msgspec is not None:
+    CODECS['msgspec'] = (_msgspec_loads, _msgspec_dumps)
+if orjson is not None:
+    CODECS['orjson'] = (_orjson_loads, _orjson_dumps)
+
+# Function to pick the codec to use: JSON_CODEC if set, otherwise the fastest one installed
+def get_codec_name():
+    name = os.environ.get("JSON_CODEC")
+    if name:
+        if name not in CODECS:
+            raise ValueError(f"JSON codec '{name}' is not available (installed: {', '.join(sorted(CODECS))})")
+        return name
+    for name in ('orjson', 'msgspec', 'json'):
+        if name in CODECS:
+            return name
+
+CODEC_NAME = get_codec_name()
+_loads, _dumps = CODECS[CODEC_NAME]
+
+# Function to decode JSON from bytes or str
+def loads(data):
+    return _loads(data)
+
+# Function to encode an object as UTF-8 JSON bytes
+def dumps(obj, pretty=False):
+    return _dumps(obj, pretty)
+
+# Function to read a JSON file
+def read_json(path):
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+# Function to write a JSON file
+# Writes to a temporary file first so readers never see a half-written file
+def write_json(path, obj, pretty=False):
+    tmp_file = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(dumps(obj, pretty))
+    os.replace(tmp_file, path)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Rewrite a JSON data file (codec: {CODEC_NAME})")
+    parser.add_argument("format", choices=["pretty", "compact"])
+    parser.add_argument("path")
+    parser.add_argument("output", nargs="?", help="Where to write the result (default: print it)")
+    args = parser.parse_args(argv)
+
+    data = read_json(args.path)
+    if args.output:
+        write_json(args.output, data, pretty=args.format == "pretty")
+    else:
+        sys.stdout.write(dumps(data, pretty=args.format == "pretty").decode("utf-8") + "\n")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
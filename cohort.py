@@ -0,0 +1,250 @@
+# Synthetic cohorts for scale and load testing
+#
+# Generates N students and M projects with the fields, text lengths and value
+# ranges the app itself writes: the first M students each submit a project,
+# most students bid on 3 other projects (some on fewer) with points in steps
+# of 5 adding up to at most 100, and project popularity follows a Zipf-like
+# curve so a few projects get most of the points.
+#
+# Everything is drawn column by column with NumPy; dicts are only built when
+# the records are asked for, and to_bid_matrix() skips them entirely, so a
+# million bid items take a few seconds.
+#
+# Usage from the command line (writes the section's data files):
+#   python cohort.py --students 2000 --projects 600
+#   python cohort.py --students 333334 --projects 5000 --section "Section B" --force
+import os
+import sys
+import argparse
+
+import numpy as np
+
+import bidmatrix
+import codec
+import feed
+import generations
+import snapshots
+from storage import SECTIONS, get_section_files
+
+MAX_POINTS = 100
+MAX_PROJECTS = 3
+POINT_STEP = 5
+CANDIDATES = 8  # Projects drawn per student to pick 3 distinct ones that aren't their own
+
+FIRST_NAMES = ["Alex", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn", "Skyler",
+               "Wei", "Priya", "Mateo", "Aisha", "Yuki", "Omar", "Sofia", "Liam", "Mei", "Arjun"]
+LAST_NAMES = ["Nguyen", "Smith", "Garcia", "Kim", "Patel", "Chen", "Johnson", "Lopez", "Singh", "Brown",
+              "Wang", "Martinez", "Lee", "Davis", "Ali", "Zhang", "Wilson", "Kumar", "Tanaka", "Rossi"]
+
+# Topic vocabularies; each project draws mostly from one theme so themes can be found in them
+THEMES = [
+    ["smart", "campus", "parking", "navigation", "map", "shuttle", "transit", "bike", "route", "tracker"],
+    ["health", "fitness", "sleep", "diet", "wellness", "habit", "mental", "workout", "coach", "monitor"],
+    ["study", "course", "tutor", "flashcard", "quiz", "learning", "notes", "exam", "schedule", "planner"],
+    ["sensor", "iot", "energy", "home", "garden", "plant", "water", "air", "quality", "device"],
+    ["music", "game", "story", "art", "video", "playlist", "social", "event", "club", "community"],
+    ["finance", "budget", "expense", "market", "price", "shopping", "food", "recipe", "grocery", "delivery"]
+]
+COMMON_WORDS = ["app", "assistant", "platform", "dashboard", "tool", "system", "helper", "finder", "ai", "web"]
+DESCRIPTION_WORDS = ["users", "data", "students", "we", "will", "build", "a", "the", "to", "and", "with", "that",
+                     "real-time", "model", "interface", "mobile", "feedback", "api", "track", "help"]
+
+class Cohort:
+    # A generated cohort as columns
+    #
+    # Students are rows 0..N-1 and project j is "Project {j+1}", submitted by student j.
+    # choices/points are (bidders, 3) arrays padded with -1/0 past each student's bid count.
+    __slots__ = ('section', 'netids', 'names', 'topics', 'descriptions', 'submitted', 'bidders', 'choices', 'points', 'bid_times')
+
+    def __init__(self, section, netids, names, topics, descriptions, submitted, bidders, choices, points, bid_times):
+        self.section = section
+        self.netids = netids
+        self.names = names
+        self.topics = topics
+        self.descriptions = descriptions
+        self.submitted = submitted
+        self.bidders = bidders
+        self.choices = choices
+        self.points = points
+        self.bid_times = bid_times
+
+    @property
+    def bid_items(self):
+        return int((self.choices >= 0).sum())
+
+    # Function to get the submissions in the schema save_submission writes
+    def submission_records(self):
+        return [
+            {
+                'name': self.names[j],
+                'netid': self.netids[j],
+                'topic': self.topics[j],
+                'description': self.descriptions[j],
+                'timestamp': self.submitted[j],
+                'section': self.section
+            }
+            for j in range(len(self.topics))
+        ]
+
+    # Function to get the bids in the schema save_bid writes
+    def bid_records(self):
+        project_ids = [f"Project {j+1}" for j in range(len(self.topics))]
+        choices = self.choices.tolist()
+        points = self.points.tolist()
+        return [
+            {
+                'netid': self.netids[student],
+                'name': self.names[student],
+                'bids': [
+                    {'project_id': project_ids[project], 'project_title': self.topics[project], 'points': item_points}
+                    for project, item_points in zip(choices[row], points[row]) if project >= 0
+                ],
+                'timestamp': self.bid_times[row],
+                'section': self.section
+            }
+            for row, student in enumerate(self.bidders.tolist())
+        ]
+
+    # Function to get the bids as a student x project matrix without building any records
+    def to_bid_matrix(self):
+        mask = self.choices >= 0
+        indptr = np.zeros(len(self.bidders) + 1, dtype=np.int64)
+        np.cumsum(mask.sum(axis=1), out=indptr[1:])
+        return bidmatrix.BidMatrix(
+            indptr=indptr,
+            indices=self.choices[mask].astype(np.int32),
+            data=self.points[mask].astype(np.int32),
+            student_netids=np.asarray(self.netids)[self.bidders],
+            student_names=np.asarray(self.names)[self.bidders],
+            project_ids=np.array([f"Project {j+1}" for j in range(len(self.topics))], dtype=str),
+            project_titles=np.asarray(self.topics, dtype=str)
+        )
+
+# Function to make timestamps `offsets` seconds after `start`, as the app formats them
+def _timestamps(start, offsets):
+    times = np.datetime64(start, 's') + np.sort(offsets).astype('timedelta64[s]')
+    return np.char.replace(np.datetime_as_string(times, unit='s'), "T", " ").tolist()
+
+# Function to make `count` strings of `lengths` words drawn from `words`
+def _texts(rng, count, lengths, words):
+    drawn = rng.integers(len(words), size=(count, int(lengths.max()) if count else 0))
+    return [" ".join(words[w] for w in row[:length]) for row, length in zip(drawn.tolist(), lengths.tolist())]
+
+# Function to draw project topics: 2-6 title-case words, mostly from the project's theme
+def _topics(rng, n_projects):
+    themes = rng.integers(len(THEMES), size=n_projects)
+    lengths = rng.integers(2, 7, size=n_projects)
+    own_words = rng.random((n_projects, 6)) < 0.8
+    # Random orders of each vocabulary, so no word repeats within a topic
+    theme_words = np.argsort(rng.random((n_projects, len(THEMES[0]))), axis=1)[:, :6]
+    common_words = np.argsort(rng.random((n_projects, len(COMMON_WORDS))), axis=1)[:, :6]
+    topics = []
+    for j in range(n_projects):
+        words = [
+            THEMES[themes[j]][theme_words[j, k]] if own_words[j, k] else COMMON_WORDS[common_words[j, k]]
+            for k in range(lengths[j])
+        ]
+        topics.append(" ".join(word.capitalize() for word in words))
+    return topics
+
+# Function to draw every student's bids
+# Returns (choices, points): (students, 3) project indices (-1 when unused) and points, largest first
+def _bids(rng, n_students, n_projects, owners, zipf):
+    # Zipf-like popularity over a random order of the projects
+    popularity = 1.0 / np.arange(1, n_projects + 1) ** zipf
+    popularity = popularity[rng.permutation(n_projects)]
+    popularity /= popularity.sum()
+
+    # Draw a few candidates per student and keep the first 3 distinct ones that aren't their own
+    candidates = rng.choice(n_projects, size=(n_students, CANDIDATES), p=popularity)
+    valid = candidates != owners[:, None]
+    for k in range(1, CANDIDATES):
+        valid[:, k] &= (candidates[:, k:k + 1] != candidates[:, :k]).all(axis=1)
+
+    # Most students use all 3 picks; with very few projects some can't
+    wanted = rng.choice([1, 2, 3], size=n_students, p=[0.05, 0.10, 0.85])
+    rank = np.cumsum(valid, axis=1)
+    keep = valid & (rank <= wanted[:, None])
+    counts = keep.sum(axis=1)
+    order = np.argsort(~keep, axis=1, kind="stable")[:, :MAX_PROJECTS]
+    choices = np.where(np.arange(MAX_PROJECTS) < counts[:, None], np.take_along_axis(candidates, order, axis=1), -1)
+
+    # Split each student's budget (usually all 100, sometimes less) into steps of 5, at least one step each
+    budgets = np.where(rng.random(n_students) < 0.9, MAX_POINTS, rng.integers(10, 20, size=n_students) * POINT_STEP)
+    steps = budgets // POINT_STEP - counts
+    shares = rng.dirichlet(np.ones(MAX_PROJECTS), size=n_students) * (choices >= 0)
+    shares /= np.maximum(shares.sum(axis=1, keepdims=True), 1e-12)
+    units = np.floor(shares * steps[:, None]).astype(np.int64) + (choices >= 0)
+    units[:, 0] += np.where(counts > 0, budgets // POINT_STEP - units.sum(axis=1), 0)
+
+    # Students put the most points on their first choice
+    units = -np.sort(-units, axis=1)
+    return choices, units * POINT_STEP
+
+# Function to generate a cohort of `n_students` students and `n_projects` projects
+# `participation` is the share of students who bid and `zipf` how skewed popularity is
+def generate(n_students, n_projects, section=SECTIONS[0], seed=0, participation=0.9, zipf=1.1,
+             start="2024-01-08 09:00:00"):
+    if not 0 < n_projects <= n_students:
+        raise ValueError("Every project is submitted by a student, so 0 < projects <= students")
+    rng = np.random.default_rng(seed)
+
+    netids = [f"s{i:07d}" for i in range(n_students)]
+    first = rng.integers(len(FIRST_NAMES), size=n_students).tolist()
+    last = rng.integers(len(LAST_NAMES), size=n_students).tolist()
+    names = [f"{FIRST_NAMES[f]} {LAST_NAMES[l]}" for f, l in zip(first, last)]
+
+    # Descriptions of about 20-150 words, like the ones students write
+    topics = _topics(rng, n_projects)
+    description_lengths = np.clip(rng.lognormal(np.log(50), 0.5, size=n_projects), 10, 150).astype(np.int64)
+    descriptions = [text.capitalize() + "." for text in _texts(rng, n_projects, description_lengths, DESCRIPTION_WORDS)]
+    submitted = _timestamps(start, rng.integers(0, 7 * 24 * 3600, size=n_projects))
+
+    # Bids come in the week after submissions close
+    bidders = np.flatnonzero(rng.random(n_students) < participation)
+    owners = np.where(bidders < n_projects, bidders, -1)
+    choices, points = _bids(rng, len(bidders), n_projects, owners, zipf)
+    has_bids = choices[:, 0] >= 0
+    bidders, choices, points = bidders[has_bids], choices[has_bids], points[has_bids]
+    bid_start = np.datetime64(start, 's') + np.timedelta64(7 * 24 * 3600, 's')
+    bid_times = _timestamps(bid_start, rng.integers(0, 7 * 24 * 3600, size=len(bidders)))
+
+    return Cohort(section, netids, names, topics, descriptions, submitted, bidders, choices, points, bid_times)
+
+# Function to write a cohort into its section's data files
+# Existing data is snapshotted first; running workers see the new data on their next rerun
+def write(cohort):
+    section_files = get_section_files(cohort.section)
+    for kind, records in (('submissions', cohort.submission_records()), ('bids', cohort.bid_records())):
+        path = section_files[kind]
+        with generations.locked(path):
+            snapshots.snapshot(path, reason="before writing a synthetic cohort")
+            codec.write_json(path, records)
+            generations.bump(path)
+            feed.emit(cohort.section, [feed.section_replaced(kind, "synthetic cohort")])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic cohort into a section's data files")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--projects", type=int, default=None, help="Default: a third of the students")
+    parser.add_argument("--section", choices=SECTIONS, default=SECTIONS[0])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--participation", type=float, default=0.9, help="Share of students who bid")
+    parser.add_argument("--zipf", type=float, default=1.1, help="Popularity skew (0 is uniform)")
+    parser.add_argument("--force", action="store_true", help="Replace a section that already has data")
+    args = parser.parse_args(argv)
+
+    section_files = get_section_files(args.section)
+    if not args.force and any(os.path.exists(path) and os.path.getsize(path) > 2 for path in section_files.values()):
+        print(f"{args.section} already has data, use --force to replace it (a snapshot is taken first)", file=sys.stderr)
+        return 1
+
+    projects = args.projects or max(1, args.students // 3)
+    cohort = generate(args.students, projects, args.section, args.seed, args.participation, args.zipf)
+    write(cohort)
+    print(f"Wrote {args.students} students, {projects} projects and {len(cohort.bidders)} bids "
+          f"({cohort.bid_items} bid items) to {args.section}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# Ad-hoc SQL over every section's data
+#
+# The submissions, bids and rounds of all sections are loaded once per data
+# generation into an in-memory SQLite database with these tables:
+#   submissions(section, project_id, netid, name, topic, description, timestamp)
+#   bids(section, netid, name, choice, project_id, project_title, points, timestamp)
+#       one row per bid item; choice 1 is the student's highest bid
+#   projects(section, project_id, topic, owner_netid, seats, bidders, points)
+#   assignments(section, netid, project_id, project_title, points, round)
+#
+# Queries are read-only, return at most a row limit and are interrupted after
+# a timeout, so a question typed into the admin console can't write anything
+# or hold up the app.
+#
+# Usage from the command line:
+#   python console.py "SELECT section, COUNT(*) FROM bids GROUP BY section"
+import sys
+import time
+import sqlite3
+import argparse
+import threading
+
+import pandas as pd
+
+import rounds
+from records import parse_submissions, parse_bids
+from storage import SECTIONS, get_section_files, read_records
+
+DEFAULT_LIMIT = 1000
+DEFAULT_TIMEOUT = 5.0  # Seconds
+PROGRESS_STEPS = 10000  # SQLite instructions between timeout checks
+
+SCHEMA = """
+CREATE TABLE submissions (section TEXT, project_id TEXT, netid TEXT, name TEXT, topic TEXT, description TEXT, timestamp TEXT);
+CREATE TABLE bids (section TEXT, netid TEXT, name TEXT, choice INTEGER, project_id TEXT, project_title TEXT, points INTEGER, timestamp TEXT);
+CREATE TABLE projects (section TEXT, project_id TEXT, topic TEXT, owner_netid TEXT, seats INTEGER, bidders INTEGER, points INTEGER);
+CREATE TABLE assignments (section TEXT, netid TEXT, project_id TEXT, project_title TEXT, points INTEGER, round INTEGER);
+CREATE INDEX bids_project ON bids (section, project_id);
+CREATE INDEX bids_netid ON bids (section, netid);
+"""
+
+# Questions the fixed admin views don't answer, as starting points
+EXAMPLES = {
+    "Students whose top bid is on an oversubscribed project": """SELECT b.section, b.netid, b.name, b.project_id, b.points, p.bidders, p.seats
+FROM bids b JOIN projects p ON p.section = b.section AND p.project_id = b.project_id
+WHERE b.choice = 1 AND p.bidders > p.seats
+ORDER BY p.bidders DESC, b.points DESC""",
+    "Projects nobody has bid on": """SELECT section, project_id, topic, owner_netid
+FROM projects
+WHERE bidders = 0
+ORDER BY section, project_id""",
+    "Students who submitted a project but haven't bid": """SELECT s.section, s.netid, s.name, s.project_id
+FROM submissions s
+WHERE NOT EXISTS (SELECT 1 FROM bids b WHERE b.section = s.section AND b.netid = s.netid)
+ORDER BY s.section, s.name""",
+    "Most popular projects in each section": """SELECT section, project_id, topic, bidders, points
+FROM projects p
+WHERE (SELECT COUNT(*) FROM projects q WHERE q.section = p.section AND q.points > p.points) < 5
+ORDER BY section, points DESC""",
+    "Topics that appear in more than one section": """SELECT LOWER(topic) AS topic, COUNT(DISTINCT section) AS sections, GROUP_CONCAT(section || ' ' || project_id, ', ') AS projects
+FROM submissions
+GROUP BY LOWER(topic)
+HAVING COUNT(DISTINCT section) > 1"""
+}
+
+class QueryError(Exception):
+    # A query that failed, was not allowed or ran out of time
+    pass
+
+# Function to refuse anything a query could use to reach outside the in-memory tables
+def _authorize(action, arg1, arg2, database, source):
+    if action in (sqlite3.SQLITE_ATTACH, sqlite3.SQLITE_DETACH, sqlite3.SQLITE_PRAGMA):
+        return sqlite3.SQLITE_DENY
+    return sqlite3.SQLITE_OK
+
+class Database:
+    # In-memory tables of every section, shared by every session
+    #
+    # SQLite connections can't run two statements at once, so queries take turns.
+
+    def __init__(self, sections):
+        self.connection = sqlite3.connect(":memory:", check_same_thread=False)
+        self.lock = threading.Lock()
+        self.row_counts = {}
+        self._load(sections)
+        self.connection.execute("PRAGMA query_only = ON")
+        self.connection.set_authorizer(_authorize)
+
+    # Function to fill the tables from {section: (submissions, bids, round_state)}
+    def _load(self, sections):
+        submission_rows, bid_rows, project_rows, assignment_rows = [], [], [], []
+        for section, (submissions, bids, round_state) in sections.items():
+            project_ids = [f"Project {i+1}" for i in range(len(submissions))]
+            bidders = dict.fromkeys(project_ids, 0)
+            points = dict.fromkeys(project_ids, 0)
+
+            for project_id, submission in zip(project_ids, submissions):
+                submission_rows.append((section, project_id, submission.netid, submission.name, submission.topic,
+                                        submission.description, submission.timestamp))
+            for bid in bids:
+                # Choice 1 is the highest bid; equal bids keep the order they were made in
+                ranked = sorted(bid.bids, key=lambda item: -item.points)
+                for choice, item in enumerate(ranked, start=1):
+                    bid_rows.append((section, bid.netid, bid.name, choice, item.project_id, item.project_title,
+                                     item.points, bid.timestamp))
+                    if item.project_id in bidders:
+                        bidders[item.project_id] += 1
+                        points[item.project_id] += item.points
+
+            default_seats = round_state['default_seats'] or rounds.DEFAULT_SEATS
+            for project_id, submission in zip(project_ids, submissions):
+                project_rows.append((section, project_id, submission.topic, submission.netid,
+                                     round_state['seats'].get(project_id, default_seats),
+                                     bidders[project_id], points[project_id]))
+            for netid, assignment in round_state['assignments'].items():
+                assignment_rows.append((section, netid, assignment['project_id'], assignment['project_title'],
+                                        assignment['points'], assignment['round']))
+
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            self.connection.executemany("INSERT INTO submissions VALUES (?, ?, ?, ?, ?, ?, ?)", submission_rows)
+            self.connection.executemany("INSERT INTO bids VALUES (?, ?, ?, ?, ?, ?, ?, ?)", bid_rows)
+            self.connection.executemany("INSERT INTO projects VALUES (?, ?, ?, ?, ?, ?, ?)", project_rows)
+            self.connection.executemany("INSERT INTO assignments VALUES (?, ?, ?, ?, ?, ?)", assignment_rows)
+        self.row_counts = {
+            'submissions': len(submission_rows),
+            'bids': len(bid_rows),
+            'projects': len(project_rows),
+            'assignments': len(assignment_rows)
+        }
+
+    # Function to run a query
+    # Returns (DataFrame, truncated) with at most `limit` rows; raises QueryError if it fails or takes longer than `timeout`
+    def query(self, sql, limit=DEFAULT_LIMIT, timeout=DEFAULT_TIMEOUT):
+        with self.lock:
+            deadline = time.monotonic() + timeout
+            self.connection.set_progress_handler(lambda: time.monotonic() > deadline, PROGRESS_STEPS)
+            try:
+                cursor = self.connection.execute(sql)
+                rows = cursor.fetchmany(limit + 1) if cursor.description else []
+                columns = [column[0] for column in cursor.description or ()]
+                cursor.close()
+            except sqlite3.OperationalError as e:
+                if str(e) == "interrupted":
+                    raise QueryError(f"The query took longer than {timeout:g} seconds and was stopped")
+                raise QueryError(str(e))
+            except (sqlite3.Error, sqlite3.Warning) as e:
+                raise QueryError(str(e))
+            finally:
+                self.connection.set_progress_handler(None, 0)
+        return pd.DataFrame(rows[:limit], columns=columns), len(rows) > limit
+
+# Function to build the database straight from the data files (for the command line)
+def load_database():
+    sections = {}
+    for section in SECTIONS:
+        section_files = get_section_files(section)
+        sections[section] = (
+            read_records(section_files['submissions'], parse_submissions),
+            read_records(section_files['bids'], parse_bids),
+            rounds.load(section_files['bids'])
+        )
+    return Database(sections)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a read-only SQL query over every section's data")
+    parser.add_argument("sql", nargs="?", help="Query to run (default: list the example queries)")
+    parser.add_argument("--limit", type=int, default=DEFAULT_LIMIT)
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT)
+    args = parser.parse_args(argv)
+
+    if not args.sql:
+        for title, sql in EXAMPLES.items():
+            print(f"-- {title}\n{sql};\n")
+        return 0
+
+    try:
+        result, truncated = load_database().query(args.sql, args.limit, args.timeout)
+    except QueryError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(result.to_string(index=False))
+    if truncated:
+        print(f"(only the first {args.limit} rows)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# Per-section change feed
+#
+# The app's save, delete and clear functions (and restores, round closes,
+# archiving and synthetic cohorts) append events to data/feed/<section>.log,
+# one JSON line each, in the order they happened:
+#   submission.added  {netid, name, project_id, topic}
+#   bid.upserted      {netid, name, bids, previous_bids}
+#   bid.deleted       {netid, previous_bids}
+#   section.cleared   {file, count, reason}   every record of the file was removed
+#   section.replaced  {file, reason}          the file was replaced as a whole; re-read it
+# Every event also has its "seq", "time" and "section". Bid items are
+# {project_id, project_title, points}, so a project owner's bot can tell which
+# bids on their project changed.
+#
+# data/feed/<section>.index.json keeps the feed's epoch, length and end
+# offset. A cursor ("<epoch>.<seq>.<offset>", like the change log's) points
+# just after an event: reading from it seeks straight to its byte offset and
+# reads one page of lines, so consumers only ever hold one page however long
+# the feed is.
+#
+# Usage from the command line:
+#   python feed.py --section "Section A" --cursor <cursor> --follow
+import os
+import sys
+import time
+import uuid
+import argparse
+from datetime import datetime
+
+import codec
+import generations
+from storage import SECTIONS, DATA_DIR, get_section_slug
+
+FEED_DIR = os.path.join(DATA_DIR, "feed")
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+class CursorError(ValueError):
+    # A cursor that isn't from this feed (or from before it was started over)
+    pass
+
+# Function to get the event log of a section
+def get_feed_path(section):
+    return os.path.join(FEED_DIR, f"{get_section_slug(section)}.log")
+
+# Function to get the index of a section's event log
+def get_index_path(section):
+    return os.path.join(FEED_DIR, f"{get_section_slug(section)}.index.json")
+
+# Function to load the index of a section's feed, or None if there isn't a usable one
+def _load_index(section):
+    index_file = get_index_path(section)
+    if not os.path.exists(index_file):
+        return None
+    try:
+        return codec.read_json(index_file)
+    except codec.DecodeError:
+        return None
+
+# Function to start a section's feed over with an empty log
+# Only happens before the first event or if the index was lost; cursors from before then stop working
+def _start_feed(section):
+    os.makedirs(FEED_DIR, exist_ok=True)
+    open(get_feed_path(section), "wb").close()
+    index = {'epoch': uuid.uuid4().hex[:8], 'seq': 0, 'offset': 0}
+    codec.write_json(get_index_path(section), index)
+    return index
+
+# Function to make a cursor pointing after `seq` at byte `offset`
+def _make_cursor(epoch, seq, offset):
+    return f"{epoch}.{seq}.{offset}"
+
+# Function to make a submission.added event
+def submission_added(submission, project_id):
+    return {'type': "submission.added", 'netid': submission.netid, 'name': submission.name,
+            'project_id': project_id, 'topic': submission.topic}
+
+# Function to make a bid.upserted event from the saved bid and the items it replaced (empty if it's new)
+def bid_upserted(bid, previous_items=()):
+    return {'type': "bid.upserted", 'netid': bid.netid, 'name': bid.name,
+            'bids': [item.to_dict() for item in bid.bids],
+            'previous_bids': [item.to_dict() for item in previous_items]}
+
+# Function to make a bid.deleted event
+def bid_deleted(netid, previous_items):
+    return {'type': "bid.deleted", 'netid': netid, 'previous_bids': [item.to_dict() for item in previous_items]}
+
+# Function to make a section.cleared event
+def section_cleared(file_kind, count, reason="clear"):
+    return {'type': "section.cleared", 'file': file_kind, 'count': count, 'reason': reason}
+
+# Function to make a section.replaced event
+def section_replaced(file_kind, reason):
+    return {'type': "section.replaced", 'file': file_kind, 'reason': reason}
+
+# Function to append events to a section's feed
+# Callers emit while they still hold the data file's lock, so events are in the order of the writes
+def emit(section, events):
+    if not events:
+        return
+    os.makedirs(FEED_DIR, exist_ok=True)
+    with generations.locked(get_feed_path(section)):
+        index = _load_index(section) or _start_feed(section)
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        lines = []
+        for event in events:
+            index['seq'] += 1
+            lines.append(codec.dumps(dict(event, seq=index['seq'], time=now, section=section)) + b"\n")
+        with open(get_feed_path(section), "ab") as f:
+            f.seek(index['offset'])
+            f.truncate()  # Drop anything a crashed emit left after the last complete event
+            f.write(b"".join(lines))
+            index['offset'] = f.tell()
+        codec.write_json(get_index_path(section), index)
+
+# Function to get the cursor at the end of a section's feed, for consumers that only want events from now on
+def get_cursor(section):
+    os.makedirs(FEED_DIR, exist_ok=True)
+    with generations.locked(get_feed_path(section)):
+        index = _load_index(section) or _start_feed(section)
+    return _make_cursor(index['epoch'], index['seq'], index['offset'])
+
+# Function to read the next page of events after a cursor (None reads from the start of the feed)
+# Returns {'events', 'cursor', 'has_more'}; every event carries the cursor right after it.
+# Raises CursorError if the cursor isn't from this feed
+def read_page(section, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    os.makedirs(FEED_DIR, exist_ok=True)
+    # Under the lock so an emit can't be half-way through its lines
+    with generations.locked(get_feed_path(section)):
+        index = _load_index(section) or _start_feed(section)
+        if cursor is None:
+            seq, offset = 0, 0
+        else:
+            try:
+                epoch, seq, offset = cursor.split(".")
+                seq, offset = int(seq), int(offset)
+            except (AttributeError, ValueError):
+                raise CursorError(f"Not a feed cursor: {cursor!r}")
+            if epoch != index['epoch'] or not 0 <= offset <= index['offset'] or seq > index['seq']:
+                raise CursorError("The cursor is from an earlier feed of this section; read it again from the start")
+
+        events = []
+        with open(get_feed_path(section), "rb") as f:
+            f.seek(offset)
+            while len(events) < limit and offset < index['offset']:
+                line = f.readline()
+                offset += len(line)
+                try:
+                    event = codec.loads(line)
+                except codec.DecodeError:
+                    event = None
+                # A cursor that doesn't point at the start of the next event wasn't made by this feed
+                if event is None or event['seq'] != seq + 1:
+                    raise CursorError(f"Not a feed cursor: {cursor!r}")
+                seq = event['seq']
+                event['cursor'] = _make_cursor(index['epoch'], seq, offset)
+                events.append(event)
+    return {
+        'events': events,
+        'cursor': _make_cursor(index['epoch'], seq, offset),
+        'has_more': offset < index['offset']
+    }
+
+# Function to iterate over a section's events after a cursor, one page at a time
+# With `follow`, waits for new events instead of stopping at the end of the feed
+def iter_events(section, cursor=None, page_size=DEFAULT_PAGE_SIZE, follow=False, poll_seconds=1.0):
+    while True:
+        page = read_page(section, cursor, page_size)
+        yield from page['events']
+        cursor = page['cursor']
+        if not page['has_more']:
+            if not follow:
+                return
+            time.sleep(poll_seconds)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a section's change feed as JSON lines")
+    parser.add_argument("--section", choices=SECTIONS, default=SECTIONS[0])
+    parser.add_argument("--cursor", help="Print the events after this cursor (default: from the start, "
+                                         "'latest' for new events only)")
+    parser.add_argument("--follow", action="store_true", help="Keep waiting for new events")
+    args = parser.parse_args(argv)
+
+    cursor = get_cursor(args.section) if args.cursor == "latest" else args.cursor
+    try:
+        for event in iter_events(args.section, cursor, follow=args.follow):
+            print(codec.dumps(event).decode("utf-8"), flush=True)
+    except CursorError as e:
+        print(e, file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
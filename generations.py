@@ -0,0 +1,136 @@
+# Cross-process change notification for the data files
+#
+# Every data file has a generation counter in a small shared memory-mapped file
+# (data/.generations). Writers bump the counter after replacing a file; readers
+# compare counters instead of touching the data files, so when several
+# `streamlit run app.py` workers share DATA_DIR, a save in any worker
+# invalidates every worker's caches on their next rerun.
+#
+# Writers also hold an exclusive lock on <file>.lock for the whole
+# read-modify-write, so concurrent saves from different workers don't drop
+# each other's changes.
+#
+# Files edited by hand aren't noticed until their counter is bumped:
+#   python generations.py bump data/bids_section_a.json
+#   python generations.py show data
+import os
+import sys
+import mmap
+import zlib
+import struct
+import argparse
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks only work between threads of one process
+    fcntl = None
+
+GENERATION_FILE_NAME = ".generations"
+SLOTS = 256  # Counters in the shared file; files that hash to the same slot just invalidate together
+SLOT_FORMAT = "<Q"
+SLOT_SIZE = struct.calcsize(SLOT_FORMAT)
+
+_lock = threading.Lock()
+_thread_locks = {}  # lock file path -> threading.Lock
+_maps = {}  # data directory -> (file, mmap)
+
+# Function to get the slot of a data file in the shared counter file
+def get_slot(path):
+    return zlib.crc32(os.path.basename(path).encode("utf-8")) % SLOTS
+
+# Function to open (and create if needed) the shared counter file of a data directory
+def _get_map(data_dir):
+    data_dir = os.path.abspath(data_dir)
+    with _lock:
+        if data_dir in _maps:
+            return _maps[data_dir][1]
+
+        generation_file = os.path.join(data_dir, GENERATION_FILE_NAME)
+        f = open(generation_file, "a+b")
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            # Size the file once; every worker maps the same bytes
+            if os.fstat(f.fileno()).st_size < SLOTS * SLOT_SIZE:
+                f.truncate(SLOTS * SLOT_SIZE)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        mapping = mmap.mmap(f.fileno(), SLOTS * SLOT_SIZE)
+        _maps[data_dir] = (f, mapping)
+        return mapping
+
+# Function to read the generation of a data file (no file system access after the first call)
+def get(path):
+    mapping = _get_map(os.path.dirname(path) or ".")
+    return struct.unpack_from(SLOT_FORMAT, mapping, get_slot(path) * SLOT_SIZE)[0]
+
+# Function to mark a data file as changed for every worker
+def bump(path):
+    data_dir = os.path.dirname(path) or "."
+    mapping = _get_map(data_dir)
+    offset = get_slot(path) * SLOT_SIZE
+    with locked(os.path.join(data_dir, GENERATION_FILE_NAME)):
+        generation = struct.unpack_from(SLOT_FORMAT, mapping, offset)[0] + 1
+        struct.pack_into(SLOT_FORMAT, mapping, offset, generation)
+    return generation
+
+# Context manager holding an exclusive lock on a data file across threads and processes
+@contextmanager
+def locked(path):
+    lock_file = f"{path}.lock"
+    with _lock:
+        thread_lock = _thread_locks.setdefault(lock_file, threading.Lock())
+
+    if fcntl is None:
+        with thread_lock:
+            yield
+        return
+
+    # flock() already excludes other open file descriptions in this process, but
+    # taking the thread lock first keeps waiting threads from holding descriptors
+    with thread_lock:
+        with open(lock_file, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+# Function to take an exclusive lock for as long as the process runs, without waiting
+# Returns the open lock file to keep, or None if another process holds the lock
+def try_lock(path):
+    f = open(path, "a")
+    if fcntl is None:
+        return f
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show or bump data file generations")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    show_parser = subparsers.add_parser("show", help="Show the generation of every data file in a directory")
+    show_parser.add_argument("data_dir")
+
+    bump_parser = subparsers.add_parser("bump", help="Tell running workers a data file changed")
+    bump_parser.add_argument("path")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "show":
+        for file_name in sorted(os.listdir(args.data_dir)):
+            if file_name.endswith(".json"):
+                print(f"{file_name}: {get(os.path.join(args.data_dir, file_name))}")
+    elif args.command == "bump":
+        print(f"{args.path}: {bump(args.path)}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
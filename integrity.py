@@ -0,0 +1,270 @@
+# Data integrity checks for the section data files
+#
+# Flags what the app itself never writes but hand edits, restores and old
+# files can leave behind:
+#   - orphaned bid items: bids on a project that doesn't exist, or whose
+#     position now belongs to a different topic (ids are "Project {i+1}")
+#   - over-budget students: more than 100 points or more than 3 projects
+#   - duplicate NetIDs among the submissions or among the bids
+#   - bids on the student's own project
+#   - records that don't match the schema and files that can't be read
+#
+# A scan streams the files record by record, keeping only the project titles,
+# the project owners and the NetIDs seen so far. The result is kept in
+# data/integrity/<section>.json together with the data generation it was
+# made from; bid saves and deletes update it for just the changed student, so
+# only other changes (submissions, clears, restores, hand edits) need a
+# rescan.
+#
+# Usage from the command line (exits with 1 if anything was found, for cron):
+#   python integrity.py
+#   python integrity.py --section "Section A" --quiet
+import os
+import re
+import sys
+import json
+import argparse
+from datetime import datetime
+
+import codec
+import generations
+from records import Submission, Bid
+from storage import SECTIONS, DATA_DIR, get_section_slug, get_section_files, get_data_generation
+
+INTEGRITY_DIR = os.path.join(DATA_DIR, "integrity")
+CHUNK_SIZE = 64 * 1024  # Characters read at a time while streaming a file
+MAX_POINTS = 100
+MAX_PROJECTS = 3
+PROJECT_ID_PATTERN = re.compile(r"Project (\d+)")
+
+# Issue kinds, in the order the report lists them
+UNREADABLE = "unreadable file"
+INVALID = "invalid record"
+DUPLICATE = "duplicate NetID"
+ORPHANED = "orphaned bid"
+OVER_BUDGET = "over budget"
+OWN_PROJECT = "own project"
+KINDS = [UNREADABLE, INVALID, DUPLICATE, ORPHANED, OVER_BUDGET, OWN_PROJECT]
+
+# Function to get the file the integrity report of a section is kept in
+def get_report_path(section):
+    return os.path.join(INTEGRITY_DIR, f"{get_section_slug(section)}.json")
+
+# Function to read the records of a JSON list file one at a time without loading the whole file
+# Missing or empty files have no records; anything that isn't a JSON list raises ValueError
+def iter_json_list(path, chunk_size=CHUNK_SIZE):
+    if not os.path.exists(path):
+        return
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+        expecting = "start"  # then "first", "value" or "separator"
+        while True:
+            # Skip whitespace, reading more when the buffer runs out
+            while True:
+                while pos < len(buffer) and buffer[pos] in " \t\r\n":
+                    pos += 1
+                if pos < len(buffer) or eof:
+                    break
+                chunk = f.read(chunk_size)
+                buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+
+            if pos >= len(buffer):
+                if expecting == "start":
+                    return
+                raise ValueError(f"{path} ends before its list does")
+
+            char = buffer[pos]
+            if expecting == "start":
+                if char != "[":
+                    raise ValueError(f"{path} is not a JSON list")
+                pos += 1
+                expecting = "first"
+            elif expecting in ("first", "separator") and char == "]":
+                return
+            elif expecting == "separator":
+                if char != ",":
+                    raise ValueError(f"{path} has {char!r} where ',' or ']' was expected")
+                pos += 1
+                expecting = "value"
+            else:
+                try:
+                    record, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as e:
+                    if eof:
+                        raise ValueError(f"{path} is not valid JSON: {e}")
+                    # The record may continue in the next chunk
+                    chunk = f.read(chunk_size)
+                    buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+                    continue
+                yield record
+                pos = end
+                expecting = "separator"
+                # Drop what has been read so the buffer stays about one chunk long
+                if pos > chunk_size:
+                    buffer, pos = buffer[pos:], 0
+
+# Function to make an issue
+def make_issue(kind, file_kind, netid, message):
+    return {'kind': kind, 'file': file_kind, 'netid': netid, 'message': message}
+
+# Function to check one bid against the current projects and their owners
+# `titles` are the project topics in order and `owners` maps NetIDs to their project id
+def check_bid(bid, titles, owners):
+    issues = []
+    for item in bid.bids:
+        match = PROJECT_ID_PATTERN.fullmatch(item.project_id)
+        position = int(match.group(1)) if match else 0
+        if not 1 <= position <= len(titles):
+            issues.append(make_issue(ORPHANED, 'bids', bid.netid,
+                                     f"{item.points} points on {item.project_id} ({item.project_title}), which doesn't exist"))
+        elif titles[position - 1] is not None and titles[position - 1] != item.project_title:
+            issues.append(make_issue(ORPHANED, 'bids', bid.netid,
+                                     f"{item.points} points on {item.project_id} ({item.project_title}), "
+                                     f"which is now {titles[position - 1]}"))
+
+    if bid.total_points > MAX_POINTS:
+        issues.append(make_issue(OVER_BUDGET, 'bids', bid.netid, f"{bid.total_points}/{MAX_POINTS} points"))
+    if len(bid.bids) > MAX_PROJECTS:
+        issues.append(make_issue(OVER_BUDGET, 'bids', bid.netid, f"Bids on {len(bid.bids)} projects (at most {MAX_PROJECTS})"))
+
+    own_project = owners.get(bid.netid)
+    if own_project is not None and any(item.project_id == own_project for item in bid.bids):
+        issues.append(make_issue(OWN_PROJECT, 'bids', bid.netid, f"Bids on their own project ({own_project})"))
+    return issues
+
+# Function to scan a section's files from start to end
+# Returns the report: the generation scanned, the project titles and owners, and the issues by student
+def scan(section):
+    section_files = get_section_files(section)
+    generation = get_data_generation(section)
+    titles = []
+    owners = {}
+    issues = {}
+
+    # Function to add an issue under the record it belongs to
+    def add(key, issue):
+        issues.setdefault(key, []).append(issue)
+
+    try:
+        for i, data in enumerate(iter_json_list(section_files['submissions'])):
+            try:
+                submission = Submission.from_dict(data)
+            except ValueError as e:
+                titles.append(None)
+                add(f"submissions:#{i+1}", make_issue(INVALID, 'submissions', None, f"Record {i+1}: {e}"))
+                continue
+            titles.append(submission.topic)
+            if submission.netid in owners:
+                add(f"submissions:{submission.netid}", make_issue(
+                    DUPLICATE, 'submissions', submission.netid,
+                    f"Submitted both {owners[submission.netid]} and Project {i+1}"))
+            else:
+                owners[submission.netid] = f"Project {i+1}"
+    except ValueError as e:
+        add("submissions:file", make_issue(UNREADABLE, 'submissions', None, str(e)))
+
+    seen = set()
+    try:
+        for i, data in enumerate(iter_json_list(section_files['bids'])):
+            try:
+                bid = Bid.from_dict(data)
+            except ValueError as e:
+                add(f"bids:#{i+1}", make_issue(INVALID, 'bids', None, f"Record {i+1}: {e}"))
+                continue
+            if bid.netid in seen:
+                add(f"bids:{bid.netid}", make_issue(DUPLICATE, 'bids', bid.netid, f"More than one bid (again at record {i+1})"))
+            seen.add(bid.netid)
+            for issue in check_bid(bid, titles, owners):
+                add(f"bids:{bid.netid}", issue)
+    except ValueError as e:
+        add("bids:file", make_issue(UNREADABLE, 'bids', None, str(e)))
+
+    return {
+        'generation': list(generation),
+        'scanned': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'titles': titles,
+        'owners': owners,
+        'issues': issues
+    }
+
+# Function to load the stored report of a section, or None if there isn't one
+def load(section):
+    report_file = get_report_path(section)
+    if not os.path.exists(report_file):
+        return None
+    try:
+        return codec.read_json(report_file)
+    except codec.DecodeError:
+        # The report is only derived data, a rescan replaces it
+        return None
+
+# Function to store a section's report; callers hold generations.locked on the report file
+def _save(section, report):
+    report_file = get_report_path(section)
+    os.makedirs(INTEGRITY_DIR, exist_ok=True)
+    codec.write_json(report_file, report)
+
+# Function to get the report of a section, rescanning if the data changed since it was made
+def get_report(section):
+    report = load(section)
+    if report is not None and report['generation'] == list(get_data_generation(section)):
+        return report
+
+    report = scan(section)
+    os.makedirs(INTEGRITY_DIR, exist_ok=True)
+    with generations.locked(get_report_path(section)):
+        # Don't replace a report an incremental update already moved past this scan
+        stored = load(section)
+        if stored is None or all(old <= new for old, new in zip(stored['generation'], report['generation'])):
+            _save(section, report)
+    return report
+
+# Function to update the report after one student's bid was saved (or deleted when `bid` is None)
+# `previous_generation` is the section's generation before the write; callers hold the bids file lock.
+# A report that was already out of date, or where the student has duplicate bids, is left for a rescan
+def update_bid(section, netid, bid, previous_generation):
+    os.makedirs(INTEGRITY_DIR, exist_ok=True)
+    with generations.locked(get_report_path(section)):
+        report = load(section)
+        if report is None or report['generation'] != list(previous_generation):
+            return
+        key = f"bids:{netid}"
+        if any(issue['kind'] == DUPLICATE for issue in report['issues'].get(key, [])):
+            return
+
+        issues = check_bid(bid, report['titles'], report['owners']) if bid is not None else []
+        if issues:
+            report['issues'][key] = issues
+        else:
+            report['issues'].pop(key, None)
+        report['generation'] = list(get_data_generation(section))
+        _save(section, report)
+
+# Function to list a report's issues, grouped by kind
+def list_issues(report):
+    issues = [issue for record_issues in report['issues'].values() for issue in record_issues]
+    return sorted(issues, key=lambda issue: (KINDS.index(issue['kind']), issue['file'], issue['netid'] or ""))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the section data files for integrity problems")
+    parser.add_argument("--section", choices=SECTIONS, action="append", help="Section to check (default: all sections)")
+    parser.add_argument("--quiet", action="store_true", help="Only print the summary line of each section")
+    args = parser.parse_args(argv)
+
+    found = 0
+    for section in args.section or SECTIONS:
+        report = get_report(section)
+        issues = list_issues(report)
+        found += len(issues)
+        print(f"{section}: {len(issues)} issues")
+        if not args.quiet:
+            for issue in issues:
+                netid = f" {issue['netid']}" if issue['netid'] else ""
+                print(f"  [{issue['kind']}] {issue['file']}{netid}: {issue['message']}")
+    return 1 if found else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,330 @@
+# Memory accounting and size-capped caches
+#
+# The shared per-section data (parsed records, bid tables, view models) is
+# cached in LRU caches that are capped by entry count and by approximate size.
+# Sizes are measured by a background thread, so a cache miss on the request
+# path only pays for building the value. Caps are configurable with
+# environment variables:
+#   CACHE_MAX_MB       approximate size cap of each section cache (default 256)
+#   CACHE_MAX_ENTRIES  entry cap of the derived-table caches (default 32)
+# The caps are per cache: the section caches together can hold up to their
+# count times CACHE_MAX_MB (see total_cap_bytes), and the derived-table caches
+# are capped by entry count only, so their size grows with the section.
+#
+# The admin memory report also shows the live browser sessions and their
+# approximate size, Streamlit's own caches, and the top allocation sites since
+# a tracemalloc baseline.
+import os
+import queue
+import sys
+import threading
+import tracemalloc
+from array import array
+from collections import OrderedDict
+from functools import wraps
+
+import numpy as np
+import pandas as pd
+
+CACHE_MAX_MB = float(os.environ.get("CACHE_MAX_MB", "256"))
+CACHE_MAX_ENTRIES = int(os.environ.get("CACHE_MAX_ENTRIES", "32"))
+
+_lock = threading.Lock()
+_caches = {}  # cache name -> LRUCache, kept here because app.py is re-executed on every rerun
+_baseline = None  # tracemalloc snapshot the allocation report compares against
+_measure_queue = queue.Queue()  # (cache, key, value) waiting for their size to be measured
+_measurer = None  # background thread measuring cache entries
+
+# Function to estimate the memory used by an object and everything it references
+# Objects reachable more than once are counted once; NumPy arrays and pandas
+# frames are measured by their buffers
+def deep_sizeof(obj, seen=None):
+    if seen is None:
+        seen = set()
+    size = 0
+    stack = [obj]
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen:
+            continue
+        seen.add(id(obj))
+
+        if isinstance(obj, np.ndarray):
+            size += sys.getsizeof(obj) + (obj.nbytes if obj.base is None else 0)
+            if obj.dtype == object:
+                stack.extend(obj.ravel().tolist())
+        elif isinstance(obj, (pd.DataFrame, pd.Series)):
+            usage = obj.memory_usage(index=True, deep=True)
+            size += int(usage.sum() if isinstance(obj, pd.DataFrame) else usage)
+        elif isinstance(obj, (str, bytes, int, float, bool, array)) or obj is None:
+            size += sys.getsizeof(obj)
+        elif isinstance(obj, dict):
+            size += sys.getsizeof(obj)
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            size += sys.getsizeof(obj)
+            stack.extend(obj)
+        else:
+            size += sys.getsizeof(obj)
+            if hasattr(obj, '__dict__'):
+                stack.append(obj.__dict__)
+            for cls in type(obj).__mro__:
+                for slot in getattr(cls, '__slots__', ()):
+                    if hasattr(obj, slot):
+                        stack.append(getattr(obj, slot))
+    return size
+
+class LRUCache:
+    # Least-recently-used cache capped by entry count and approximate size
+    #
+    # Entries are keyed by the cached function's arguments. In per-section
+    # caches the first argument is the section, so sizes can be reported per
+    # section; other caches (like the query console's, built from every
+    # section) are only reported as a whole.
+
+    def __init__(self, name, max_entries, max_bytes, per_section=True):
+        self.name = name
+        self.per_section = per_section
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (value, size)
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.last_sizes = {}  # section (None if not per section) -> measured size of its latest entry
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    # Function to get the section an entry belongs to, or None if the cache isn't per section
+    def _get_section(self, key):
+        return key[0] if self.per_section and key else None
+
+    def put(self, key, value):
+        with self._lock:
+            # Until the measurer gets to it, assume the entry is as big as the section's last measured one
+            size = self.last_sizes.get(self._get_section(key), 0)
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.total_bytes -= old[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            self._evict()
+        _measure_later(self, key, value)
+
+    # Function to replace an entry's estimated size with its measured one
+    def set_size(self, key, value, size):
+        with self._lock:
+            entry = self.entries.get(key)
+            self.last_sizes[self._get_section(key)] = size
+            if entry is None or entry[0] is not value:
+                return  # Evicted or replaced while it was being measured
+            self.entries[key] = (value, size)
+            self.total_bytes += size - entry[1]
+            self._evict()
+
+    # Function to evict the least recently used entries, but always keep the newest one; callers hold self._lock
+    def _evict(self):
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    # Function to get the entry count and size of each section in the cache (nothing if it isn't per section)
+    def section_stats(self):
+        if not self.per_section:
+            return {}
+        with self._lock:
+            entries = list(self.entries.items())
+        sections = {}
+        for key, (_, size) in entries:
+            stats = sections.setdefault(key[0], {'entries': 0, 'bytes': 0})
+            stats['entries'] += 1
+            stats['bytes'] += size
+        return sections
+
+# Function to measure cache entries one at a time off the request path
+def _measure_entries():
+    while True:
+        cache, key, value = _measure_queue.get()
+        try:
+            cache.set_size(key, value, deep_sizeof(value))
+        except Exception:
+            pass  # A size estimate isn't worth killing the thread over; the entry keeps its estimate
+        del cache, key, value
+
+# Function to queue a new cache entry for measuring, starting the measurer if needed
+def _measure_later(cache, key, value):
+    global _measurer
+    with _lock:
+        if _measurer is None or not _measurer.is_alive():
+            _measurer = threading.Thread(target=_measure_entries, name="cache-measurer", daemon=True)
+            _measurer.start()
+    _measure_queue.put((cache, key, value))
+
+# Function to get the most the section caches can hold together: each is capped on its own
+def total_cap_bytes():
+    with _lock:
+        return sum(cache.max_bytes for cache in _caches.values())
+
+# Decorator caching a function of (section, generation, ...) in a named LRU cache
+# With per_section=False the function's arguments needn't start with a section (e.g. (generations,)).
+# The cache is shared by every session; callers must not modify the values
+def lru_cache(name, max_entries=8, max_bytes=None, per_section=True):
+    if max_bytes is None:
+        max_bytes = int(CACHE_MAX_MB * 1024 * 1024)
+
+    def decorator(func):
+        with _lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = _caches[name] = LRUCache(name, max_entries, max_bytes, per_section)
+            else:
+                cache.max_entries, cache.max_bytes, cache.per_section = max_entries, max_bytes, per_section
+
+        @wraps(func)
+        def wrapper(*args):
+            entry = cache.get(args)
+            if entry is not None:
+                return entry[0]
+            # Two sessions missing at once may both build the value; the second one wins
+            value = func(*args)
+            cache.put(args, value)
+            return value
+
+        wrapper.cache = cache
+        return wrapper
+    return decorator
+
+# Function to list the size of every per-section cache, one row per (cache, section)
+def cache_stats():
+    with _lock:
+        caches = list(_caches.values())
+    rows = []
+    for cache in sorted(caches, key=lambda c: c.name):
+        for section, stats in sorted(cache.section_stats().items()):
+            rows.append({
+                'Cache': cache.name,
+                'Section': section,
+                'Entries': stats['entries'],
+                'Size (MB)': round(stats['bytes'] / 1024 / 1024, 2)
+            })
+    return rows
+
+# Function to summarize hits, misses, evictions and caps of every section cache
+def cache_summary():
+    with _lock:
+        caches = list(_caches.values())
+    return [
+        {
+            'Cache': cache.name,
+            'Entries': f"{len(cache.entries)}/{cache.max_entries}",
+            'Size (MB)': f"{cache.total_bytes / 1024 / 1024:.2f}/{cache.max_bytes / 1024 / 1024:.0f}",
+            'Hits': cache.hits,
+            'Misses': cache.misses,
+            'Evictions': cache.evictions
+        }
+        for cache in sorted(caches, key=lambda c: c.name)
+    ]
+
+# Function to get the resident memory of this process in bytes, or None if unknown
+def rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+        # Peak rather than current, in KB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        return None
+
+# Function to get the approximate size of every live browser session's state
+# Returns a list of sizes in bytes, or None when not running under `streamlit run`
+def session_sizes():
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return None
+        # Streamlit has no public API to list sessions; its metrics endpoint uses the same manager
+        session_mgr = Runtime.instance()._session_mgr
+        return [
+            sum(stat.byte_length for stat in session_info.session.session_state.get_stats())
+            for session_info in session_mgr.list_active_sessions()
+        ]
+    except Exception:
+        return None
+
+# Function to get the size of Streamlit's own st.cache_data and st.cache_resource caches per function
+def streamlit_cache_stats():
+    try:
+        from streamlit.runtime import Runtime
+        if not Runtime.exists():
+            return None
+        sizes = {}
+        for stat in Runtime.instance().stats_mgr.get_stats():
+            if stat.category_name in ("st_cache_data", "st_cache_resource"):
+                key = (stat.category_name, stat.cache_name)
+                sizes[key] = sizes.get(key, 0) + stat.byte_length
+        return [
+            {'Cache': f"{category} {name}", 'Size (MB)': round(size / 1024 / 1024, 2)}
+            for (category, name), size in sorted(sizes.items())
+        ]
+    except Exception:
+        return None
+
+# Function to start tracking allocations and take the baseline the report compares against
+def start_tracing(frames=5):
+    global _baseline
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    _baseline = tracemalloc.take_snapshot()
+
+# Function to stop tracking allocations
+def stop_tracing():
+    global _baseline
+    _baseline = None
+    tracemalloc.stop()
+
+# Function to check whether allocations are being tracked
+def is_tracing():
+    return tracemalloc.is_tracing() and _baseline is not None
+
+# Function to list the source lines that allocated the most memory since the baseline
+def top_allocations(limit=10):
+    if not is_tracing():
+        return []
+    snapshot = tracemalloc.take_snapshot()
+    filters = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap*>")
+    ]
+    snapshot = snapshot.filter_traces(filters)
+    baseline = _baseline.filter_traces(filters)
+    return [
+        {
+            'Location': f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+            'Size Change (KB)': round(stat.size_diff / 1024, 1),
+            'Size (KB)': round(stat.size / 1024, 1),
+            'Blocks Change': stat.count_diff
+        }
+        for stat in snapshot.compare_to(baseline, 'lineno')[:limit]
+    ]
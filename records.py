@@ -0,0 +1,209 @@
+# Typed in-memory records for submissions and bids
+#
+# The JSON files keep their existing schema; records are parsed and validated
+# once when a file is loaded and turned back into dicts only when saving.
+# Records use __slots__ so caches holding many sections stay small, and
+# BidTable stores flattened bid items column by column in arrays for the
+# analytics views.
+import sys
+from array import array
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Function to read a required string field from a record
+def _get_str(data, key, kind):
+    value = data.get(key)
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid {kind}: '{key}' must be a string, got {value!r}")
+    return value
+
+# Function to read a required integer field from a record
+def _get_int(data, key, kind):
+    value = data.get(key)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError(f"Invalid {kind}: '{key}' must be a whole number, got {value!r}")
+    return int(value)
+
+@dataclass(frozen=True)
+class Submission:
+    __slots__ = ('name', 'netid', 'topic', 'description', 'timestamp', 'section')
+    name: str
+    netid: str
+    topic: str
+    description: str
+    timestamp: str
+    section: str
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid submission: expected an object, got {data!r}")
+        return cls(
+            name=_get_str(data, 'name', 'submission'),
+            netid=_get_str(data, 'netid', 'submission'),
+            topic=_get_str(data, 'topic', 'submission'),
+            description=_get_str(data, 'description', 'submission'),
+            timestamp=sys.intern(str(data.get('timestamp', ''))),
+            section=sys.intern(str(data.get('section', '')))
+        )
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'netid': self.netid,
+            'topic': self.topic,
+            'description': self.description,
+            'timestamp': self.timestamp,
+            'section': self.section
+        }
+
+@dataclass(frozen=True)
+class BidItem:
+    __slots__ = ('project_id', 'project_title', 'points')
+    project_id: str
+    project_title: str
+    points: int
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid bid item: expected an object, got {data!r}")
+        # Project ids and titles repeat across every bidder, so share one copy of each
+        return cls(
+            project_id=sys.intern(_get_str(data, 'project_id', 'bid item')),
+            project_title=sys.intern(_get_str(data, 'project_title', 'bid item')),
+            points=_get_int(data, 'points', 'bid item')
+        )
+
+    def to_dict(self):
+        return {
+            'project_id': self.project_id,
+            'project_title': self.project_title,
+            'points': self.points
+        }
+
+@dataclass(frozen=True)
+class Bid:
+    __slots__ = ('netid', 'name', 'bids', 'timestamp', 'section')
+    netid: str
+    name: str
+    bids: tuple  # of BidItem
+    timestamp: str
+    section: str
+
+    @classmethod
+    def from_dict(cls, data):
+        if not isinstance(data, dict):
+            raise ValueError(f"Invalid bid: expected an object, got {data!r}")
+        items = data.get('bids')
+        if not isinstance(items, list):
+            raise ValueError(f"Invalid bid: 'bids' must be a list, got {items!r}")
+        return cls(
+            netid=_get_str(data, 'netid', 'bid'),
+            name=_get_str(data, 'name', 'bid'),
+            bids=tuple(BidItem.from_dict(item) for item in items),
+            timestamp=sys.intern(str(data.get('timestamp', ''))),
+            section=sys.intern(str(data.get('section', '')))
+        )
+
+    @property
+    def total_points(self):
+        return sum(item.points for item in self.bids)
+
+    def to_dict(self):
+        return {
+            'netid': self.netid,
+            'name': self.name,
+            'bids': [item.to_dict() for item in self.bids],
+            'timestamp': self.timestamp,
+            'section': self.section
+        }
+
+# Function to parse the contents of a submissions file
+def parse_submissions(data):
+    if not isinstance(data, list):
+        raise ValueError("Invalid submissions file: expected a list of submissions")
+    return [Submission.from_dict(item) for item in data]
+
+# Function to parse the contents of a bids file
+def parse_bids(data):
+    if not isinstance(data, list):
+        raise ValueError("Invalid bids file: expected a list of bids")
+    return [Bid.from_dict(item) for item in data]
+
+class BidTable:
+    # Flattened bid items of a section, one row per (student, project) bid
+    #
+    # Student and project strings are stored once in lookup lists; the rows are
+    # three integer arrays indexing into them plus the points.
+    __slots__ = ('netids', 'names', 'timestamps', 'project_ids', 'project_titles',
+                 'student', 'project', 'points')
+
+    def __init__(self):
+        self.netids = []
+        self.names = []
+        self.timestamps = []
+        self.project_ids = []
+        self.project_titles = []
+        self.student = array('i')
+        self.project = array('i')
+        self.points = array('i')
+
+    @classmethod
+    def from_bids(cls, bids):
+        table = cls()
+        project_lookup = {}
+        for bid in bids:
+            student_index = len(table.netids)
+            table.netids.append(bid.netid)
+            table.names.append(bid.name)
+            table.timestamps.append(bid.timestamp)
+            for item in bid.bids:
+                key = (item.project_id, item.project_title)
+                project_index = project_lookup.get(key)
+                if project_index is None:
+                    project_index = project_lookup[key] = len(table.project_ids)
+                    table.project_ids.append(item.project_id)
+                    table.project_titles.append(item.project_title)
+                table.student.append(student_index)
+                table.project.append(project_index)
+                table.points.append(item.points)
+        return table
+
+    def __len__(self):
+        return len(self.points)
+
+    # Function to get a column as a NumPy array without copying
+    def column(self, name):
+        return np.frombuffer(getattr(self, name), dtype=np.int32) if len(self) else np.zeros(0, dtype=np.int32)
+
+    # Function to find the project indices whose id matches a predicate
+    def find_projects(self, predicate):
+        return [i for i, project_id in enumerate(self.project_ids) if predicate(project_id)]
+
+    # Function to build a DataFrame of the bid items
+    # Columns are any of: netid, name, timestamp, project_id, project_title, points
+    def to_frame(self, columns=('netid', 'name', 'project_id', 'project_title', 'points', 'timestamp'), rows=None):
+        student = self.column('student')
+        project = self.column('project')
+        points = self.column('points')
+        if rows is not None:
+            student, project, points = student[rows], project[rows], points[rows]
+
+        sources = {
+            'netid': (self.netids, student),
+            'name': (self.names, student),
+            'timestamp': (self.timestamps, student),
+            'project_id': (self.project_ids, project),
+            'project_title': (self.project_titles, project)
+        }
+        frame = {}
+        for name in columns:
+            if name == 'points':
+                frame[name] = points.astype(np.int64)
+            else:
+                values, codes = sources[name]
+                frame[name] = np.asarray(values, dtype=object)[codes] if len(values) else np.zeros(0, dtype=object)
+        return pd.DataFrame(frame, columns=list(columns))
@@ -0,0 +1,264 @@
+# Replay a recorded traffic trace against the app and report latencies
+#
+# Drives app.py headless with Streamlit's AppTest, one simulated browser
+# session per recorded session, in a scratch data directory seeded with the
+# trace's anonymized data. Each action is replayed from the session state it
+# was recorded in, and the time of the script run it triggers is measured.
+#
+# Usage:
+#   python replay.py traces/deadline.jsonl             # real time
+#   python replay.py traces/deadline.jsonl --speed 20  # 20x faster
+#   python replay.py traces/deadline.jsonl --speed 0   # as fast as possible
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from streamlit.testing.v1 import AppTest
+
+import codec
+import traces
+from storage import get_section_files
+
+APP_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py")
+
+# Session state keys restored from the recorded state before every action
+FLAG_KEYS = ('authenticated', 'reveal_topics', 'bidding_enabled', 'reveal_bid_stats', 'reveal_top_bidders')
+
+# Session state keys carried from one action of a session to its next (the pending bid confirmation)
+CARRIED_KEYS = ('confirm_bid', 'bid_data')
+
+FILLER_WORDS = "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor".split()
+
+# Function to make placeholder text of a given length
+def filler(length):
+    text = ""
+    i = 0
+    while len(text) < length:
+        text += FILLER_WORDS[i % len(FILLER_WORDS)] + " "
+        i += 1
+    return text[:length]
+
+# Function to write the trace's anonymized data into the scratch data directory
+def write_seed(seed):
+    for section, data in seed['sections'].items():
+        section_files = get_section_files(section)
+        submissions = [
+            {
+                'name': submission['name'],
+                'netid': submission['netid'],
+                'topic': filler(submission['topic_len']),
+                'description': filler(submission['description_len']),
+                'timestamp': submission['timestamp'],
+                'section': section
+            }
+            for submission in data['submissions']
+        ]
+        titles = {f"Project {i+1}": submission['topic'] for i, submission in enumerate(submissions)}
+        bids = [
+            {
+                'netid': bid['netid'],
+                'name': bid['name'],
+                'bids': [
+                    {'project_id': project_id, 'project_title': titles.get(project_id, project_id), 'points': points}
+                    for project_id, points in bid['bids']
+                ],
+                'timestamp': bid['timestamp'],
+                'section': section
+            }
+            for bid in data['bids']
+        ]
+        codec.write_json(section_files['submissions'], submissions)
+        codec.write_json(section_files['bids'], bids)
+
+# Function to find a widget by label
+def find(widgets, label):
+    for widget in widgets:
+        if widget.label == label:
+            return widget
+    return None
+
+# Function to click a button found by label or key, returns False if it isn't on the page
+def click(at, label=None, key=None):
+    for button in at.button:
+        if (label is not None and button.label == label) or (key is not None and button.key == key):
+            button.click()
+            return True
+    return False
+
+# Function to perform a recorded action on the rendered page, without running it yet
+# Returns False if the widgets the action needs aren't on the page
+def perform(at, event):
+    action = event['action']
+
+    if action == 'section':
+        selectbox = find(at.sidebar.selectbox, "Select your class section:")
+        if selectbox is None:
+            return False
+        selectbox.select(event['value'])
+        return True
+
+    if action == 'submit_project':
+        fields = [find(at.main.text_input, "Your Name"), find(at.main.text_input, "UW NetID"),
+                  find(at.main.text_input, "Project Topic"), find(at.main.text_area, "Project Description")]
+        if None in fields:
+            return False
+        values = [event['name'], event['netid'], filler(event['topic_len']), filler(event['description_len'])]
+        for field, value in zip(fields, values):
+            field.input(value)
+        return click(at, label="Submit")
+
+    if action == 'identify':
+        fields = [find(at.sidebar.text_input, "Your Name"), find(at.sidebar.text_input, "Your UW NetID")]
+        if None in fields:
+            return False
+        fields[0].input(event['name'])
+        fields[1].input(event['netid'])
+        return click(at, label="Identify")
+
+    if action == 'submit_bids':
+        selectboxes = [widget for widget in at.selectbox if widget.label.startswith("Project #")]
+        points_inputs = [widget for widget in at.number_input if widget.label == "Points"]
+        if len(selectboxes) < 3 or len(points_inputs) < 3:
+            return False
+        bids = event['bids'] + [[None, 0]] * (3 - len(event['bids']))
+        for selectbox, points_input, (project_id, points) in zip(selectboxes, points_inputs, bids):
+            option = next((o for o in selectbox.options if project_id and o.startswith(f"{project_id}:")), "Select a project")
+            selectbox.select(option)
+            points_input.set_value(points)
+        return click(at, label="Submit Bids")
+
+    if action == 'confirm_bid':
+        return click(at, label="Confirm Bid")
+
+    if action == 'cancel_bid':
+        return click(at, label="Cancel")
+
+    if action == 'toggle':
+        return click(at, key=event['key'])
+
+    if action == 'clear':
+        return click(at, key=f"clear_{event['kind']}_btn")
+
+    if action == 'close_round':
+        seats = find(at.number_input, "Seats per project")
+        if seats is not None:
+            seats.set_value(event['seats'])
+        return click(at, key="close_round_btn")
+
+    if action == 'reset_bid':
+        selectbox = find(at.selectbox, "Select a student")
+        if selectbox is None:
+            return False
+        option = next((o for o in selectbox.options if o.endswith(f"({event['netid']})")), None)
+        if option is None:
+            return False
+        selectbox.select(option)
+        return click(at, label="Reset Bid")
+
+    return False
+
+# Function to replay one event in a fresh session
+# Returns the run time in seconds, or None if the action couldn't be performed
+def replay_event(event, carried, timeout):
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+
+    # Put the session where the recorded one was
+    state = event['state']
+    at.session_state['current_section'] = state['section']
+    for key in FLAG_KEYS:
+        at.session_state[key] = state[key]
+    if 'user' in state:
+        at.session_state['user_name'], at.session_state['user_netid'] = state['user']
+    for key, value in carried.items():
+        at.session_state[key] = value
+
+    # Render the page the user saw, then time the run their action triggers
+    at.run()
+    if not perform(at, event):
+        return None
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+
+    for key in CARRIED_KEYS:
+        if key in at.session_state:
+            carried[key] = at.session_state[key]
+    return elapsed
+
+# Function to print the latency distribution of each action
+def report(latencies, summary):
+    print(summary)
+    print(f"{'action':<16}{'count':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = sorted(latencies.items()) + [('all', [t for times in latencies.values() for t in times])]
+    for action, times in rows:
+        if not times:
+            continue
+        p50, p90, p99 = np.percentile(np.array(times) * 1000, [50, 90, 99])
+        print(f"{action:<16}{len(times):>7}{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}{max(times) * 1000:>10.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay a recorded traffic trace against the app")
+    parser.add_argument("trace")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed: 1 is real time, 0 is as fast as possible")
+    parser.add_argument("--data-dir", help="Scratch directory to replay in (default: a new temporary directory)")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds a single run may take")
+    args = parser.parse_args(argv)
+
+    events = traces.read_trace(args.trace)
+    seeds = [event for event in events if event['action'] == 'seed']
+    actions = [event for event in events if event['action'] != 'seed']
+    if not actions:
+        print(f"No actions in {args.trace}", file=sys.stderr)
+        return 1
+
+    # Replay in the scratch directory (the data directory is relative), without recording a new trace
+    scratch_dir = args.data_dir or tempfile.mkdtemp(prefix="replay-")
+    os.makedirs(scratch_dir, exist_ok=True)
+    os.chdir(scratch_dir)
+    os.makedirs("data", exist_ok=True)
+    traces.TRACE_FILE = None
+    if seeds:
+        write_seed(seeds[0])
+
+    latencies = {}
+    carried = {}  # session -> carried session state
+    skipped = errors = 0
+    max_lag = 0.0
+    first = actions[0]['t']
+    start = time.perf_counter()
+    for event in actions:
+        if args.speed > 0:
+            due = start + (event['t'] - first) / args.speed
+            now = time.perf_counter()
+            if due > now:
+                time.sleep(due - now)
+            else:
+                max_lag = max(max_lag, now - due)
+
+        try:
+            elapsed = replay_event(event, carried.setdefault(event['session'], {}), args.timeout)
+        except Exception as e:
+            errors += 1
+            print(f"Error replaying {event['action']} at {event['t']}: {e}", file=sys.stderr)
+            continue
+        if elapsed is None:
+            skipped += 1
+        else:
+            latencies.setdefault(event['action'], []).append(elapsed)
+
+    total = time.perf_counter() - start
+    speed = f"{args.speed:g}x" if args.speed > 0 else "unthrottled"
+    report(latencies, (
+        f"Replayed {len(actions)} actions from {len(carried)} sessions in {total:.1f}s ({speed}) "
+        f"in {scratch_dir}: {skipped} skipped, {errors} errors, up to {max_lag:.2f}s behind schedule"
+    ))
+    return 1 if errors else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
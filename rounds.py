@@ -0,0 +1,158 @@
+# Bidding rounds and the allocation of students to projects
+#
+# Closing a round clears it: every bid item of the round is visited from the
+# highest points down (students who bid first win ties) and a student gets the
+# project if they don't have one yet and it still has a seat. Assigned
+# students are locked; in the next round only the unassigned students bid,
+# and only on projects with open seats.
+#
+# Each round starts from the previous round's state (locked assignments and
+# remaining seats), so clearing a round only visits that round's bids. The
+# state of a section lives next to its bids in data/rounds_<section>.json and
+# the bid matrix of every closed round in data/rounds/<stream>/round-<n>.npz.
+import os
+from datetime import datetime
+
+import numpy as np
+
+import bidmatrix
+import codec
+import generations
+
+ROUNDS_DIR_NAME = "rounds"
+DEFAULT_SEATS = 4
+
+# Function to get the rounds file of a bids file (data/bids_section_a.json -> data/rounds_section_a.json)
+def get_rounds_path(path):
+    file_name = os.path.basename(path)
+    if file_name.startswith("bids_"):
+        file_name = file_name[len("bids_"):]
+    return os.path.join(os.path.dirname(path) or ".", f"rounds_{file_name}")
+
+# Function to get the file the bid matrix of a closed round is kept in
+def get_matrix_path(path, round_number):
+    stream = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(os.path.dirname(path) or ".", ROUNDS_DIR_NAME, stream, f"round-{round_number}.npz")
+
+# Function to get the generation of a bids file's rounds (changes whenever a round closes)
+def get_generation(path):
+    return generations.get(get_rounds_path(path))
+
+# Function to create the state of a section before its first round closes
+def empty_state():
+    return {
+        'round': 1,
+        'default_seats': None,  # seats of projects added after the first round closed
+        'seats': {},  # project id -> seats, fixed when the first round closes
+        'remaining': {},  # project id -> open seats
+        'assignments': {},  # netid -> {'project_id', 'project_title', 'points', 'round'}
+        'history': []
+    }
+
+# Function to load the rounds of a bids file
+def load(path):
+    rounds_file = get_rounds_path(path)
+    if not os.path.exists(rounds_file):
+        return empty_state()
+    return codec.read_json(rounds_file)
+
+# Function to write the rounds of a bids file and tell every worker they changed
+def _write(path, state):
+    rounds_file = get_rounds_path(path)
+    codec.write_json(rounds_file, state)
+    generations.bump(rounds_file)
+
+# Function to get the open seats of a project once the first round has closed
+# Projects added since then get their seats when the next round closes, so until then they have all of them
+def open_seats(state, project_id):
+    if project_id not in state['seats']:
+        return state['default_seats']
+    return state['remaining'].get(project_id, 0)
+
+# Function to get the projects that still have open seats (every project before the first round closes)
+def open_projects(state, project_ids):
+    if not state['seats']:
+        return list(project_ids)
+    return [project_id for project_id in project_ids if open_seats(state, project_id) > 0]
+
+# Function to check whether a student may place a bid in the current round
+# Returns an error message, or None if the bid is allowed
+def check_bid(state, netid, bids):
+    assignment = state['assignments'].get(netid)
+    if assignment is not None:
+        return f"You were already assigned to {assignment['project_id']} in round {assignment['round']}."
+    if state['seats']:
+        full = [bid.project_id for bid in bids if open_seats(state, bid.project_id) <= 0]
+        if full:
+            return f"These projects have no open seats left: {', '.join(full)}"
+    return None
+
+# Function to allocate one round's bids given the seats still open
+# Returns {netid: (project column, points)}; `remaining` is updated in place
+def clear_round(matrix, remaining, assigned):
+    rows = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+    # Highest points first; rows are in the order students first bid, so they win ties
+    order = np.lexsort((rows, -np.asarray(matrix.data)))
+
+    # Plain lists, indexing NumPy arrays one item at a time is slow
+    netids = np.asarray(matrix.student_netids).tolist()
+    project_ids = np.asarray(matrix.project_ids).tolist()
+    rows = rows.tolist()
+    indices = np.asarray(matrix.indices).tolist()
+    data = np.asarray(matrix.data).tolist()
+
+    allocation = {}
+    for item in order.tolist():
+        netid = netids[rows[item]]
+        if netid in assigned or netid in allocation:
+            continue
+        project_id = project_ids[indices[item]]
+        if remaining.get(project_id, 0) > 0:
+            remaining[project_id] -= 1
+            allocation[netid] = (indices[item], data[item])
+    return allocation
+
+# Function to close the current round of a bids file
+# `project_ids` are all current projects and `bid_table` the round's bids; callers hold
+# generations.locked(path) and clear the bids afterwards for the next round
+def close_round(path, project_ids, bid_table, default_seats=DEFAULT_SEATS):
+    state = load(path)
+    round_number = state['round']
+
+    # Seats are fixed when the first round closes; projects added later get as many
+    if state['default_seats'] is None:
+        state['default_seats'] = default_seats
+    for project_id in project_ids:
+        if project_id not in state['seats']:
+            state['seats'][project_id] = state['default_seats']
+            state['remaining'][project_id] = state['default_seats']
+
+    matrix = bidmatrix.BidMatrix.from_bid_table(bid_table)
+    allocation = clear_round(matrix, state['remaining'], state['assignments'])
+    for netid, (column, points) in allocation.items():
+        state['assignments'][netid] = {
+            'project_id': str(matrix.project_ids[column]),
+            'project_title': str(matrix.project_titles[column]),
+            'points': points,
+            'round': round_number
+        }
+
+    # Keep the round's bids for later analysis
+    matrix_file = get_matrix_path(path, round_number)
+    os.makedirs(os.path.dirname(matrix_file), exist_ok=True)
+    bidmatrix.save_npz(matrix_file, matrix)
+
+    state['history'].append({
+        'round': round_number,
+        'closed': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        'bidders': matrix.shape[0],
+        'assigned': len(allocation),
+        'open_seats': sum(state['remaining'].values())
+    })
+    state['round'] = round_number + 1
+    _write(path, state)
+    return state
+
+# Function to start over from the first round (the closed rounds' bid matrices are kept)
+def reset(path):
+    _write(path, empty_state())
@@ -0,0 +1,94 @@
+# Section data files: where they live and how they are read and written
+#
+# Shared by the Streamlit app and the command-line tools, so nothing in here
+# depends on Streamlit.
+import os
+
+import changelog
+import codec
+import generations
+import snapshots
+
+# Available class sections
+SECTIONS = ["Section A", "Section B"]
+
+# File paths with section-specific files
+DATA_DIR = "data"
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# Function to get the file name suffix of a section ("Section A" -> "section_a")
+def get_section_slug(section):
+    return section.replace(" ", "_").lower()
+
+# Function to get section-specific file paths
+def get_section_files(section):
+    section_suffix = get_section_slug(section)
+    return {
+        'submissions': os.path.join(DATA_DIR, f"submissions_{section_suffix}.json"),
+        'bids': os.path.join(DATA_DIR, f"bids_{section_suffix}.json")
+    }
+
+# Function to list every section data file (used by the snapshot timer)
+def get_all_data_files():
+    return [path for section in SECTIONS for path in get_section_files(section).values()]
+
+# Function to find the section and kind ('submissions' or 'bids') of a data file, or None if it isn't one
+def find_section_file(path):
+    for section in SECTIONS:
+        for kind, section_file in get_section_files(section).items():
+            if os.path.abspath(section_file) == os.path.abspath(path):
+                return section, kind
+    return None
+
+# Function to get the data generation of a section
+# It changes whenever any worker writes one of the section's data files, so views cached on it never go stale
+def get_data_generation(section):
+    section_files = get_section_files(section)
+    return (generations.get(section_files['submissions']), generations.get(section_files['bids']))
+
+# Function to read and parse a data file without changing it
+# Missing or empty files read as an empty list; invalid JSON raises codec.DecodeError
+# and records that don't match the expected schema raise ValueError
+def read_records(path, parse):
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return []
+    return parse(codec.read_json(path))
+
+# Function to read and parse a section data file
+# Missing files are created and files that aren't valid JSON are reset to an empty list;
+# records that don't match the expected schema raise ValueError
+def read_section_file(path, parse):
+    if not os.path.exists(path):
+        # Create the file with an empty list
+        codec.write_json(path, [])
+        return []
+
+    try:
+        return read_records(path, parse)
+    except codec.DecodeError:
+        # Invalid JSON, keep a copy and create a new file with empty list
+        snapshots.preserve_corrupt(path)
+        codec.write_json(path, [])
+        generations.bump(path)
+        return []
+
+# Function to write a section data file and tell every worker it changed
+# `ops` describes the change for the snapshot journal; callers hold generations.locked(path)
+def write_section_file(path, records, ops):
+    before = snapshots.file_stat(path)
+    before_version = snapshots.file_version(path)
+    data = [record.to_dict() for record in records]
+    codec.write_json(path, data)
+    # Bump before logging: a cursor that includes this write then always comes with the new generation,
+    # and the journal entry's version tells it apart from the last one even if mtime and size didn't change
+    generations.bump(path)
+    snapshots.journal(path, before_version, ops)
+    changelog.record(path, before, ops, data)
+
+# Function to restore a section's submissions or bids to a snapshot
+# The restore is announced on the section's change feed while the file is still locked,
+# so the event is in order with the other writes
+def restore_section_file(section, kind, snapshot_id):
+    import feed  # feed builds on this module, so it can't be imported at the top
+    return snapshots.restore(get_section_files(section)[kind], snapshot_id, on_restored=lambda records: feed.emit(
+        section, [feed.section_replaced(kind, f"restored from snapshot {snapshot_id}")]))
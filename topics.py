@@ -0,0 +1,436 @@
+# Topic clustering and similar-project lists of the project submissions
+#
+# Submissions are grouped into themes with spherical k-means over TF-IDF
+# vectors of their topic and description, and every project gets a list of its
+# most similar projects. The model of each submissions file (vocabulary,
+# document frequencies, cluster centroids, the cluster of every submission and
+# the neighbor lists) is kept in data/topics/<stream>.json.
+#
+# When a project is submitted, add_document() assigns it to its nearest
+# centroid and appends one line with its cluster and terms to
+# data/topics/<stream>.json.pending; the model file itself is only written by
+# the full recluster, which runs in a background thread (start_reclusterer)
+# once the submissions changed and starts the pending log over. load_model()
+# returns the model with the pending lines applied, so clustering never runs
+# while a page is being built and a save never rewrites the whole model.
+import os
+import re
+import sys
+import time
+import threading
+from collections import Counter
+
+import numpy as np
+
+import codec
+import generations
+from records import parse_submissions
+from storage import read_records
+
+TOPICS_DIR_NAME = "topics"
+RECLUSTER_INTERVAL = 30  # Seconds between background checks for submissions to recluster
+MAX_CLUSTERS = 12
+CENTROID_TERMS = 100  # Terms kept per stored centroid, enough to assign new projects
+LABEL_TERMS = 3
+KMEANS_ITERATIONS = 20
+NEIGHBORS = 10  # Similar projects kept per project
+NEIGHBOR_BLOCK_SIZE = 256  # Projects compared per block, bounds the memory of the similarity computation
+
+STOP_WORDS = frozenset("""
+a about above after again all also an and any app application are as at based be been being
+between both build building but by can could create creating do does for from help helps how
+i if in into is it its more most my of on one or other our out over project same so some such
+system than that the their them then there these they this those through to tool too under
+use used user users uses using via want we what when where which while who will with would you your
+""".split())
+
+_lock = threading.Lock()
+_reclusterer_started = False
+_base_models = {}  # Model file -> (stat, model), parsed once per process until the model file is rewritten
+_pending_logs = {}  # Pending log -> (inode, offset, entries), read from where this process left off
+
+# Function to get the model file of a submissions file
+def get_model_path(path):
+    return os.path.join(os.path.dirname(path) or ".", TOPICS_DIR_NAME, os.path.basename(path))
+
+# Function to get the log of the projects added since the model file was written
+def get_pending_path(path):
+    return get_model_path(path) + ".pending"
+
+# Function to get the name the model's generation counter is kept under
+def _get_generation_key(path):
+    return os.path.join(os.path.dirname(path), f"{TOPICS_DIR_NAME}-{os.path.basename(path)}")
+
+# Function to get the generation of a submissions file's topic model (changes whenever the model is written)
+def get_generation(path):
+    return generations.get(_get_generation_key(path))
+
+# Function to split text into the terms used for clustering
+def tokenize(text):
+    return [term for term in re.findall(r"[a-z][a-z0-9+#]*", text.lower()) if len(term) > 2 and term not in STOP_WORDS]
+
+# Function to get the term counts of a submission (topic terms count twice)
+def document_terms(submission):
+    terms = Counter(tokenize(submission.topic))
+    terms.update(terms)
+    terms.update(tokenize(submission.description))
+    return terms
+
+# Function to create an empty model
+def empty_model():
+    return {
+        'source_generation': None,
+        'count': 0,
+        'clustered_count': 0,
+        'terms': [],
+        'df': [],
+        'clusters': [],
+        'assignments': [],
+        'neighbors': []
+    }
+
+# Function to load the model file as the last recluster wrote it
+# Shared with later callers in this process, so it must not be modified
+def _load_base(path):
+    model_file = get_model_path(path)
+    try:
+        stat = os.stat(model_file)
+    except FileNotFoundError:
+        return empty_model()
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _base_models.get(model_file)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    try:
+        model = codec.read_json(model_file)
+    except codec.DecodeError:
+        model = empty_model()
+    _base_models[model_file] = (key, model)
+    return model
+
+# Function to read the pending log, only reading the lines appended since this process last read it
+def _read_pending(path):
+    log_file = get_pending_path(path)
+    try:
+        f = open(log_file, "rb")
+    except FileNotFoundError:
+        return []
+    with f:
+        inode = os.fstat(f.fileno()).st_ino
+        cached_inode, offset, entries = _pending_logs.get(log_file, (None, 0, []))
+        if cached_inode != inode or os.fstat(f.fileno()).st_size < offset:
+            # Started over by a recluster
+            offset, entries = 0, []
+        f.seek(offset)
+        entries = list(entries)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # An append still being written (or cut off by a crash)
+            offset += len(line)
+            try:
+                entries.append(codec.loads(line))
+            except codec.DecodeError:
+                continue
+    _pending_logs[log_file] = (inode, offset, entries)
+    return entries
+
+# Function to get the pending entries that follow on from the model file, one per added project
+# Entries left over from before the last recluster (or after a clear, restore or hand edit) don't chain on and are ignored
+def _get_pending(base, entries):
+    chained = []
+    generation = base['source_generation']
+    for entry in entries:
+        if entry['previous_generation'] != generation:
+            continue
+        chained.append(entry)
+        generation = entry['generation']
+    return chained
+
+# Function to load the topic model of a submissions file, with the projects added since the last recluster
+def load_model(path):
+    base = _load_base(path)
+    pending = _get_pending(base, _read_pending(path))
+    model = dict(base, terms=list(base['terms']), df=list(base['df']),
+                 clusters=[dict(cluster) for cluster in base['clusters']],
+                 assignments=list(base['assignments']), neighbors=list(base['neighbors']))
+    term_index = {term: i for i, term in enumerate(model['terms'])}
+    for entry in pending:
+        for term in entry['terms']:
+            if term not in term_index:
+                term_index[term] = len(model['terms'])
+                model['terms'].append(term)
+                model['df'].append(0)
+            model['df'][term_index[term]] += 1
+        if entry['cluster'] >= 0:
+            model['clusters'][entry['cluster']]['size'] += 1
+        model['assignments'].append(entry['cluster'])
+        # Similar projects are found by the next recluster
+        model['neighbors'].append([])
+        model['count'] += 1
+        model['source_generation'] = entry['generation']
+    return model
+
+# Function to write the topic model of a submissions file, start the pending log over and tell every worker it changed
+def _write_model(path, model):
+    model_file = get_model_path(path)
+    os.makedirs(os.path.dirname(model_file), exist_ok=True)
+    codec.write_json(model_file, model)
+    if os.path.exists(get_pending_path(path)):
+        os.remove(get_pending_path(path))
+    generations.bump(_get_generation_key(path))
+
+# Function to compute the TF-IDF weights of a document as parallel arrays (term indices, weights)
+def _weigh(terms, term_index, idf):
+    indices = np.array([term_index[term] for term in terms], dtype=np.int64)
+    counts = np.array(list(terms.values()), dtype=np.float64)
+    weights = (1 + np.log(counts)) * idf[indices] if len(indices) else counts
+    norm = np.linalg.norm(weights)
+    return indices, (weights / norm if norm else weights)
+
+# Function to compute smoothed inverse document frequencies
+def _idf(df, n_docs):
+    return np.log((1 + n_docs) / (1 + np.asarray(df, dtype=np.float64))) + 1
+
+# Function to add a new submission to the model: assign it to the nearest cluster and log it as pending
+# Callers hold generations.locked(path) and call this right after appending the submission to the file;
+# `previous_generation` is the file's generation before that write
+def add_document(path, submission, previous_generation):
+    base = _load_base(path)
+    pending = _get_pending(base, _read_pending(path))
+    if (pending[-1]['generation'] if pending else base['source_generation']) != previous_generation:
+        # The file changed some other way since the model was written (clear, restore, hand edit);
+        # leave it to the background recluster
+        return None
+    terms = document_terms(submission)
+
+    cluster = -1
+    if base['clusters']:
+        # Document frequencies of just this project's terms, counting the pending projects
+        added = Counter(term for entry in pending for term in entry['terms'] if term in terms)
+        term_index = {term: i for i, term in enumerate(base['terms'])}
+        df = [base['df'][term_index[term]] if term in term_index else 0 for term in terms]
+        df = [count + added[term] + 1 for count, term in zip(df, terms)]
+        local_index = {term: i for i, term in enumerate(terms)}
+        _, weights = _weigh(terms, local_index, _idf(df, base['count'] + len(pending) + 1))
+        weight_of = {term_index[term]: weight for term, weight in zip(terms, weights.tolist()) if term in term_index}
+        similarities = [
+            sum(weight * weight_of.get(i, 0.0) for i, weight in c['centroid'])
+            for c in base['clusters']
+        ]
+        cluster = int(np.argmax(similarities))
+
+    # The log now matches the file this caller just wrote
+    entry = {'previous_generation': previous_generation, 'generation': generations.get(path),
+             'cluster': cluster, 'terms': list(terms)}
+    os.makedirs(os.path.dirname(get_pending_path(path)), exist_ok=True)
+    with open(get_pending_path(path), "ab") as f:
+        f.write(codec.dumps(entry) + b"\n")
+    generations.bump(_get_generation_key(path))
+    return cluster
+
+# Function to build the L2-normalized TF-IDF matrix of the submissions in CSR form
+# Returns (terms, df, indptr, indices, data)
+def build_matrix(submissions):
+    documents = [document_terms(submission) for submission in submissions]
+    term_index = {}
+    df = []
+    for terms in documents:
+        for term in terms:
+            i = term_index.get(term)
+            if i is None:
+                i = term_index[term] = len(df)
+                df.append(0)
+            df[i] += 1
+    idf = _idf(df, len(documents))
+
+    indptr = [0]
+    indices = []
+    data = []
+    for terms in documents:
+        doc_indices, weights = _weigh(terms, term_index, idf)
+        indices.append(doc_indices)
+        data.append(weights)
+        indptr.append(indptr[-1] + len(doc_indices))
+
+    return (
+        list(term_index),
+        df,
+        np.array(indptr, dtype=np.int64),
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+        np.concatenate(data) if data else np.zeros(0, dtype=np.float64)
+    )
+
+# Function to compute the cosine similarity of every document to every centroid
+def _similarities(rows, indices, data, centroids, n_docs):
+    contributions = data[:, None] * centroids[:, indices].T  # one row per stored term
+    return np.stack([np.bincount(rows, weights=contributions[:, j], minlength=n_docs) for j in range(len(centroids))], axis=1)
+
+# Function to cluster the rows of a normalized CSR matrix with spherical k-means (k-means++ seeding)
+# Returns (labels, centroids)
+def kmeans(indptr, indices, data, n_features, k, iterations=KMEANS_ITERATIONS, seed=0):
+    n_docs = len(indptr) - 1
+    rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+    rng = np.random.default_rng(seed)
+
+    # Function to get the dense vector of one document
+    def dense_row(i):
+        vector = np.zeros(n_features)
+        vector[indices[indptr[i]:indptr[i + 1]]] = data[indptr[i]:indptr[i + 1]]
+        return vector
+
+    # Seed the centroids far apart
+    centroids = [dense_row(rng.integers(n_docs))]
+    closest = _similarities(rows, indices, data, np.array(centroids), n_docs)[:, 0]
+    while len(centroids) < k:
+        distance = np.clip(1 - closest, 0, None) ** 2
+        if distance.sum() == 0:
+            break
+        centroids.append(dense_row(rng.choice(n_docs, p=distance / distance.sum())))
+        closest = np.maximum(closest, _similarities(rows, indices, data, np.array(centroids[-1:]), n_docs)[:, 0])
+    centroids = np.array(centroids)
+
+    labels = None
+    for _ in range(iterations):
+        similarities = _similarities(rows, indices, data, centroids, n_docs)
+        new_labels = similarities.argmax(axis=1)
+        if labels is not None and np.array_equal(labels, new_labels):
+            break
+        labels = new_labels
+
+        # Move every centroid to the normalized mean of its documents
+        row_labels = labels[rows]
+        for j in range(len(centroids)):
+            mask = row_labels == j
+            centroid = np.bincount(indices[mask], weights=data[mask], minlength=n_features)
+            norm = np.linalg.norm(centroid)
+            if norm:
+                centroids[j] = centroid / norm
+            else:
+                # Empty cluster: restart it at the document furthest from its centroid
+                centroids[j] = dense_row(int(similarities.max(axis=1).argmin()))
+    return labels, centroids
+
+# Function to find the most similar rows of a normalized CSR matrix for every row
+# Returns [[[row, similarity], ...], ...], best first, without the row itself or rows sharing no terms
+def nearest_neighbors(indptr, indices, data, n_features, k=NEIGHBORS, block_size=NEIGHBOR_BLOCK_SIZE):
+    n_docs = len(indptr) - 1
+    k = min(k, n_docs - 1)
+    if k <= 0:
+        return [[] for _ in range(n_docs)]
+
+    # Terms used by a single project can't make two projects similar, drop them
+    df = np.bincount(indices, minlength=n_features)
+    shared = df >= 2
+    column = np.cumsum(shared) - 1
+    rows = np.repeat(np.arange(n_docs), np.diff(indptr))
+    mask = shared[indices]
+    rows, columns, values = rows[mask], column[indices[mask]], data[mask].astype(np.float32)
+    n_columns = int(shared.sum())
+
+    # Function to get rows [start, stop) as a dense block over the shared terms
+    def dense_block(start, stop):
+        first, last = np.searchsorted(rows, [start, stop])
+        block = np.zeros((stop - start, n_columns), dtype=np.float32)
+        block[rows[first:last] - start, columns[first:last]] = values[first:last]
+        return block
+
+    starts = list(range(0, n_docs, block_size))
+    neighbors = []
+    for start in starts:
+        stop = min(start + block_size, n_docs)
+        block = dense_block(start, stop)
+        similarities = np.hstack([block @ dense_block(other, min(other + block_size, n_docs)).T for other in starts])
+        similarities[np.arange(stop - start), np.arange(start, stop)] = -np.inf
+
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_scores, axis=1, kind='stable')
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for row_top, row_scores in zip(top.tolist(), top_scores.tolist()):
+            neighbors.append([[j, round(score, 4)] for j, score in zip(row_top, row_scores) if score > 0])
+    return neighbors
+
+# Function to pick the number of clusters for a number of projects
+def choose_k(n_docs):
+    return max(1, min(MAX_CLUSTERS, int(round(np.sqrt(n_docs / 2)))))
+
+# Function to recluster every submission of a submissions file from scratch
+def recluster(path):
+    source_generation = generations.get(path)
+    submissions = read_records(path, parse_submissions)
+    model = empty_model()
+
+    if submissions:
+        terms, df, indptr, indices, data = build_matrix(submissions)
+        labels, centroids = kmeans(indptr, indices, data, len(terms), choose_k(len(submissions)))
+        for j, centroid in enumerate(centroids):
+            top = np.argsort(-centroid, kind='stable')[:CENTROID_TERMS]
+            top = top[centroid[top] > 0]
+            model['clusters'].append({
+                'label': ", ".join(terms[i] for i in top[:LABEL_TERMS]) or "Other",
+                'centroid': [[int(i), round(float(centroid[i]), 6)] for i in top],
+                'size': int((labels == j).sum())
+            })
+        model['terms'] = terms
+        model['df'] = df
+        model['assignments'] = labels.tolist()
+        model['neighbors'] = nearest_neighbors(indptr, indices, data, len(terms))
+        model['count'] = model['clustered_count'] = len(submissions)
+
+    # Projects submitted while clustering are assigned incrementally by their writers;
+    # only replace the model if the file didn't change in the meantime
+    with generations.locked(path):
+        if generations.get(path) != source_generation:
+            return None
+        model['source_generation'] = source_generation
+        _write_model(path, model)
+    return model
+
+# Function to check whether a submissions file changed since its model was last fully clustered
+def needs_recluster(path, model):
+    if model['source_generation'] != generations.get(path):
+        # Changed by something other than add_document (clear, restore, hand edit)
+        return True
+    return model['count'] != model['clustered_count']
+
+# Function to get the cluster of every submission, or None if the model doesn't match them
+# Projects not clustered yet get -1
+def get_assignments(model, count):
+    assignments = model['assignments']
+    if len(assignments) > count:
+        return None
+    return assignments + [-1] * (count - len(assignments))
+
+# Function to get the most similar projects of a project as [[index, similarity], ...], best first
+# Only projects that existed at the last recluster are listed
+def get_neighbors(model, index, count):
+    neighbors = model.get('neighbors', [])
+    if len(neighbors) > count or index >= len(neighbors):
+        return []
+    return neighbors[index]
+
+# Function to recluster submissions files in a background thread once they change
+# With several workers sharing the data directory, only the one holding `lock_path` reclusters
+def start_reclusterer(get_paths, interval=RECLUSTER_INTERVAL, lock_path=None):
+    global _reclusterer_started
+    with _lock:
+        if _reclusterer_started:
+            return
+        _reclusterer_started = True
+
+    def run():
+        leader = None
+        while True:
+            if lock_path is not None and leader is None:
+                leader = generations.try_lock(lock_path)
+            if lock_path is None or leader is not None:
+                for path in get_paths():
+                    try:
+                        if os.path.exists(path) and needs_recluster(path, load_model(path)):
+                            recluster(path)
+                    except Exception as e:
+                        print(f"Clustering {path} failed: {e}", file=sys.stderr)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name="topic-reclusterer", daemon=True).start()
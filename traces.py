@@ -0,0 +1,129 @@
+# Opt-in trace of user actions, for replaying real traffic against new versions
+#
+# Set TRACE_FILE to record every form submit, toggle, section switch, bid
+# confirmation and cancel to a JSON-lines file:
+#   TRACE_FILE=traces/deadline.jsonl streamlit run app.py
+#
+# Traces are anonymized: names and NetIDs are replaced with salted hashes
+# (the salt stays next to the trace in <trace>.salt, don't share it), and
+# project topics and descriptions are reduced to their lengths. The first
+# event a worker records is a "seed" with the anonymized data files, so a
+# replay starts from the same data. Replay traces with replay.py.
+import os
+import time
+import hashlib
+import secrets
+import threading
+
+import codec
+from records import parse_submissions, parse_bids
+from storage import SECTIONS, get_section_files, read_records
+
+TRACE_FILE = os.environ.get("TRACE_FILE") or None
+
+_lock = threading.Lock()
+_salt = None
+_seeded = False
+
+# Function to get the salt of the trace file, shared by every worker writing to it
+def _get_salt():
+    global _salt
+    if _salt is None:
+        salt_file = f"{TRACE_FILE}.salt"
+        os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+        try:
+            fd = os.open(salt_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(16))
+        except FileExistsError:
+            pass
+        # Read it back in case another worker created it first
+        with open(salt_file) as f:
+            _salt = f.read().strip()
+    return _salt
+
+# Function to replace a name or NetID with a stable token (case-insensitive, like the identity check)
+def anonymize(value):
+    if not value.strip():
+        return ""
+    digest = hashlib.sha256(f"{_get_salt()}:{value.strip().lower()}".encode("utf-8")).hexdigest()
+    return f"u{digest[:10]}"
+
+# Function to anonymize a submission
+def anonymize_submission(submission):
+    return {
+        'name': anonymize(submission.name),
+        'netid': anonymize(submission.netid),
+        'topic_len': len(submission.topic),
+        'description_len': len(submission.description),
+        'timestamp': submission.timestamp
+    }
+
+# Function to anonymize a bid
+def anonymize_bid(bid):
+    return {
+        'name': anonymize(bid.name),
+        'netid': anonymize(bid.netid),
+        'bids': [[item.project_id, item.points] for item in bid.bids],
+        'timestamp': bid.timestamp
+    }
+
+# Function to build the seed event: the anonymized data of every section when recording starts
+def _build_seed():
+    sections = {}
+    for section in SECTIONS:
+        section_files = get_section_files(section)
+        try:
+            submissions = read_records(section_files['submissions'], parse_submissions)
+            bids = read_records(section_files['bids'], parse_bids)
+        except Exception:
+            submissions, bids = [], []
+        sections[section] = {
+            'submissions': [anonymize_submission(submission) for submission in submissions],
+            'bids': [anonymize_bid(bid) for bid in bids]
+        }
+    return {'t': round(time.time(), 3), 'session': None, 'action': 'seed', 'sections': sections}
+
+# Function to anonymize the fields of an event
+# Names and NetIDs (also in the state's 'user') become tokens, topics and descriptions their lengths
+def anonymize_fields(fields):
+    anonymized = {}
+    for key, value in fields.items():
+        if key in ('name', 'netid'):
+            anonymized[key] = anonymize(value)
+        elif key in ('topic', 'description'):
+            anonymized[f"{key}_len"] = len(value)
+        elif key == 'user':
+            anonymized[key] = [anonymize(part) for part in value]
+        else:
+            anonymized[key] = value
+    return anonymized
+
+# Function to append a user action to the trace
+# `state` is the session state the action started from (flags, section and identity)
+def record(session, action, state, **fields):
+    global _seeded
+    if TRACE_FILE is None:
+        return
+    event = {'t': round(time.time(), 3), 'session': session, 'action': action, 'state': anonymize_fields(state)}
+    event.update(anonymize_fields(fields))
+
+    with _lock:
+        lines = []
+        if not _seeded:
+            lines.append(codec.dumps(_build_seed()))
+            _seeded = True
+        lines.append(codec.dumps(event))
+        # One write per event in append mode, so lines from several workers don't interleave
+        with open(TRACE_FILE, "ab") as f:
+            f.write(b"".join(line + b"\n" for line in lines))
+
+# Function to read the events of a trace file in order
+def read_trace(path):
+    events = []
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                events.append(codec.loads(line))
+    events.sort(key=lambda event: event['t'])
+    return events